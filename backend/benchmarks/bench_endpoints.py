@@ -0,0 +1,318 @@
+"""Benchmark y prueba de carga de todos los endpoints, en proceso (ASGI, sin red).
+
+Dos modos (`--mode bench|load|both`):
+- `bench`: cada caso de `build_cases` se pide `--repeat` veces seguidas (tras
+  `--warmup` peticiones sin medir) y se reportan min/p50/p95/p99/max en ms.
+- `load`: `--concurrency` clientes concurrentes reparten los casos en
+  round-robin durante `--duration` segundos (o `--requests` peticiones) y se
+  reportan percentiles por caso y globales, y el throughput.
+
+Las peticiones pasan por toda la app (middlewares, validación, serialización)
+vía `httpx.ASGITransport`; los endpoints síncronos corren en el threadpool
+como con uvicorn. Por defecto se desactivan la caché de respuestas y la de
+simulaciones (`--cache off`) para medir el trabajo de los handlers; con
+`--cache on` se mide el camino cacheado.
+
+`--json` guarda los resultados con metadatos (commit, tamaño de los datos,
+tiempos de carga) y `--compare` los compara con un JSON anterior para seguir
+regresiones entre commits (`--fail-on-regression` devuelve código 1).
+
+Uso (desde `backend/`):
+    python benchmarks/bench_endpoints.py [--mode both] [--json out.json]
+    python scripts/scale_dataset.py --factor 100 --out /tmp/ewaste-x100
+    DATA_DIR=/tmp/ewaste-x100 python benchmarks/bench_endpoints.py --compare out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+# percentiles reportados
+PERCENTILES = (50, 95, 99)
+
+
+def build_cases(country: str, iso3: str, year: int):
+    """(nombre, ruta, parámetros) de cada caso; cubre todos los endpoints GET de datos."""
+    return [
+        ('health', '/health', {}),
+        ('ready', '/ready', {}),
+        ('metrics', '/metrics', {}),
+        ('debug_memory', '/debug/memory', {}),
+        ('ton', '/ewaste/ton', {'country': country}),
+        ('percapita', '/ewaste/percapita', {'country': country}),
+        ('formal_recolect', '/ewaste/formal_recolect', {'country': country}),
+        ('placed_market', '/ewaste/placed_market', {'country': country}),
+        ('colection_rate', '/ewaste/colection_rate', {'country': country}),
+        ('choropleth', '/ewaste/choropleth', {}),
+        ('choropleth_year', '/ewaste/choropleth', {'year': year}),
+        ('stats', '/ewaste/stats', {'country': country, 'year': year}),
+        ('time_series', '/ewaste/time_series', {'country': country}),
+        ('time_series_full', '/ewaste/time_series_full', {'country': country}),
+        ('categories', '/ewaste/categories', {'country': country, 'year': year}),
+        ('sankey', '/ewaste/sankey', {'country': country, 'year': year}),
+        ('heatmap_share', '/ewaste/heatmap', {}),
+        ('heatmap_kt_year', '/ewaste/heatmap', {'year': year, 'metric': 'kt'}),
+        ('scatter', '/ewaste/scatter', {'year': year}),
+        ('table_page', '/data/table', {'limit': 100}),
+        ('table_sorted', '/data/table', {'limit': 100, 'sort': '-e_waste_generated_kt', 'offset': 1000}),
+        ('table_country', '/data/table', {'country': iso3, 'limit': 100}),
+        ('export_csv', '/data/export', {'format': 'csv', 'year': year}),
+        ('batch', '/ewaste/batch', {'countries': iso3}),
+        ('scenario', '/ewaste/scenario', {'country': country, 'year': year, 'delta_percent': 10}),
+        ('scenario_sweep', '/ewaste/scenario/sweep', {'year': year}),
+        ('simulate', '/ewaste/simulate', {'year': year, 'draws': 20000, 'seed': 1}),
+        ('aggregate', '/ewaste/aggregate', {'group': ['all', 'andean'], 'metric': ['e_waste_generated_kt', 'e_waste_generated_per_capita']}),
+        ('category_pairs', '/ewaste/category_pairs', {'countries': iso3, 'year': year}),
+        ('category_correlation', '/ewaste/category_pairs/correlation', {'year': year}),
+        ('forecast', '/ewaste/forecast', {'country': country, 'horizon': 5}),
+        ('forecast_all', '/ewaste/forecast/all', {'horizon': 5}),
+        ('countries', '/ewaste/countries', {}),
+        ('countries_search', '/ewaste/countries/search', {'q': country[:3]}),
+    ]
+
+
+def uncovered_routes(app, cases):
+    """Rutas GET de la app sin ningún caso (para no olvidar endpoints nuevos)."""
+    covered = {path for _, path, _ in cases}
+    skip = {'/docs', '/redoc', '/openapi.json', '/docs/oauth2-redirect', '/debug/profiles', '/debug/profiles/{profile_id}'}
+    return sorted(
+        r.path for r in app.routes
+        if 'GET' in getattr(r, 'methods', ()) and r.path not in covered and r.path not in skip
+    )
+
+
+def summarize(latencies_s, errors: int = 0, wall_s: float = None) -> dict:
+    ms = np.asarray(latencies_s, dtype='float64') * 1000.0
+    out = {'n': int(len(ms)), 'errors': errors}
+    if len(ms):
+        out.update(min_ms=float(ms.min()), mean_ms=float(ms.mean()), max_ms=float(ms.max()))
+        out.update({f'p{p}_ms': float(np.percentile(ms, p)) for p in PERCENTILES})
+    if wall_s:
+        out['wall_s'] = wall_s
+        out['throughput_rps'] = len(ms) / wall_s
+    return out
+
+
+async def _request(client, path, params):
+    start = time.perf_counter()
+    response = await client.get(path, params=params)
+    await response.aread()
+    return time.perf_counter() - start, response.status_code
+
+
+def _ok(status: int) -> bool:
+    return status < 400
+
+
+async def run_bench(client, cases, repeat: int, warmup: int) -> dict:
+    results = {}
+    for name, path, params in cases:
+        for _ in range(warmup):
+            await _request(client, path, params)
+        latencies, errors, status = [], 0, None
+        for _ in range(repeat):
+            elapsed, status = await _request(client, path, params)
+            latencies.append(elapsed)
+            errors += not _ok(status)
+        results[name] = {**summarize(latencies, errors), 'status': status}
+    return results
+
+
+async def run_load(client, cases, concurrency: int, duration: float, total: int) -> dict:
+    per_case = {name: [] for name, _, _ in cases}
+    errors = {name: 0 for name, _, _ in cases}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(k: int):
+        nonlocal issued
+        i = k
+        while True:
+            if total and issued >= total:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            issued += 1
+            name, path, params = cases[i % len(cases)]
+            i += 1
+            elapsed, status = await _request(client, path, params)
+            per_case[name].append(elapsed)
+            errors[name] += not _ok(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    wall = time.perf_counter() - start
+    every = [t for values in per_case.values() for t in values]
+    return {
+        'concurrency': concurrency,
+        'overall': summarize(every, sum(errors.values()), wall),
+        'cases': {name: summarize(values, errors[name]) for name, values in per_case.items()},
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return out.stdout.strip(), bool(dirty.stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def metadata(main_module, snap, args) -> dict:
+    from data_loader import DATASET_NAMES, get_data_dir
+
+    commit, dirty = _git_commit()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'data_dir': str(get_data_dir()),
+        'data_version': snap.version,
+        'rows': {name: len(snap.frame(name)) for name in DATASET_NAMES},
+        'load_ms': {k: round(v * 1000.0, 3) for k, v in snap.timings.items()},
+        'warmup_ms': round((main_module.WARMUP_STATE['seconds'] or 0.0) * 1000.0, 3),
+        'env': {k: os.environ.get(k) for k in ('DATA_COMPACT', 'DATA_COLUMNAR', 'DATA_FLOAT_PRECISION', 'DATA_SHARED_DIR')},
+        'args': vars(args),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Casos cuyo p50 (bench) o p95 (load) empeora más de `threshold` veces frente a `baseline`."""
+    rows = []
+    for mode, key in (('bench', 'p50_ms'), ('load', 'p95_ms')):
+        new = results.get(mode) or {}
+        old = baseline.get(mode) or {}
+        new_cases = new if mode == 'bench' else new.get('cases', {})
+        old_cases = old if mode == 'bench' else old.get('cases', {})
+        for name, stats in new_cases.items():
+            before = old_cases.get(name, {}).get(key)
+            after = stats.get(key)
+            if before and after:
+                rows.append((mode, name, key, before, after, after / before, after / before > threshold))
+    return rows
+
+
+def _print_table(title: str, cases: dict):
+    print(f'\n{title}')
+    print(f"{'case':<24}{'n':>6}{'err':>5}{'min':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in cases.items():
+        if not s.get('n'):
+            print(f'{name:<24}{0:>6}')
+            continue
+        print(
+            f"{name:<24}{s['n']:>6}{s['errors']:>5}{s['min_ms']:>9.3f}{s['p50_ms']:>9.3f}"
+            f"{s['p95_ms']:>9.3f}{s['p99_ms']:>9.3f}{s['max_ms']:>9.3f}"
+        )
+
+
+async def _run(args, main_module, cases) -> dict:
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=main_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        if args.mode in ('bench', 'both'):
+            results['bench'] = await run_bench(client, cases, args.repeat, args.warmup)
+        if args.mode in ('load', 'both'):
+            results['load'] = await run_load(client, cases, args.concurrency, args.duration, args.requests)
+    return results
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('bench', 'load', 'both'), default='both')
+    parser.add_argument('--repeat', type=int, default=30, help='peticiones medidas por caso (bench)')
+    parser.add_argument('--warmup', type=int, default=3, help='peticiones sin medir por caso (bench)')
+    parser.add_argument('--concurrency', type=int, default=16, help='clientes concurrentes (load)')
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos de carga (load; 0 = usar --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='peticiones totales (load; 0 = usar --duration)')
+    parser.add_argument('--cache', choices=('on', 'off'), default='off', help='caché de respuestas y simulaciones')
+    parser.add_argument('--only', nargs='*', help='solo estos casos (por nombre)')
+    parser.add_argument('--json', help="guarda los resultados en este archivo ('-' = stdout)")
+    parser.add_argument('--compare', help='JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--threshold', type=float, default=1.25, help='empeoramiento que cuenta como regresión')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+    if args.mode != 'bench' and not args.duration and not args.requests:
+        parser.error('load necesita --duration o --requests')
+
+    if args.cache == 'off':
+        # antes de importar main: los tamaños de caché se leen al importar
+        os.environ['RESPONSE_CACHE_SIZE'] = '0'
+        os.environ['SIMULATION_CACHE_SIZE'] = '0'
+    import main  # noqa: E402
+    from data_loader import current_snapshot
+
+    main._run_warm_up()
+    if main.WARMUP_STATE['status'] != 'ready':
+        raise SystemExit(f"Warm-up failed: {main.WARMUP_STATE['error']}")
+    snap = current_snapshot()
+    index = main._country_search(snap)
+    if not index.entries:
+        raise SystemExit('No countries in the dataset')
+    country, iso3, _ = index.entries[0]
+    years = main._rollups(snap).years
+    year = int(years[-1]) if len(years) else 2020
+    cases = build_cases(country, iso3 or country, year)
+    missing = uncovered_routes(main.app, cases)
+    if args.only:
+        cases = [c for c in cases if c[0] in args.only]
+
+    results = asyncio.run(_run(args, main, cases))
+    results['meta'] = metadata(main, snap, args)
+    results['meta']['uncovered_routes'] = missing
+
+    rows = results['meta']['rows']
+    print(f"data: {results['meta']['data_dir']} ({', '.join(f'{k}={v}' for k, v in rows.items())})")
+    if missing:
+        print(f"uncovered routes: {', '.join(missing)}")
+    if 'bench' in results:
+        _print_table(f'bench ({args.repeat} requests per case, ms)', results['bench'])
+    if 'load' in results:
+        load = results['load']
+        _print_table(f"load ({args.concurrency} concurrent clients, ms)", {**load['cases'], 'OVERALL': load['overall']})
+        print(f"throughput: {load['overall'].get('throughput_rps', 0.0):.1f} req/s")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        rows = compare(results, baseline, args.threshold)
+        results['comparison'] = [
+            {'mode': m, 'case': n, 'stat': k, 'before_ms': b, 'after_ms': a, 'ratio': r, 'regression': flag}
+            for m, n, k, b, a, r, flag in rows
+        ]
+        regressions = [row for row in rows if row[-1]]
+        print(f"\ncompared with {args.compare} (commit {baseline.get('meta', {}).get('commit')}):")
+        if baseline.get('meta', {}).get('data_version') != results['meta']['data_version']:
+            print('warning: the baseline was measured on different data')
+        for mode, name, key, before, after, ratio, flag in rows:
+            mark = '  REGRESSION' if flag else ''
+            print(f'{mode:<6}{name:<24}{key:<8}{before:>9.3f} -> {after:>9.3f}  x{ratio:.2f}{mark}')
+
+    if args.json:
+        text = json.dumps(results, indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            Path(args.json).write_text(text, encoding='utf-8')
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main_cli()
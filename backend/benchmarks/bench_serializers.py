@@ -0,0 +1,138 @@
+"""Benchmark: construcción de respuestas con `iterrows()` vs serializador columnar.
+
+Mide el tiempo por petición de `/ewaste/choropleth` (tabla completa, sin `year`)
+con la implementación anterior por filas y con `serialization.records_from_frame`,
+y el de `/ewaste/heatmap` en kt (pivot + registros frente al cubo de
+`category_cube.py`, incluida su construcción). El heatmap en shares no se
+compara: la versión por filas devolvía `null` con la tabla larga. Para medir
+todos los endpoints a través de la app, ver `bench_endpoints.py`.
+
+Uso (desde `backend/`):
+    python benchmarks/bench_serializers.py [--scale N] [--repeat R]
+
+`--scale N` replica las tablas N veces (con países sintéticos) para simular
+datasets más grandes.
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import main  # noqa: E402
+from category_cube import build_category_cube  # noqa: E402
+from data_loader import load_df_category_long, load_df_country_year  # noqa: E402
+from serialization import float_objects  # noqa: E402
+
+
+def _clean_value(v):
+    """Convierte valores pandas/numpy a tipos Python serializables por JSON.
+
+    - NaN / pd.NA -> None
+    - numpy scalars -> native python via .item()
+    """
+    try:
+        if pd.isna(v):
+            return None
+    except Exception:
+        pass
+    if isinstance(v, (np.generic,)):
+        try:
+            return v.item()
+        except Exception:
+            return v
+    return v
+
+
+def _legacy_choropleth(df):
+    out = []
+    for _, r in df.iterrows():
+        out.append(
+            {
+                'country': _clean_value(r.get('country')),
+                'country_clean': _clean_value(r.get('country_clean')),
+                'iso3': _clean_value(r.get('iso3')),
+                'year': int(r['year']) if pd.notna(r.get('year')) else None,
+                'e_waste_generated_per_capita': main._safe_float(r.get('e_waste_generated_per_capita')),
+                'e_waste_generated_kt': main._safe_float(r.get('e_waste_generated_kt')),
+                'e_waste_collection_rate': main._safe_float(r.get('e_waste_collection_rate')),
+            }
+        )
+    return out
+
+
+def _pivot(cat):
+    return cat.pivot_table(index=['country', 'year'], columns='category', values='kt', aggfunc='first').reset_index()
+
+
+def _legacy_heatmap(cat, metric):
+    pivot = _pivot(cat.copy())
+    out = []
+    for _, r in pivot.iterrows():
+        rec = {'country': _clean_value(r.get('country')), 'iso3': _clean_value(r.get('iso3')) if 'iso3' in r.index else None, 'year': int(r['year']) if pd.notna(r.get('year')) else None}
+        total = main._safe_float(r.get('e_waste_generated_kt'))
+        for c in main.CATEGORY_COLUMNS:
+            val = main._safe_float(r.get(c))
+            if metric == 'kt':
+                rec[c] = val
+            else:
+                rec[c + '_share'] = float(val) / float(total) if total and val is not None and total > 0 else None
+        out.append(rec)
+    return out
+
+
+def _cube_heatmap(cat, metric):
+    """Camino actual: cubo de categorías (`category_cube.py`) + corte, como `_heatmap_payload`."""
+    cube = build_category_cube(cat, main.CATEGORY_COLUMNS)
+    cells = cube.cells_for(None)
+    c, y = cells[:, 0], cells[:, 1]
+    plane = cube.kt if metric == 'kt' else cube.share
+    names = list(cube.categories) if metric == 'kt' else [n + '_share' for n in cube.categories]
+    columns = [cube.countries[c].tolist(), cube.iso3[c].tolist(), cube.years[y].tolist()]
+    columns += [float_objects(plane[c, y][:, k]).tolist() for k in range(len(names))]
+    return [dict(zip(['country', 'iso3', 'year'] + names, row)) for row in zip(*columns)]
+
+
+def _scaled(df, scale):
+    if scale <= 1:
+        return df
+    parts = []
+    for i in range(scale):
+        part = df.copy()
+        part['country'] = part['country'] + ('' if i == 0 else f' #{i}')
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def _time(fn, repeat):
+    runs = timeit.repeat(fn, number=1, repeat=repeat)
+    return min(runs) * 1000.0, sorted(runs)[len(runs) // 2] * 1000.0
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    cy = _scaled(load_df_country_year(), args.scale)
+    cat = _scaled(load_df_category_long(), args.scale)
+    cases = [
+        ('choropleth (full table)', lambda: _legacy_choropleth(cy), lambda: main._choropleth_records(cy)),
+        ('heatmap kt', lambda: _legacy_heatmap(cat, 'kt'), lambda: _cube_heatmap(cat, 'kt')),
+    ]
+    print(f'rows: country_year={len(cy)} category_long={len(cat)} (scale={args.scale})')
+    print(f"{'case':<26}{'iterrows ms':>14}{'columnar ms':>14}{'speedup':>10}")
+    for name, legacy, columnar in cases:
+        assert legacy() == columnar(), name
+        old_min, _ = _time(legacy, args.repeat)
+        new_min, _ = _time(columnar, args.repeat)
+        print(f'{name:<26}{old_min:>14.3f}{new_min:>14.3f}{old_min / new_min:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,90 @@
+"""Benchmark de arranque: snapshot desde JSON vs formato columnar (mmap), con y sin compactar.
+
+Cada modo se mide en un proceso nuevo (arranque en frío de un worker) que
+construye y retiene el snapshot completo, y reporta el tiempo de carga, la
+memoria de los datos según `memory_report` y la del proceso antes/después:
+`RssAnon` es memoria privada del worker; las páginas mapeadas de los `.npy`
+cuentan en `RssFile` y se comparten entre workers vía page cache.
+
+Uso (desde `backend/`):
+    python scripts/build_columnar.py      # genera data/columnar/
+    python benchmarks/bench_startup.py [--runs N] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+_CHILD = r'''
+import json, sys, time
+sys.path.insert(0, {backend!r})
+
+def mem():
+    out = {{}}
+    with open('/proc/self/status') as fh:
+        for line in fh:
+            if line.startswith(('RssAnon', 'RssFile', 'VmRSS')):
+                k, v = line.split(':')
+                out[k] = int(v.split()[0])
+    return out
+
+import data_loader
+before = mem()
+t0 = time.perf_counter()
+snapshot = data_loader.build_snapshot()
+elapsed = time.perf_counter() - t0
+after = mem()
+data_bytes = data_loader.memory_report(snapshot)['bytes']
+print(json.dumps({{'seconds': elapsed, 'before': before, 'after': after, 'data_bytes': data_bytes}}))
+'''
+
+
+# modo -> (DATA_COLUMNAR, DATA_COMPACT)
+MODES = {
+    'json': ('0', '0'),
+    'json+compact': ('0', '1'),
+    'columnar': ('1', '0'),
+    'columnar+compact': ('1', '1'),
+}
+
+
+def _run(columnar: str, compact: str) -> dict:
+    env = dict(os.environ, DATA_COLUMNAR=columnar, DATA_COMPACT=compact)
+    out = subprocess.run(
+        [sys.executable, '-c', _CHILD.format(backend=str(BACKEND_DIR))],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='salida en JSON (para comparar entre commits)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode, (columnar, compact) in MODES.items():
+        runs = [_run(columnar, compact) for _ in range(args.runs)]
+        best = min(runs, key=lambda r: r['seconds'])
+        results[mode] = {
+            'load_ms': best['seconds'] * 1000.0,
+            'data_kb': best['data_bytes'] // 1024,
+            'rss_delta_kb': best['after'].get('VmRSS', 0) - best['before'].get('VmRSS', 0),
+            'anon_delta_kb': best['after'].get('RssAnon', 0) - best['before'].get('RssAnon', 0),
+            'file_delta_kb': best['after'].get('RssFile', 0) - best['before'].get('RssFile', 0),
+        }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<18}{'load ms':>10}{'data KB':>10}{'RSS +KB':>10}{'anon +KB':>10}{'file +KB':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<18}{r['load_ms']:>10.1f}{r['data_kb']:>10}{r['rss_delta_kb']:>10}{r['anon_delta_kb']:>10}{r['file_delta_kb']:>10}")
+
+
+if __name__ == '__main__':
+    main()
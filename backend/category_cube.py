@@ -0,0 +1,130 @@
+"""Cubo país x año x categoría (kt y share) para `/ewaste/heatmap`.
+
+Se construye una vez por snapshot a partir de la tabla larga de categorías
+(una fila por country/year/category) o de una tabla ancha (una columna kt por
+categoría). Un heatmap de cualquier año y métrica es entonces un corte del
+cubo, sin `pivot_table` por petición.
+"""
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from serialization import float_array
+
+TOTAL_COLUMN = 'e_waste_generated_kt'
+
+
+@dataclass(frozen=True)
+class CategoryCube:
+    """Planos densos `(países, años, categorías)` de kt y share, y el total por (país, año).
+
+    `cells` son las posiciones `(país, año)` con datos, en el orden de salida;
+    `year_cells` las agrupa por año. Lo que falta es NaN.
+    """
+
+    countries: np.ndarray          # (C,) nombres
+    iso3: np.ndarray               # (C,) ISO3 o None
+    years: np.ndarray              # (Y,) int
+    categories: Tuple[str, ...]    # (K,)
+    kt: np.ndarray                 # (C, Y, K)
+    share: np.ndarray              # (C, Y, K) kt / total, solo si total > 0
+    total: np.ndarray              # (C, Y)
+    cells: np.ndarray              # (N, 2) [país, año]
+    year_cells: Mapping[int, np.ndarray]
+
+    def cells_for(self, year: Optional[int]) -> np.ndarray:
+        """Celdas `(país, año)` de `year` (todas si es None), en el orden de salida."""
+        if year is None:
+            return self.cells
+        return self.year_cells.get(int(year), self.cells[:0])
+
+    def nbytes(self) -> int:
+        return int(self.kt.nbytes + self.share.nbytes + self.total.nbytes + self.cells.nbytes)
+
+
+def _first_valid(codes: np.ndarray, values: np.ndarray, size: int, fill) -> np.ndarray:
+    """Por código, el primer valor no nulo en orden de fila (como `aggfunc='first'`)."""
+    out = np.full(size, fill, dtype=values.dtype if values.dtype != object else object)
+    valid = ~pd.isna(values) & (codes >= 0)
+    # la asignación con índices repetidos se queda con la última: se recorre al revés
+    idx = np.flatnonzero(valid)[::-1]
+    out[codes[idx]] = values[idx]
+    return out
+
+
+def build_category_cube(df: pd.DataFrame, categories: Sequence[str],
+                        totals: Optional[pd.DataFrame] = None) -> CategoryCube:
+    """Cubo de `df`, larga (`category`/`kt`) o ancha (una columna por categoría).
+
+    Las celdas de la tabla larga salen ordenadas por país y año (como el
+    `pivot_table` que sustituye); las de la ancha, en el orden del archivo.
+    El total es `e_waste_generated_kt` de `df` o, si no lo trae, el de
+    `totals` (tabla por country/year).
+    """
+    categories = tuple(categories)
+    long = 'category' in df.columns and 'kt' in df.columns
+    country = df['country'].to_numpy(dtype=object)
+    years = pd.to_numeric(df['year'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    valid = ~pd.isna(country) & ~np.isnan(years)
+    country_names, country_codes = np.unique(country[valid].astype(str), return_inverse=True)
+    year_values, year_codes = np.unique(years[valid], return_inverse=True)
+    C, Y, K = len(country_names), len(year_values), len(categories)
+    cell = np.full(len(df), -1, dtype=np.int64)
+    cell[valid] = country_codes * Y + year_codes
+
+    present = np.zeros(C * Y, dtype=bool)
+    present[cell[valid]] = True
+    if long:
+        order = np.flatnonzero(present)
+    else:
+        order = pd.unique(cell[valid])
+    cells = np.stack([order // Y, order % Y], axis=1).astype(np.intp) if len(order) else np.empty((0, 2), dtype=np.intp)
+
+    kt = np.full((C * Y, K), np.nan)
+    if long:
+        cat_codes = pd.Index(categories).get_indexer(df['category'].astype(object))
+        values = float_array(df['kt'])
+        rows = np.where((cat_codes >= 0) & (cell >= 0), cell * K + cat_codes, -1)
+        kt.reshape(-1)[:] = _first_valid(rows, values, C * Y * K, np.nan)
+    else:
+        for k, name in enumerate(categories):
+            if name in df.columns:
+                kt[:, k] = _first_valid(cell, float_array(df[name]), C * Y, np.nan)
+
+    if TOTAL_COLUMN in df.columns:
+        total = _first_valid(cell, float_array(df[TOTAL_COLUMN]), C * Y, np.nan)
+    elif totals is not None and not totals.empty and TOTAL_COLUMN in totals.columns:
+        t_country = totals['country'].astype(object).astype(str).to_numpy()
+        t_years = pd.to_numeric(totals['year'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        c_pos = pd.Index(country_names).get_indexer(t_country)
+        y_pos = pd.Index(year_values).get_indexer(t_years)
+        t_cell = np.where((c_pos >= 0) & (y_pos >= 0), c_pos * Y + y_pos, -1)
+        total = _first_valid(t_cell, float_array(totals[TOTAL_COLUMN]), C * Y, np.nan)
+    else:
+        total = np.full(C * Y, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = kt / np.where(total > 0, total, np.nan)[:, None]
+
+    if 'iso3' in df.columns:
+        iso3 = _first_valid(np.where(valid, cell // Y, -1), df['iso3'].to_numpy(dtype=object), C, None)
+    else:
+        iso3 = np.full(C, None, dtype=object)
+
+    year_ints = year_values.astype(np.int64)
+    year_cells = {int(year_ints[y]): cells[cells[:, 1] == y] for y in range(Y)}
+    arrays = [kt, share, total, cells] + list(year_cells.values())
+    for arr in arrays:
+        arr.setflags(write=False)
+    return CategoryCube(
+        countries=country_names.astype(object),
+        iso3=iso3,
+        years=year_ints,
+        categories=categories,
+        kt=kt.reshape(C, Y, K),
+        share=share.reshape(C, Y, K),
+        total=total.reshape(C, Y),
+        cells=cells,
+        year_cells=year_cells,
+    )
@@ -0,0 +1,225 @@
+"""Pares de categorías por país/año (`df_category_pairs`) y correlaciones entre shares.
+
+`df_category_pairs` es un producto cruzado: por cada (country, year) repite
+la fila de cada categoría de un lado (`x`) con cada categoría del otro (`y`).
+Viene en una de dos formas:
+- larga, con `pair_side`: filas alternas `x`, `y` forman un par;
+- ancha, con columnas `*_x`/`*_y` (una fila por par).
+
+Aquí se reduce a las filas únicas de cada lado más los índices de cada par
+(sin reconstruir la tabla explotada si está compactada), se deduplican los
+pares y se calculan, una vez por snapshot, las matrices de correlación entre
+los shares de las categorías a través de los países, por año y en conjunto.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_loader import normalize_country_key
+from serialization import float_array
+
+PAIR_SIDES = ('x', 'y')
+SIDE_COLUMNS = ('country', 'year', 'category', 'share', 'value')
+# mínimo de países con ambos shares para dar una correlación
+MIN_CORRELATION_COUNT = 3
+
+
+def pair_sides_from_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """(filas de lado, índice del lado x y del lado y de cada par) de la tabla explotada."""
+    if 'pair_side' in df.columns:
+        return _alternating_sides(df, np.arange(len(df), dtype=np.intp))
+    if 'category_x' in df.columns:
+        sides = [
+            df.reindex(columns=[c if c in ('country', 'year') else c + suffix for c in SIDE_COLUMNS]).set_axis(list(SIDE_COLUMNS), axis=1)
+            for suffix in ('_x', '_y')
+        ]
+        n = len(df)
+        return pd.concat(sides, ignore_index=True), np.arange(n, dtype=np.intp), np.arange(n, 2 * n, dtype=np.intp)
+    return pd.DataFrame(columns=list(SIDE_COLUMNS)), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+
+def pair_sides_from_compact(table) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Igual que `pair_sides_from_frame` sobre una `CompactTable`, sin reconstruirla."""
+    if 'pair_side' in table.columns and len(table.parts) == 1:
+        return _alternating_sides(table.tables['facts'], table.parts[0].codes)
+    if 'categories' in table.tables and len(table.parts) == 3:
+        _, x_part, y_part = table.parts
+        # la dimensión de categorías lleva las claves (country/year) y las columnas sin sufijo
+        return table.tables['categories'].reindex(columns=list(SIDE_COLUMNS)), x_part.codes, y_part.codes
+    return pair_sides_from_frame(table.reconstruct())
+
+
+def _alternating_sides(sides: pd.DataFrame, codes: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Pares de filas consecutivas (`x`, `y`); `codes[i]` es la fila de `sides` de la fila i."""
+    labels = sides['pair_side'].astype(object).to_numpy()[codes]
+    n = len(codes) // 2
+    if len(codes) % 2 or not ((labels[0:2 * n:2] == 'x').all() and (labels[1:2 * n:2] == 'y').all()):
+        raise ValueError("df_category_pairs: pair_side must alternate 'x', 'y'")
+    return sides.reindex(columns=list(SIDE_COLUMNS)), codes[0:2 * n:2], codes[1:2 * n:2]
+
+
+@dataclass(frozen=True)
+class CategoryPairs:
+    """Pares únicos ordenados por (país, año) y correlaciones entre shares por lado.
+
+    Los pares de la celda `cell = país * len(years) + año` son
+    `offsets[cell]:offsets[cell + 1]` en las columnas `pair_*`.
+    `correlation[lado]` es `(len(years) + 1, K, K)`: una matriz por año y,
+    en la última posición, la de todos los años juntos; `counts` el número de
+    observaciones de cada coeficiente.
+    """
+
+    countries: np.ndarray              # (C,) nombres
+    years: np.ndarray                  # (Y,) int
+    categories: Tuple[str, ...]        # (K,)
+    country_keys: Mapping[str, int]    # clave normalizada (nombre, ISO3...) -> país
+    offsets: np.ndarray                # (C * Y + 1,)
+    pair_country: np.ndarray           # (P,) posiciones de país
+    pair_year: np.ndarray              # (P,) posiciones de año
+    pair_category: Mapping[str, np.ndarray]   # lado -> (P,) códigos de categoría
+    pair_share: Mapping[str, np.ndarray]      # lado -> (P,)
+    pair_value: Mapping[str, np.ndarray]      # lado -> (P,)
+    share: Mapping[str, np.ndarray]           # lado -> (C, Y, K)
+    correlation: Mapping[str, np.ndarray]     # lado -> (Y + 1, K, K)
+    counts: Mapping[str, np.ndarray]          # lado -> (Y + 1, K, K)
+
+    def year_position(self, year: Optional[int]) -> Optional[int]:
+        """Posición de `year` en `years` (None si no hay datos de ese año)."""
+        pos = int(np.searchsorted(self.years, year)) if len(self.years) else 0
+        return pos if pos < len(self.years) and self.years[pos] == year else None
+
+    def pair_positions(self, countries: Optional[Sequence[int]], year: Optional[int]) -> np.ndarray:
+        """Posiciones de los pares de esos países (todos si None) y año (todos si None)."""
+        n_years = len(self.years)
+        c_pos = np.arange(len(self.countries)) if countries is None else np.asarray(countries, dtype=np.intp)
+        if year is None:
+            y_pos = np.arange(n_years)
+        else:
+            pos = self.year_position(year)
+            y_pos = np.array([], dtype=np.intp) if pos is None else np.array([pos])
+        cells = (c_pos[:, None] * n_years + y_pos[None, :]).ravel()
+        starts, stops = self.offsets[cells], self.offsets[cells + 1]
+        if not len(cells):
+            return np.empty(0, dtype=np.intp)
+        lengths = stops - starts
+        # concatenación de rangos [start, stop) sin bucle de Python
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+def _first_valid(codes: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Por código, el primer valor no NaN en orden de fila."""
+    out = np.full(size, np.nan)
+    idx = np.flatnonzero(~np.isnan(values) & (codes >= 0))[::-1]
+    out[codes[idx]] = values[idx]
+    return out
+
+
+def _pearson(groups: np.ndarray, min_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Correlaciones `(G, K, K)` de `groups` `(G, N, K)` (NaN = falta), pairwise complete."""
+    present = ~np.isnan(groups)
+    x = np.where(present, groups, 0.0)
+    m = present.astype('float64')
+    n = np.einsum('gia,gib->gab', m, m)
+    sa = np.einsum('gia,gib->gab', x, m)      # suma de a donde también hay b
+    saa = np.einsum('gia,gib->gab', x * x, m)
+    sab = np.einsum('gia,gib->gab', x, x)
+    sb, sbb = sa.transpose(0, 2, 1), saa.transpose(0, 2, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sab - sa * sb / n
+        var = (saa - sa * sa / n) * (sbb - sb * sb / n)
+        r = cov / np.sqrt(var)
+    r = np.where((n >= min_count) & (var > 1e-24), np.clip(r, -1.0, 1.0), np.nan)
+    return r, n.astype(np.int64)
+
+
+def share_correlations(share: np.ndarray, min_count: int = MIN_CORRELATION_COUNT) -> Tuple[np.ndarray, np.ndarray]:
+    """Correlación de Pearson entre categorías a través de los países, por año y en conjunto.
+
+    `share` es `(C, Y, K)` con NaN donde falta. Cada coeficiente usa los
+    países con ambos shares; las sumas salen de productos matriciales sobre
+    todos los años a la vez. Devuelve `(Y + 1, K, K)` coeficientes (NaN con
+    menos de `min_count` observaciones o varianza nula; la última matriz
+    junta todas las filas país/año) y sus cuentas.
+    """
+    C, Y, K = share.shape
+    by_year, n_year = _pearson(share.transpose(1, 0, 2), min_count)
+    pooled, n_pooled = _pearson(share.reshape(1, C * Y, K), min_count)
+    return np.concatenate([by_year, pooled]), np.concatenate([n_year, n_pooled])
+
+
+def build_category_pairs(sides: pd.DataFrame, x_idx: np.ndarray, y_idx: np.ndarray,
+                         aliases: Optional[Mapping[str, Iterable[str]]] = None) -> CategoryPairs:
+    """`CategoryPairs` de las filas de lado `sides` y los pares `(x_idx[i], y_idx[i])`.
+
+    `aliases` (clave de país normalizada -> claves extra, como
+    `snapshot.country_aliases`) permite filtrar por ISO3.
+    """
+    # pares únicos, en orden de primera aparición
+    n_sides = max(len(sides), 1)
+    _, first = np.unique(x_idx.astype(np.int64) * n_sides + y_idx, return_index=True)
+    keep = np.sort(first)
+    x_idx, y_idx = x_idx[keep], y_idx[keep]
+
+    country = sides['country'].astype(object).to_numpy()
+    year = pd.to_numeric(sides['year'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    category = sides['category'].astype(object).to_numpy()
+    valid = ~pd.isna(country) & ~np.isnan(year) & ~pd.isna(category)
+    country_code = np.full(len(sides), -1, dtype=np.intp)
+    year_code = np.full(len(sides), -1, dtype=np.intp)
+    countries, country_code[valid] = np.unique(country[valid].astype(str), return_inverse=True)
+    years, year_code[valid] = np.unique(year[valid], return_inverse=True)
+    # categorías en orden de primera aparición
+    categories = tuple(pd.unique(category[valid].astype(str)))
+    category_code = np.full(len(sides), -1, dtype=np.intp)
+    category_code[valid] = pd.Index(categories).get_indexer(category[valid].astype(str))
+    C, Y, K = len(countries), len(years), len(categories)
+
+    share = float_array(sides['share']) if 'share' in sides.columns else np.full(len(sides), np.nan)
+    value = float_array(sides['value']) if 'value' in sides.columns else np.full(len(sides), np.nan)
+
+    ok = valid[x_idx] & valid[y_idx] & (country_code[x_idx] == country_code[y_idx]) & (year_code[x_idx] == year_code[y_idx])
+    x_idx, y_idx = x_idx[ok], y_idx[ok]
+    cell = country_code[x_idx] * Y + year_code[x_idx]
+    order = np.argsort(cell, kind='stable')
+    x_idx, y_idx, cell = x_idx[order], y_idx[order], cell[order]
+    offsets = np.zeros(C * Y + 1, dtype=np.intp)
+    np.cumsum(np.bincount(cell, minlength=C * Y), out=offsets[1:])
+
+    planes, correlation, counts = {}, {}, {}
+    for side, idx in zip(PAIR_SIDES, (x_idx, y_idx)):
+        side_rows = np.unique(idx)
+        codes = (country_code[side_rows] * Y + year_code[side_rows]) * K + category_code[side_rows]
+        plane = _first_valid(codes, share[side_rows], C * Y * K).reshape(C, Y, K)
+        planes[side] = plane
+        correlation[side], counts[side] = share_correlations(plane)
+
+    country_keys: Dict[str, int] = {}
+    for pos, name in enumerate(countries):
+        key = normalize_country_key(name)
+        country_keys[key] = pos
+        for alias in (aliases or {}).get(key, ()):
+            country_keys.setdefault(alias, pos)
+
+    result = dict(
+        pair_country=country_code[x_idx], pair_year=year_code[x_idx],
+        pair_category={'x': category_code[x_idx], 'y': category_code[y_idx]},
+        pair_share={'x': share[x_idx], 'y': share[y_idx]},
+        pair_value={'x': value[x_idx], 'y': value[y_idx]},
+    )
+    for arr in [offsets, *planes.values(), *correlation.values(), *counts.values(),
+                result['pair_country'], result['pair_year'],
+                *(a for key in ('pair_category', 'pair_share', 'pair_value') for a in result[key].values())]:
+        arr.setflags(write=False)
+    return CategoryPairs(
+        countries=countries.astype(object),
+        years=years.astype(np.int64),
+        categories=categories,
+        country_keys=country_keys,
+        offsets=offsets,
+        share=planes,
+        correlation=correlation,
+        counts=counts,
+        **result,
+    )
@@ -0,0 +1,170 @@
+"""Formato columnar binario para los datasets de `data/`: un `.npy` por columna + manifest.
+
+Estructura en disco (por dataset):
+
+    <columnar_dir>/<dataset>/manifest.json
+    <columnar_dir>/<dataset>/<build_id>/c0.npy, c1.npy, ...
+
+Las columnas numéricas se abren con `np.load(mmap_mode='r')`, así que no se
+parsea texto y las páginas se comparten entre procesos vía page cache. Los
+textos se guardan codificados como diccionario (códigos int32 + categorías en
+el manifest) y conservan su dtype (`object`, `str` o `string`); las columnas
+`category` conservan sus códigos y se abren como `Categorical` sobre el mismo
+mapa, sin copiar. Los nullable (`Int64`, `Float64`, `boolean`) se guardan como
+valores + máscara, y las columnas `object` que no son solo texto se guardan
+tal cual (pickle de numpy, sin mmap). El manifest registra tamaño,
+mtime y sha256 del JSON de origen (si lo hay): si el JSON cambia, el binario
+se considera obsoleto y se ignora.
+
+Cada build escribe en un subdirectorio nuevo y reemplaza el manifest de forma
+atómica, de modo que nunca se trunca un archivo que otro proceso tenga mapeado.
+"""
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+MASKED_ARRAYS = {'b': pd.arrays.BooleanArray, 'f': pd.arrays.FloatingArray}
+
+
+def columnar_enabled() -> bool:
+    """`DATA_COLUMNAR=0` desactiva la lectura del formato binario."""
+    return os.environ.get('DATA_COLUMNAR', '1') != '0'
+
+
+def columnar_root(data_dir: Path) -> Path:
+    """Directorio raíz del formato binario (`DATA_COLUMNAR_DIR` o `data/columnar`)."""
+    override = os.environ.get('DATA_COLUMNAR_DIR')
+    return Path(override) if override else data_dir / 'columnar'
+
+
+def _source_stat(source: Path) -> dict:
+    st = source.stat()
+    return {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+
+def _all_str(values: pd.Series) -> bool:
+    """¿Columna de texto? `str`/`string`, u `object` cuyos valores no nulos son todos `str`."""
+    if isinstance(values.dtype, pd.StringDtype):
+        return True
+    return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty')
+
+
+def write_columnar(df: pd.DataFrame, target: Path, source: Optional[Path] = None, source_sha256: Optional[str] = None) -> Path:
+    """Escribe `df` en `target` (directorio del dataset) y devuelve la ruta del manifest.
+
+    Sin `source` el manifest no lleva datos de origen (p.ej. snapshots compartidos,
+    que se validan por versión y no con `is_fresh`).
+    """
+    build_id = uuid.uuid4().hex[:12]
+    build_dir = target / build_id
+    build_dir.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        values = df[name]
+        entry = {'name': str(name), 'file': f'c{i}.npy'}
+        dtype = values.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            # códigos tal cual (int8/int16/... según pandas) para abrirlos sin copia
+            entry['kind'] = 'categorical'
+            entry['categories'] = [str(c) for c in dtype.categories]
+            entry['categories_dtype'] = str(dtype.categories.dtype)
+            entry['ordered'] = bool(dtype.ordered)
+            np.save(build_dir / entry['file'], values.cat.codes.to_numpy())
+        elif isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+            entry['kind'] = 'numpy'
+            np.save(build_dir / entry['file'], values.to_numpy())
+        elif pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+            # enteros/booleanos/floats nullable (p.ej. `year` Int64, Float64): valores + máscara
+            entry['kind'] = 'masked'
+            entry['dtype'] = str(dtype)
+            entry['mask_file'] = f'c{i}_mask.npy'
+            np.save(build_dir / entry['file'], values.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+            np.save(build_dir / entry['mask_file'], values.isna().to_numpy())
+        elif _all_str(values):
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            entry['kind'] = 'dictionary'
+            entry['dtype'] = str(dtype)
+            entry['categories'] = list(uniques)
+            np.save(build_dir / entry['file'], codes.astype(np.int32))
+        else:
+            # objetos que no son todos texto (números, bools, mezclas): tal cual, sin mmap
+            entry['kind'] = 'object'
+            np.save(build_dir / entry['file'], values.to_numpy(dtype=object), allow_pickle=True)
+        columns.append(entry)
+    manifest = {
+        'format': FORMAT_VERSION,
+        'build': build_id,
+        'rows': len(df),
+        'columns': columns,
+    }
+    if source is not None:
+        manifest.update(source=source.name, source_sha256=source_sha256, **_source_stat(source))
+    tmp = target / f'{MANIFEST_NAME}.{build_id}.tmp'
+    tmp.write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp, target / MANIFEST_NAME)
+    # los builds anteriores ya no se referencian; borrar un archivo mapeado es seguro en POSIX
+    for old in target.iterdir():
+        if old.is_dir() and old.name != build_id:
+            shutil.rmtree(old, ignore_errors=True)
+    return target / MANIFEST_NAME
+
+
+def read_manifest(target: Path) -> Optional[dict]:
+    path = target / MANIFEST_NAME
+    if not path.exists():
+        return None
+    try:
+        manifest = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def is_fresh(manifest: dict, source: Path, digest) -> bool:
+    """¿El binario corresponde al JSON actual? Tamaño+mtime y, si no cuadran, sha256."""
+    if not source.exists():
+        return False
+    stat = _source_stat(source)
+    if stat['source_size'] != manifest.get('source_size'):
+        return False
+    if stat['source_mtime_ns'] == manifest.get('source_mtime_ns'):
+        return True
+    return digest(source) == manifest.get('source_sha256')
+
+
+def read_columnar(target: Path, manifest: dict) -> pd.DataFrame:
+    """Abre las columnas de `manifest` mapeadas en memoria (solo lectura)."""
+    build_dir = target / manifest['build']
+    data = {}
+    for entry in manifest['columns']:
+        kind = entry['kind']
+        if kind == 'object':
+            data[entry['name']] = pd.Series(np.load(build_dir / entry['file'], allow_pickle=True), dtype=object)
+            continue
+        values = np.load(build_dir / entry['file'], mmap_mode='r')
+        if kind == 'numpy':
+            data[entry['name']] = values
+        elif kind == 'categorical':
+            categories = pd.Index(entry['categories'], dtype=entry.get('categories_dtype', 'str'))
+            dtype = pd.CategoricalDtype(categories, ordered=entry['ordered'])
+            data[entry['name']] = pd.Categorical.from_codes(values, dtype=dtype)
+        elif kind == 'masked':
+            mask = np.load(build_dir / entry['mask_file'], mmap_mode='r')
+            array_type = MASKED_ARRAYS.get(values.dtype.kind, pd.arrays.IntegerArray)
+            data[entry['name']] = array_type(values, mask)
+        else:
+            categories = np.empty(len(entry['categories']) + 1, dtype=object)
+            categories[:-1] = entry['categories']
+            categories[-1] = None  # código -1 (NA) apunta al último elemento
+            data[entry['name']] = pd.Series(categories.take(np.asarray(values)), dtype=entry['dtype'])
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,212 @@
+"""Búsqueda de países para autocompletado: trie de prefijos + índice de trigramas.
+
+Cada país se indexa por todos sus nombres: `country`, `country_clean`,
+`iso3`, el nombre corto (sin el paréntesis: "Bolivia") y los nombres en
+español del frontend (`SPANISH_COUNTRY_NAMES`: "Perú", "Panamá"...). Todo se
+compara plegado (`fold`): sin tildes, en minúsculas y con la puntuación como
+espacio, así que "peru", "PERÚ" y "Perú" son lo mismo.
+
+Orden de los resultados: coincidencia exacta, prefijo del nombre, prefijo de
+una palabra del nombre ("plurinational" -> Bolivia) y, si faltan, parecidos
+por trigramas (errores de tecleo: "urugay" -> Uruguay).
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# ISO3 -> nombres en español usados en el frontend
+SPANISH_COUNTRY_NAMES = {
+    'ARG': ('Argentina',),
+    'BLZ': ('Belice',),
+    'BOL': ('Bolivia',),
+    'BRA': ('Brasil',),
+    'CHL': ('Chile',),
+    'COL': ('Colombia',),
+    'CRI': ('Costa Rica',),
+    'CUB': ('Cuba',),
+    'DOM': ('República Dominicana',),
+    'ECU': ('Ecuador',),
+    'GTM': ('Guatemala',),
+    'HND': ('Honduras',),
+    'MEX': ('México',),
+    'NIC': ('Nicaragua',),
+    'PAN': ('Panamá',),
+    'PER': ('Perú',),
+    'PRY': ('Paraguay',),
+    'SLV': ('El Salvador',),
+    'URY': ('Uruguay',),
+    'VEN': ('Venezuela', 'República Bolivariana de Venezuela'),
+}
+
+# tipos de coincidencia, de mejor a peor
+MATCH_KINDS = ('exact', 'prefix', 'word', 'fuzzy')
+# similitud mínima (Dice sobre trigramas) para sugerir un país parecido
+FUZZY_MIN_SCORE = 0.3
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def strip_accents(text: str) -> str:
+    """Quita tildes y diacríticos: "Perú" -> "Peru"."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def fold_key(value: str) -> str:
+    """Clave de país como la de `data_loader.normalize_country_key` (trim + casefold, sin tildes)."""
+    return strip_accents(str(value)).strip().casefold()
+
+
+def fold(text: str) -> str:
+    """Forma de comparación: sin tildes, casefold y puntuación como un espacio."""
+    return _NON_ALNUM.sub(' ', strip_accents(text).casefold()).strip()
+
+
+def short_name(name: str) -> str:
+    """Nombre sin la parte entre paréntesis: "Chile (Republic of)" -> "Chile"."""
+    return name.split('(', 1)[0].strip()
+
+
+def country_names(country: str, iso3: Optional[str] = None, extra: Iterable[str] = ()) -> List[str]:
+    """Todos los nombres de un país sin repetir, el del dataset primero.
+
+    Incluye el nombre corto, el ISO3, los nombres en español y los de `extra`
+    (p.ej. `country_clean`) que no coincidan ya, plegados, con uno anterior.
+    """
+    names = [country, short_name(country), iso3.upper() if iso3 else None]
+    names += list(SPANISH_COUNTRY_NAMES.get(iso3.upper(), ()) if iso3 else ())
+    seen, out = set(), []
+    for name in names:
+        if name and name not in out:
+            out.append(name)
+            seen.add(fold(name))
+    for name in extra:
+        if fold(name) not in seen:
+            out.append(name)
+            seen.add(fold(name))
+    return out
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'matches')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        # país -> (tipo, nombre) de la mejor coincidencia que pasa por este nodo
+        self.matches: Dict[int, Tuple[int, str]] = {}
+
+
+class CountrySearchIndex:
+    """Índice de búsqueda sobre `entries`: `(country, iso3, nombres)` por país."""
+
+    def __init__(self, entries: Sequence[Tuple[str, Optional[str], Sequence[str]]]):
+        self.entries = tuple((country, iso3, tuple(names)) for country, iso3, names in entries)
+        self._root = _TrieNode()
+        self._exact: Dict[str, Dict[int, List[str]]] = {}
+        self._grams: Dict[str, Dict[int, List[int]]] = {}
+        self._folded: List[List[Tuple[str, str]]] = []
+        for cid, (_, _, names) in enumerate(self.entries):
+            folded = [(fold(n), n) for n in names]
+            self._folded.append(folded)
+            for nid, (key, name) in enumerate(folded):
+                self._exact.setdefault(key, {}).setdefault(cid, []).append(name)
+                self._insert(key, cid, MATCH_KINDS.index('prefix'), name)
+                for start in (m.start() for m in re.finditer(r' ', key)):
+                    self._insert(key[start + 1:], cid, MATCH_KINDS.index('word'), name)
+                for gram in _trigrams(key):
+                    self._grams.setdefault(gram, {}).setdefault(cid, []).append(nid)
+
+    def _insert(self, key: str, cid: int, kind: int, name: str) -> None:
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            best = node.matches.get(cid)
+            if best is None or (kind, len(name)) < (best[0], len(best[1])):
+                node.matches[cid] = (kind, name)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Hasta `limit` países para `query`, mejor coincidencia primero."""
+        q = fold(query)
+        if not q or limit <= 0:
+            return []
+        found: Dict[int, Tuple[int, float, str]] = {}
+        typed = query.strip().casefold()
+        for cid, names in self._exact.get(q, {}).items():
+            # con varios nombres iguales tras plegar, el escrito tal cual ("Perú" frente a "Peru")
+            found[cid] = (0, 1.0, next((n for n in names if n.casefold() == typed), names[0]))
+        node = self._root
+        for ch in q:
+            node = node.children.get(ch)
+            if node is None:
+                break
+        else:
+            for cid, (kind, name) in node.matches.items():
+                if cid not in found:
+                    found[cid] = (kind, len(q) / len(fold(name)), name)
+        if len(found) < limit:
+            self._fuzzy(q, found)
+        ranked = sorted(found.items(), key=lambda item: (item[1][0], -item[1][1], self.entries[item[0]][0]))
+        return [
+            {
+                'country': self.entries[cid][0],
+                'iso3': self.entries[cid][1],
+                'match': name,
+                'kind': MATCH_KINDS[kind],
+                'score': round(score, 4),
+            }
+            for cid, (kind, score, name) in ranked[:limit]
+        ]
+
+    def _fuzzy(self, q: str, found: Dict[int, Tuple[int, float, str]]) -> None:
+        """Añade a `found` los países con algún nombre parecido a `q` (Dice sobre trigramas)."""
+        grams = _trigrams(q)
+        shared: Dict[Tuple[int, int], int] = {}
+        for gram in grams:
+            for cid, name_ids in self._grams.get(gram, {}).items():
+                for nid in name_ids:
+                    shared[(cid, nid)] = shared.get((cid, nid), 0) + 1
+        kind = MATCH_KINDS.index('fuzzy')
+        for (cid, nid), count in shared.items():
+            if cid in found and found[cid][0] < kind:
+                continue
+            key, name = self._folded[cid][nid]
+            score = 2.0 * count / (len(grams) + len(_trigrams(key)))
+            if score >= FUZZY_MIN_SCORE and (cid not in found or score > found[cid][1]):
+                found[cid] = (kind, score, name)
+
+
+def build_search_index(countries: Iterable[str], aliases: Mapping[str, Iterable[str]],
+                       iso3_codes: Mapping[str, str]) -> CountrySearchIndex:
+    """Índice sobre los países de un dataset.
+
+    `aliases` es el mapa de `data_loader` (clave normalizada del país ->
+    claves extra) e `iso3_codes` el ISO3 de cada país según la columna `iso3`
+    del dataset (`data_loader.country_iso3_codes`). Un nombre que, plegado,
+    coincide con el de otro país (el nombre corto "Congo" de la República
+    Democrática frente al país "Congo") no se indexa para ninguno de los dos
+    salvo como nombre propio del país del dataset.
+    """
+    entries = []
+    for country in sorted(set(countries)):
+        key = fold_key(country)
+        iso3 = iso3_codes.get(key)
+        others = [a for a in aliases.get(key, ()) if not iso3 or a != iso3.casefold()]
+        entries.append((country, iso3, country_names(country, iso3, others)))
+    own = {fold(country): country for country, _, _ in entries}
+    owners: Dict[str, set] = {}
+    for country, _, names in entries:
+        for name in names:
+            owners.setdefault(fold(name), set()).add(country)
+    entries = [
+        (country, iso3, [
+            n for n in names
+            if n == country or (len(owners[fold(n)]) == 1 and own.get(fold(n), country) == country)
+        ])
+        for country, iso3, names in entries
+    ]
+    return CountrySearchIndex(entries)
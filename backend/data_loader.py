@@ -1,10 +1,48 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+from columnar import columnar_enabled, columnar_root, is_fresh, read_columnar, read_manifest, write_columnar
+from country_search import SPANISH_COUNTRY_NAMES, short_name, strip_accents
+
+logger = logging.getLogger(__name__)
+
+# datasets de `data/` (un `<nombre>.json` cada uno)
+DATASET_NAMES = (
+    'df_country_year',
+    'df_category_long',
+    'df_category_pairs',
+    'master_dataset_normalized',
+    'master_final_dataset',
+)
+
 
 @lru_cache(maxsize=1)
 def get_data_dir() -> Path:
+    # `DATA_DIR` apunta a otra carpeta con los mismos JSON (p.ej. datos
+    # sintéticos de `scripts/scale_dataset.py` para benchmarks)
+    override = os.environ.get('DATA_DIR')
+    if override:
+        return Path(override).resolve()
     # resuelve la ruta relativa: Code/limbo/backend -> ../data
     current = Path(__file__).resolve()
     # `current` is .../Code/limbo/backend/data_loader.py
@@ -14,10 +52,112 @@ def get_data_dir() -> Path:
     return data_dir
 
 
-def _read_csv(path: Path, **kwargs) -> pd.DataFrame:
-    df = pd.read_csv(path, **kwargs)
-    # strip column names
-    df.columns = [c.strip() for c in df.columns]
+# --- Esquema canónico -------------------------------------------------------
+
+# Columna canónica -> alias conocidos, en orden de preferencia.
+# Además de estos alias, `canonical_columns` reconoce automáticamente las
+# variantes en mayúsculas (`E_waste_generated_kt`) y los restos de merges
+# (`e_waste_generated_kt_x`, `e_waste_generated_kt_y`) de cada nombre.
+# Para soportar un alias nuevo basta con añadirlo aquí.
+COLUMN_ALIASES = {
+    'population': (),
+    'gdp_per_capita': (),
+    'e_waste_generated_kt': (),
+    'e_waste_generated_per_capita': ('ewaste_generated_kg_inh',),
+    'e_waste_collection_rate': ('ewaste_management_collection_rate',),
+    'e_waste_formally_collected_kt': ('ewaste_formally_collected_kg_inh',),
+    'e_waste_exported_kt': (),
+    'e_waste_imported_kt': (),
+    'eee_put_on_market_kt': (),
+    'eee_placed_on_market_kg_inh': (),
+    'temperature_exchange_equipment_kt': (),
+    'screens_kt': (),
+    'lamps_kt': (),
+    'large_equipment_kt': (),
+    'small_equipment_kt': (),
+    'small_it_kt': (),
+}
+
+# columnas de texto que se usan como clave (se les quitan espacios sobrantes)
+STRING_KEY_COLUMNS = ('country', 'country_clean', 'iso3', 'category')
+
+
+def _alias_candidates(canonical: str, aliases, columns) -> list:
+    """Columnas de `columns` que alimentan `canonical`, en orden de preferencia."""
+    by_lower = {}
+    for c in columns:
+        by_lower.setdefault(c.lower(), []).append(c)
+    found = []
+    for name in (canonical,) + tuple(aliases):
+        for variant in (name, name + '_x', name + '_y'):
+            # el nombre exacto primero, luego variantes que solo difieren en mayúsculas
+            exact = [variant] if variant in columns else []
+            for c in exact + sorted(by_lower.get(variant.lower(), [])):
+                if c not in found:
+                    found.append(c)
+    return found
+
+
+@lru_cache(maxsize=64)
+def canonical_columns(columns: Tuple[str, ...]) -> Mapping[str, Tuple[str, ...]]:
+    """Columna canónica -> columnas de `columns` que la alimentan, en orden de preferencia.
+
+    Solo aparecen las métricas con al menos una columna de origen.
+    """
+    lookup = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        sources = _alias_candidates(name, aliases, columns)
+        if sources:
+            lookup[name] = tuple(sources)
+    return MappingProxyType(lookup)
+
+
+def _needs_fill(df: pd.DataFrame, sources: Tuple[str, ...]) -> bool:
+    return len(sources) > 1 and bool(df[sources[0]].isna().any())
+
+
+def canonical_series(df: pd.DataFrame, sources: Tuple[str, ...]) -> pd.Series:
+    """Valores float64 de una métrica: su primera columna de origen, completada con las siguientes.
+
+    La coalescencia es vectorizada y respeta los ceros: 0.0 es un valor
+    válido, no un faltante. Lo que no es numérico queda como NaN.
+    """
+    values = pd.to_numeric(df[sources[0]], errors='coerce').astype('float64')
+    if not _needs_fill(df, sources):
+        return values
+    for src in sources[1:]:
+        values = values.fillna(pd.to_numeric(df[src], errors='coerce').astype('float64'))
+    return values
+
+
+def canonical_view(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` con las métricas accesibles por su nombre canónico (`COLUMN_ALIASES`).
+
+    Es una vista para los handlers: el frame de origen no se toca (`/data/table`
+    y `/data/export` siguen sirviendo sus columnas y tipos originales). En la
+    vista cada métrica es float64 (`canonical_series`); las que ya lo son, con
+    el nombre canónico y sin huecos que rellenar, se comparten con el origen.
+    """
+    if df.empty:
+        return df
+    resolved = {}
+    for name, sources in canonical_columns(tuple(df.columns)).items():
+        if sources[0] != name or df[name].dtype != np.float64 or _needs_fill(df, sources):
+            resolved[name] = canonical_series(df, sources)
+    return df.assign(**resolved) if resolved else df
+
+
+def normalize_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpia las columnas de texto clave (`STRING_KEY_COLUMNS`) una sola vez por carga.
+
+    No añade ni convierte columnas: los nombres canónicos de las métricas se
+    resuelven aparte, con `canonical_columns` / `canonical_view`.
+    """
+    if df.empty:
+        return df
+    for col in STRING_KEY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('string').str.strip()
     return df
 
 
@@ -29,77 +169,950 @@ def _read_json(path: Path, **kwargs) -> pd.DataFrame:
     return df
 
 
-@lru_cache(maxsize=1)
-def load_df_country_year() -> pd.DataFrame:
-    """Carga la tabla `df_country_year.csv`: una fila por (country, year) con métricas macro."""
-    data_dir = get_data_dir()
-    # Prefer JSON-only workflow: read df_country_year.json. If absent, return empty DataFrame.
-    jpath = data_dir / "df_country_year.json"
-    if not jpath.exists():
-        return pd.DataFrame()
-    df = _read_json(jpath)
+def _read_json_dataset(path: Path) -> pd.DataFrame:
+    df = _read_json(path)
     if 'year' in df.columns:
         df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
     return df
 
 
-@lru_cache(maxsize=1)
-def load_df_category_long() -> pd.DataFrame:
-    """Carga `df_category_long.csv`: formato largo por categoría (country, year, category, kt, share)."""
-    data_dir = get_data_dir()
-    jpath = data_dir / "df_category_long.json"
+def _read_dataset(path: Path) -> pd.DataFrame:
+    """Lee un dataset desde su formato columnar binario (mmap) si existe y está al día; si no, el JSON."""
+    if columnar_enabled():
+        target = columnar_root(path.parent) / path.stem
+        manifest = read_manifest(target)
+        if manifest is not None and is_fresh(manifest, path, file_digest):
+            return read_columnar(target, manifest)
+    return _read_json_dataset(path)
+
+
+def _load_dataset(name: str) -> pd.DataFrame:
+    """Lee y normaliza `<name>.json` (o su formato columnar); DataFrame vacío si no existe."""
+    jpath = get_data_dir() / f"{name}.json"
     if not jpath.exists():
         return pd.DataFrame()
-    df = _read_json(jpath)
-    if 'year' in df.columns:
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    # asegurar nombres limpios
-    df.rename(columns=lambda c: c.strip(), inplace=True)
-    return df
+    return normalize_schema(_read_dataset(jpath))
+
+
+# --- Representación compacta en memoria -------------------------------------
+
+# Una columna de texto pasa a categórica si tiene como mucho esta fracción de
+# valores distintos (países, categorías, ISO3, archivo de origen...).
+CATEGORICAL_MAX_RATIO = 0.5
+# Enteros que se reducen al tipo más pequeño; las métricas enteras (`kt`) se
+# dejan en 64 bits para no arriesgar desbordes en sumas/restas.
+SMALL_INT_COLUMNS = ('year',)
+# Con float32 solo se reducen columnas cuyos valores quedan por debajo de 2**24
+# (enteros exactos); `population` y similares se quedan en float64.
+FLOAT32_MAX_MAGNITUDE = 2 ** 24
+_NULLABLE_INT_TYPES = ('Int8', 'Int16', 'Int32', 'Int64')
+_NUMPY_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def float_precision() -> int:
+    """`DATA_FLOAT_PRECISION=32` guarda las métricas en float32 (la mitad de memoria, ~7 dígitos)."""
+    return 32 if os.environ.get('DATA_FLOAT_PRECISION', '64') == '32' else 64
+
+
+def _is_text(values: pd.Series) -> bool:
+    dtype = values.dtype
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+
+def _smallest_int(values: pd.Series) -> pd.Series:
+    """Entero más pequeño que representa todos los valores (nullable si lo era)."""
+    if values.isna().all():
+        return values
+    low, high = int(values.min()), int(values.max())
+    nullable = isinstance(values.dtype, pd.api.extensions.ExtensionDtype)
+    for i, numpy_type in enumerate(_NUMPY_INT_TYPES):
+        info = np.iinfo(numpy_type)
+        if info.min <= low and high <= info.max:
+            return values.astype(_NULLABLE_INT_TYPES[i] if nullable else numpy_type)
+    return values
+
+
+def optimize_dtypes(df: pd.DataFrame, precision: Optional[int] = None) -> pd.DataFrame:
+    """Tipos compactos para un dataset ya normalizado.
+
+    - texto con pocos valores distintos -> `category` (categorías ordenadas
+      alfabéticamente, así que ordenar por la columna sigue siendo alfabético);
+    - `SMALL_INT_COLUMNS` (`year` Int64) -> el entero más pequeño que los
+      contiene, conservando el NA de los nullable;
+    - floats -> float32 solo si `precision` (o `DATA_FLOAT_PRECISION`) es 32 y
+      la columna no supera `FLOAT32_MAX_MAGNITUDE`.
+    """
+    if df.empty:
+        return df
+    precision = precision or float_precision()
+    data = {}
+    for col in df.columns:
+        values = df[col]
+        dtype = values.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            pass
+        elif _is_text(values):
+            if values.nunique(dropna=True) <= max(1, CATEGORICAL_MAX_RATIO * len(values)):
+                values = values.astype('category')
+        elif col in SMALL_INT_COLUMNS and pd.api.types.is_integer_dtype(dtype):
+            values = _smallest_int(values)
+        elif precision == 32 and isinstance(dtype, np.dtype) and dtype == np.float64 and values.abs().max() < FLOAT32_MAX_MAGNITUDE:
+            values = values.astype(np.float32)
+        data[col] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Memoria de `df` (incluye el contenido de las cadenas)."""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def load_df_country_year() -> pd.DataFrame:
+    """Carga la tabla `df_country_year.csv`: una fila por (country, year) con métricas macro."""
+    return current_snapshot().frame('df_country_year')
+
+
+def load_df_category_long() -> pd.DataFrame:
+    """Carga `df_category_long.csv`: formato largo por categoría (country, year, category, kt, share)."""
+    return current_snapshot().frame('df_category_long')
 
 
-@lru_cache(maxsize=1)
 def load_df_category_pairs() -> pd.DataFrame:
     """Carga `df_category_pairs.csv` si existe (pares de categorías)."""
-    data_dir = get_data_dir()
-    jpath = data_dir / "df_category_pairs.json"
-    if not jpath.exists():
-        return pd.DataFrame()
-    df = _read_json(jpath)
-    if 'year' in df.columns:
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    return df
+    return current_snapshot().frame('df_category_pairs')
 
 
-@lru_cache(maxsize=1)
 def load_master_normalized() -> pd.DataFrame:
     """Carga `master_dataset_normalized.csv` si se prefiere usar un único archivo normalizado."""
-    data_dir = get_data_dir()
-    jpath = data_dir / "master_dataset_normalized.json"
-    if not jpath.exists():
-        return pd.DataFrame()
-    df = _read_json(jpath)
-    if 'year' in df.columns:
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    return df
-    if 'year' in df.columns:
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    return df
+    return current_snapshot().frame('master_dataset_normalized')
 
 
-@lru_cache(maxsize=1)
 def load_master_final_fallback() -> pd.DataFrame:
     """Fallback para cargas antiguas: `master_final_dataset.csv` (denormalizado).
     Usar solo si no existen los datasets normalizados.
     """
-    data_dir = get_data_dir()
-    jpath = data_dir / "master_final_dataset.json"
-    if not jpath.exists():
-        return pd.DataFrame()
-    df = _read_json(jpath)
-    if 'year' in df.columns:
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    return df
+    return current_snapshot().frame('master_final_dataset')
+
+
+def load_master_final_facts() -> pd.DataFrame:
+    """Filas macro únicas de `master_final_dataset` (una por país/año, sin columnas de par).
+
+    No reconstruye la tabla explotada: usar en lugar de `load_master_final_fallback`
+    cuando no hacen falta las columnas `*_x`/`*_y`.
+    """
+    return current_snapshot().master_final_facts()
+
+
+# --- Índice de países -------------------------------------------------------
+
+# columnas cuyos valores sirven como clave de búsqueda de país
+COUNTRY_KEY_COLUMNS = ('country', 'country_clean', 'iso3')
+
+
+def normalize_country_key(value) -> Optional[str]:
+    """Normaliza un nombre o código de país para búsquedas: trim + casefold, sin tildes.
+
+    " Ecuador", "ECUADOR" y "ecuador" producen la misma clave; "Perú" y "Peru" también.
+    """
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    key = strip_accents(str(value)).strip().casefold()
+    return key or None
+
+
+def _normalized_keys(values: pd.Series) -> pd.Series:
+    # NFKD + quitar las marcas combinantes (U+0300-U+036F), como strip_accents
+    folded = values.astype('string').str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True)
+    return folded.str.strip().str.casefold().replace('', pd.NA)
+
+
+class CountryIndex:
+    """Índice clave de país -> posiciones de fila (iloc) ordenadas por año.
+
+    Se construye una vez por carga del dataset; cada búsqueda es O(1).
+    """
+
+    def __init__(self, positions: Dict[str, np.ndarray]):
+        self._positions = positions
+
+    def lookup(self, country: Optional[str]) -> np.ndarray:
+        key = normalize_country_key(country)
+        if key is None:
+            return _EMPTY_POSITIONS
+        return self._positions.get(key, _EMPTY_POSITIONS)
+
+    def keys(self) -> Iterable[str]:
+        return self._positions.keys()
+
+    def __contains__(self, country) -> bool:
+        return normalize_country_key(country) in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+_EMPTY_POSITIONS = np.empty(0, dtype=np.intp)
+_EMPTY_POSITIONS.setflags(write=False)
+
+
+def build_country_index(df: pd.DataFrame, aliases: Optional[Dict[str, Iterable[str]]] = None) -> CountryIndex:
+    """Construye un `CountryIndex` sobre `df`.
+
+    Las claves son `country`, `country_clean` e `iso3` normalizados (si existen).
+    `aliases` permite añadir claves extra por país (clave normalizada -> claves),
+    útil para tablas que no traen `iso3`/`country_clean`.
+    """
+    if df.empty or 'country' not in df.columns:
+        return CountryIndex({})
+    rows = np.arange(len(df), dtype=np.intp)
+    pairs = []
+    for col in COUNTRY_KEY_COLUMNS:
+        if col in df.columns:
+            pairs.append(pd.DataFrame({'key': _normalized_keys(df[col]).to_numpy(dtype=object), 'pos': rows}))
+    if aliases:
+        country_keys = _normalized_keys(df['country'])
+        alias_frame = pd.DataFrame(
+            [(k, a) for k, extra in aliases.items() for a in extra],
+            columns=['country_key', 'key'],
+        )
+        if not alias_frame.empty:
+            # un alias de varios países, o que es la clave de otro país, no se indexa
+            own = set(country_keys.dropna())
+            alias_frame = alias_frame[
+                (alias_frame.groupby('key')['country_key'].transform('nunique') == 1)
+                & ~(alias_frame['key'].isin(own) & (alias_frame['key'] != alias_frame['country_key']))
+            ]
+            base = pd.DataFrame({'country_key': country_keys.to_numpy(dtype=object), 'pos': rows})
+            pairs.append(base.merge(alias_frame, on='country_key')[['key', 'pos']])
+    keyed = pd.concat(pairs, ignore_index=True).dropna(subset=['key']).drop_duplicates()
     if 'year' in df.columns:
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    return df
+        years = pd.to_numeric(df['year'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        keyed['year'] = years[keyed['pos'].to_numpy()]
+        # orden estable: año ascendente (NaN al final) y, a igual año, orden del archivo
+        keyed = keyed.sort_values(['year', 'pos'], kind='stable', na_position='last')
+    else:
+        keyed = keyed.sort_values('pos', kind='stable')
+    positions = {}
+    for key, pos in keyed.groupby('key', sort=False)['pos']:
+        arr = pos.to_numpy(dtype=np.intp)
+        arr.setflags(write=False)
+        positions[key] = arr
+    return CountryIndex(positions)
+
+
+def build_sort_order(df: pd.DataFrame, column: str, descending: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Orden estable de `df` por `column` (NaN al final) y su inversa.
+
+    Devuelve `(order, rank)`: `order[i]` es la posición de la fila i-ésima en
+    ese orden y `rank[pos]` el lugar que ocupa la fila `pos`. Ambos de solo lectura.
+    """
+    values = df[column].reset_index(drop=True)
+    order = values.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy(dtype=np.intp)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order), dtype=np.intp)
+    order.setflags(write=False)
+    rank.setflags(write=False)
+    return order, rank
+
+
+ALIAS_SOURCES = ('master_final_dataset', 'df_country_year')
+
+
+def country_iso3_codes(frames: Mapping[str, pd.DataFrame]) -> Dict[str, str]:
+    """País normalizado -> ISO3 (mayúsculas), según la columna `iso3` de los datasets que la traen."""
+    codes: Dict[str, str] = {}
+    for name in ALIAS_SOURCES:
+        df = frames.get(name, pd.DataFrame())
+        if df.empty or 'country' not in df.columns or 'iso3' not in df.columns:
+            continue
+        pairs = pd.DataFrame({'country': _normalized_keys(df['country']), 'iso3': df['iso3'].astype('string').str.strip().str.upper()})
+        for country, iso3 in pairs.dropna().drop_duplicates().itertuples(index=False):
+            codes.setdefault(country, iso3)
+    return codes
+
+
+def _country_aliases(frames: Mapping[str, pd.DataFrame]) -> Dict[str, tuple]:
+    """Mapa país normalizado -> (country_clean, iso3, nombre corto, nombres en español) normalizados.
+
+    Se obtiene de los datasets que sí traen esas columnas, para que las tablas
+    sin `iso3` (p.ej. `df_country_year`) también respondan a búsquedas por ISO3.
+    El nombre corto quita el paréntesis ("bolivia") y los nombres en español
+    salen de `SPANISH_COUNTRY_NAMES` por el ISO3 del dataset ("brasil", "mexico").
+
+    Un alias solo se conserva si apunta a un único país y no es la clave de
+    otro: "Congo" y "Congo (Democratic Republic of the)" no comparten "congo".
+    """
+    aliases: Dict[str, set] = {}
+    for name in ALIAS_SOURCES:
+        df = frames.get(name, pd.DataFrame())
+        cols = [c for c in ('country_clean', 'iso3') if c in df.columns]
+        if df.empty or 'country' not in df.columns or not cols:
+            continue
+        keys = pd.DataFrame({c: _normalized_keys(df[c]) for c in ['country'] + cols}).dropna(subset=['country']).drop_duplicates()
+        for rec in keys.itertuples(index=False):
+            extra = aliases.setdefault(rec[0], set())
+            extra.update(v for v in rec[1:] if isinstance(v, str) and v)
+            short = normalize_country_key(short_name(rec[0]))
+            if short and short != rec[0]:
+                extra.add(short)
+    for country, iso3 in country_iso3_codes(frames).items():
+        if country in aliases:
+            aliases[country].update(normalize_country_key(n) for n in SPANISH_COUNTRY_NAMES.get(iso3, ()))
+    owners: Dict[str, set] = {}
+    for country, extra in aliases.items():
+        for alias in extra:
+            owners.setdefault(alias, set()).add(country)
+    ambiguous = {a for a, countries in owners.items() if len(countries) > 1 or (a in aliases and countries != {a})}
+    if ambiguous:
+        logger.info("Dropping ambiguous country aliases: %s", ', '.join(sorted(ambiguous)))
+    return {k: tuple(sorted(v - ambiguous - {k})) for k, v in aliases.items()}
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """sha256 del contenido de `path` (leído por bloques)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_paths() -> Dict[str, Path]:
+    data_dir = get_data_dir()
+    return {name: data_dir / f"{name}.json" for name in DATASET_NAMES}
+
+
+def _source_stats() -> Tuple[tuple, ...]:
+    """(nombre, tamaño, mtime_ns) de cada JSON de origen; barato de sondear."""
+    stats = []
+    for name, path in _source_paths().items():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            stats.append((name, None, None))
+        else:
+            stats.append((name, st.st_size, st.st_mtime_ns))
+    return tuple(stats)
+
+
+def _content_version() -> str:
+    """Huella del contenido de todos los datasets; cambia si cambia cualquier archivo."""
+    h = hashlib.sha256()
+    for name, path in sorted(_source_paths().items()):
+        h.update(name.encode())
+        h.update(file_digest(path).encode() if path.exists() else b'-')
+    return h.hexdigest()[:16]
+
+
+def build_columnar(names: Optional[Iterable[str]] = None) -> Dict[str, Path]:
+    """Genera el formato columnar binario de los datasets (todos por defecto).
+
+    Devuelve dataset -> ruta del manifest. Los `load_*` lo usan automáticamente
+    mientras el JSON de origen no cambie.
+    """
+    data_dir = get_data_dir()
+    written = {}
+    for name in names or DATASET_NAMES:
+        jpath = data_dir / f"{name}.json"
+        if not jpath.exists():
+            continue
+        df = _read_json_dataset(jpath)
+        written[name] = write_columnar(df, columnar_root(data_dir) / name, jpath, file_digest(jpath))
+    return written
+
+
+# --- Compactación de tablas explotadas --------------------------------------
+
+# Datasets que se guardan compactados en el snapshot (resultado de merges que
+# repiten la misma fila macro por cada par de categorías). `DATA_COMPACT=0`
+# los mantiene tal cual (y desactiva también `optimize_dtypes`).
+COMPACTED_DATASETS = ('master_final_dataset', 'df_category_pairs')
+# sufijos de merge que forman las dos caras de un par (`category_x`/`category_y`)
+PAIR_SUFFIXES = ('_x', '_y')
+
+
+def compaction_enabled() -> bool:
+    return os.environ.get('DATA_COMPACT', '1') != '0'
+
+
+def _dedupe(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Filas únicas de `df` (orden de primera aparición) y, por fila original, su fila única."""
+    if df.empty:
+        return df.reset_index(drop=True), np.empty(0, dtype=np.int32)
+    codes = df.groupby(list(df.columns), sort=False, dropna=False).ngroup().to_numpy(dtype=np.int32)
+    uniques = df.drop_duplicates().reset_index(drop=True)
+    return uniques, codes
+
+
+@dataclass(frozen=True)
+class CompactPart:
+    """Columnas de la tabla original que salen de `CompactTable.tables[table]` vía `codes`."""
+
+    table: str
+    codes: np.ndarray
+    columns: Tuple[Tuple[str, str], ...]  # (columna original, columna en la tabla)
+
+
+@dataclass(frozen=True)
+class CompactTable:
+    """Tabla explotada factorizada en tablas deduplicadas + códigos de reconstrucción.
+
+    `tables['facts']` tiene las filas macro únicas; si la tabla era un producto
+    de pares (`*_x`/`*_y`), `tables['categories']` es la dimensión de
+    categorías compartida por ambas caras. `reconstruct()` devuelve la tabla
+    original, con el mismo orden de filas y columnas.
+    """
+
+    rows: int
+    columns: Tuple[str, ...]
+    tables: Mapping[str, pd.DataFrame]
+    parts: Tuple[CompactPart, ...]
+
+    def reconstruct(self) -> pd.DataFrame:
+        pieces = []
+        for part in self.parts:
+            source = self.tables[part.table]
+            piece = source.iloc[part.codes][[col for _, col in part.columns]].reset_index(drop=True)
+            piece.columns = [original for original, _ in part.columns]
+            pieces.append(piece)
+        if not pieces:
+            return pd.DataFrame(columns=list(self.columns))
+        return pd.concat(pieces, axis=1)[list(self.columns)]
+
+    def nbytes(self) -> int:
+        return int(sum(t.memory_usage(deep=True).sum() for t in self.tables.values())
+                   + sum(p.codes.nbytes for p in self.parts))
+
+
+def compact_frame(df: pd.DataFrame, keys: Tuple[str, ...] = ('country', 'year')) -> CompactTable:
+    """Compacta `df`: hechos macro únicos y, si hay columnas de par, dimensión de categorías.
+
+    Las columnas de par son las que existen con ambos sufijos de `PAIR_SUFFIXES`
+    (p.ej. `category_x`/`category_y`); sus dos caras se apilan en una sola
+    dimensión junto con `keys`, de modo que cada combinación
+    (país, año, categoría, share, valor) se guarda una sola vez.
+    """
+    columns = tuple(str(c) for c in df.columns)
+    stems = [c[:-len(PAIR_SUFFIXES[0])] for c in columns if c.endswith(PAIR_SUFFIXES[0])]
+    stems = [s for s in stems if all(s + suffix in columns for suffix in PAIR_SUFFIXES)]
+    pair_columns = {s + suffix for s in stems for suffix in PAIR_SUFFIXES}
+    macro = [c for c in columns if c not in pair_columns]
+    facts, fact_codes = _dedupe(df[macro])
+    tables = {'facts': facts}
+    parts = [CompactPart('facts', fact_codes, tuple((c, c) for c in macro))]
+    keys = tuple(k for k in keys if k in columns)
+    if stems:
+        sides = [df[list(keys) + [s + suffix for s in stems]].set_axis(list(keys) + stems, axis=1) for suffix in PAIR_SUFFIXES]
+        categories, codes = _dedupe(pd.concat(sides, ignore_index=True))
+        tables['categories'] = categories
+        for i, suffix in enumerate(PAIR_SUFFIXES):
+            side_codes = codes[i * len(df):(i + 1) * len(df)]
+            parts.append(CompactPart('categories', side_codes, tuple((s + suffix, s) for s in stems)))
+    for part in parts:
+        part.codes.setflags(write=False)
+    return CompactTable(rows=len(df), columns=columns, tables=MappingProxyType(tables), parts=tuple(parts))
+
+
+def _compact_datasets(frames: Dict[str, pd.DataFrame]) -> Dict[str, CompactTable]:
+    """Saca de `frames` los datasets compactables y devuelve su versión compacta."""
+    compact = {}
+    for name in COMPACTED_DATASETS:
+        df = frames.get(name)
+        if df is None or df.empty:
+            continue
+        table = compact_frame(df)
+        before, after = int(df.memory_usage(deep=True).sum()), table.nbytes()
+        logger.info(
+            "Compacted %s: %d rows -> %s, %.1f KiB -> %.1f KiB (%.1f KiB saved)",
+            name, table.rows, ', '.join(f"{k}={len(t)}" for k, t in table.tables.items()),
+            before / 1024, after / 1024, (before - after) / 1024,
+        )
+        compact[name] = table
+        del frames[name]
+    return compact
+
+
+# --- Snapshot de datos -------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """Vista inmutable de todos los datasets cargados y sus estructuras derivadas.
+
+    Los handlers toman una referencia al inicio de la petición y trabajan sobre
+    ella; una recarga construye un snapshot nuevo fuera del camino de las
+    peticiones y lo publica de forma atómica, así que las peticiones en curso
+    terminan sobre el anterior. `version` es la huella del contenido de los
+    archivos y sirve de clave para invalidar cachés.
+    """
+
+    version: str
+    frames: Mapping[str, pd.DataFrame]
+    country_aliases: Mapping[str, tuple]
+    country_indexes: Mapping[str, CountryIndex]
+    source_stats: Tuple[tuple, ...]
+    timings: Mapping[str, float]
+    created_at: float
+    compact: Mapping[str, CompactTable] = field(default_factory=lambda: MappingProxyType({}))
+    raw_bytes: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    shared_path: Optional[str] = None
+    _derived: Dict[Any, Any] = field(default_factory=dict, repr=False, compare=False)
+    _derived_lock: Any = field(default_factory=threading.RLock, repr=False, compare=False)
+    # segundos de construcción de cada estructura derivada (incluye las que pida dentro)
+    derived_timings: Dict[Any, float] = field(default_factory=dict, repr=False, compare=False)
+    # `canonical_view` de cada frame de `frames`, construida con el snapshot
+    canonical_frames: Mapping[str, pd.DataFrame] = field(default_factory=lambda: MappingProxyType({}), repr=False)
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """DataFrame del dataset; los compactados se reconstruyen (una vez) al pedirlos."""
+        if name in self.frames or name not in self.compact:
+            return self.frames[name]
+        return self.derived(('view', name), lambda snap: snap.compact[name].reconstruct())
+
+    def canonical(self, name: str) -> pd.DataFrame:
+        """`canonical_view` del dataset (métricas float64 por nombre canónico).
+
+        Las de los datasets no compactados se construyen con el snapshot; las
+        de los compactados, la primera vez que se piden.
+        """
+        if name in self.canonical_frames:
+            return self.canonical_frames[name]
+        return self.derived(('canonical', name), lambda snap: canonical_view(snap.frame(name)))
+
+    def country_index(self, name: str) -> CountryIndex:
+        if name in self.country_indexes or name not in self.compact:
+            return self.country_indexes[name]
+        return self.derived(('country_index', name), lambda snap: build_country_index(snap.frame(name), snap.country_aliases))
+
+    def derived(self, key: Any, build: Callable[['DataSnapshot'], Any]) -> Any:
+        """Estructura derivada memoizada por snapshot (se construye una vez, bajo lock).
+
+        El lock es reentrante: `build` puede pedir a su vez otras estructuras derivadas.
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                start = time.perf_counter()
+                self._derived[key] = build(self)
+                self.derived_timings[key] = time.perf_counter() - start
+            return self._derived[key]
+
+    def master_final_facts(self) -> pd.DataFrame:
+        """Ver `load_master_final_facts`."""
+        table = self.compact.get('master_final_dataset')
+        if table is not None:
+            return table.tables['facts']
+        df = self.frame('master_final_dataset')
+        return df.drop(columns=[c for c in df.columns if c.endswith(PAIR_SUFFIXES)]).drop_duplicates()
+
+    def sort_order(self, name: str, column: str, descending: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """`build_sort_order` de un dataset, calculado una vez por snapshot."""
+        return self.derived(('sort_order', name, column, descending), lambda snap: build_sort_order(snap.frame(name), column, descending))
+
+
+def _canonical_frames(frames: Mapping[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    return {name: canonical_view(df) for name, df in frames.items()}
+
+
+def _timed_call(func: Callable, *args) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _prepare_dataset(name: str) -> Tuple[pd.DataFrame, int]:
+    """Carga un dataset con tipos compactos; devuelve también su tamaño antes de compactar."""
+    df = _load_dataset(name)
+    raw = frame_nbytes(df)
+    if compaction_enabled():
+        df = optimize_dtypes(df)
+    return df, raw
+
+
+def build_snapshot(max_workers: Optional[int] = None) -> DataSnapshot:
+    """Snapshot de la versión actual de `data/`: compartido si hay `DATA_SHARED_DIR`, privado si no."""
+    # stats y huella se toman antes de leer: si un archivo cambia durante la
+    # carga, el watcher verá la diferencia y volverá a cargar
+    stats = _source_stats()
+    version = _content_version()
+    root = shared_root()
+    if root is not None:
+        return _shared_snapshot(root, version, stats, max_workers)
+    return _build_snapshot(version, stats, max_workers)
+
+
+def _build_snapshot(version: str, stats: Tuple[tuple, ...], max_workers: Optional[int] = None) -> DataSnapshot:
+    """Carga todos los datasets en paralelo (hilos) y construye sus índices."""
+    timings: Dict[str, float] = {}
+    frames: Dict[str, pd.DataFrame] = {}
+    raw_bytes: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(DATASET_NAMES), thread_name_prefix='snapshot') as pool:
+        futures = {name: pool.submit(_timed_call, _prepare_dataset, name) for name in DATASET_NAMES}
+        for name, future in futures.items():
+            (frames[name], raw_bytes[name]), timings[name] = future.result()
+    compact: Dict[str, CompactTable] = {}
+    if compaction_enabled():
+        compact, timings['compact'] = _timed_call(_compact_datasets, frames)
+    # los alias solo necesitan las filas macro (country/country_clean/iso3)
+    alias_sources = {**frames, **{name: table.tables['facts'] for name, table in compact.items()}}
+    aliases, timings['country_aliases'] = _timed_call(_country_aliases, alias_sources)
+    indexes, timings['country_index'] = _timed_call(
+        lambda: {name: build_country_index(df, aliases) for name, df in frames.items()}
+    )
+    canonical, timings['canonical'] = _timed_call(_canonical_frames, frames)
+    return DataSnapshot(
+        version=version,
+        frames=MappingProxyType(frames),
+        country_aliases=MappingProxyType(aliases),
+        country_indexes=MappingProxyType(indexes),
+        source_stats=stats,
+        timings=MappingProxyType(timings),
+        created_at=time.time(),
+        compact=MappingProxyType(compact),
+        raw_bytes=MappingProxyType(raw_bytes),
+        canonical_frames=MappingProxyType(canonical),
+    )
+
+
+# --- Snapshot compartido entre workers ---------------------------------------
+#
+# Con `DATA_SHARED_DIR` (p.ej. `/dev/shm/coafina-ewaste`), el primer worker que
+# construye un snapshot lo vuelca en formato columnar bajo
+# `<DATA_SHARED_DIR>/<clave>/` y los demás (y él mismo) lo abren mapeado en
+# memoria: los datos ocupan una sola vez las páginas del page cache / tmpfs y
+# un worker nuevo no parsea JSON. La clave combina la versión del contenido
+# con los ajustes de carga, así que workers con distinta configuración no se
+# mezclan. La construcción se serializa con un lock de archivo (POSIX).
+
+SHARED_FORMAT_VERSION = 4
+SHARED_MANIFEST_NAME = 'snapshot.json'
+
+
+def shared_root() -> Optional[Path]:
+    """Directorio del snapshot compartido (`DATA_SHARED_DIR`); None si el modo está desactivado."""
+    value = os.environ.get('DATA_SHARED_DIR')
+    return Path(value) if value else None
+
+
+def _shared_key(version: str) -> str:
+    return f"{version}-v{SHARED_FORMAT_VERSION}-c{int(compaction_enabled())}-f{float_precision()}"
+
+
+@contextmanager
+def _store_lock(root: Path):
+    """Lock exclusivo entre procesos sobre `root/.lock` (sin efecto donde no hay `fcntl`)."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / '.lock', 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _save_array(path: Path, values: np.ndarray) -> str:
+    np.save(path, np.ascontiguousarray(values))
+    return path.name
+
+
+def write_shared_snapshot(snapshot: DataSnapshot, root: Path) -> Path:
+    """Vuelca `snapshot` en `root/<clave>/` (directorio temporal + rename atómico)."""
+    key = _shared_key(snapshot.version)
+    target = root / key
+    if (target / SHARED_MANIFEST_NAME).exists():
+        return target
+    staging = root / f".{key}.{uuid.uuid4().hex[:8]}.tmp"
+    staging.mkdir(parents=True)
+    try:
+        _write_shared_files(snapshot, staging)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # otro proceso publicó la misma clave antes: se usa la suya
+        shutil.rmtree(staging, ignore_errors=True)
+    # versiones anteriores: quien las tenga mapeadas conserva sus páginas (POSIX)
+    for old in root.iterdir():
+        if old.is_dir() and old.name != target.name and not old.name.startswith('.'):
+            shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def _write_shared_files(snapshot: DataSnapshot, staging: Path) -> None:
+    manifest: Dict[str, Any] = {
+        'format': SHARED_FORMAT_VERSION,
+        'version': snapshot.version,
+        'frames': {},
+        'compact': {},
+        'indexes': {},
+        'country_aliases': {k: list(v) for k, v in snapshot.country_aliases.items()},
+        'raw_bytes': dict(snapshot.raw_bytes),
+    }
+    for name, df in snapshot.frames.items():
+        write_columnar(df, staging / 'frames' / name)
+        manifest['frames'][name] = f'frames/{name}'
+    for name, table in snapshot.compact.items():
+        base = staging / 'compact' / name
+        for table_name, frame in table.tables.items():
+            write_columnar(frame, base / table_name)
+        manifest['compact'][name] = {
+            'rows': table.rows,
+            'columns': list(table.columns),
+            'tables': {t: f'compact/{name}/{t}' for t in table.tables},
+            'parts': [
+                {'table': p.table, 'codes': f'compact/{name}/' + _save_array(base / f'codes{i}.npy', p.codes), 'columns': [list(c) for c in p.columns]}
+                for i, p in enumerate(table.parts)
+            ],
+        }
+    (staging / 'indexes').mkdir()
+    for name, index in snapshot.country_indexes.items():
+        keys = list(index.keys())
+        chunks = [index.lookup(k) for k in keys]
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(c) for c in chunks])
+        positions = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.intp)
+        manifest['indexes'][name] = {
+            'keys': keys,
+            'positions': 'indexes/' + _save_array(staging / 'indexes' / f'{name}_positions.npy', positions.astype(np.intp)),
+            'offsets': 'indexes/' + _save_array(staging / 'indexes' / f'{name}_offsets.npy', offsets),
+        }
+    (staging / SHARED_MANIFEST_NAME).write_text(json.dumps(manifest), encoding='utf-8')
+
+
+def _read_columnar_dir(path: Path) -> pd.DataFrame:
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(path)
+    return read_columnar(path, manifest)
+
+
+def attach_shared_snapshot(root: Path, version: str, stats: Tuple[tuple, ...]) -> Optional[DataSnapshot]:
+    """Abre (mmap, solo lectura) el snapshot compartido de `version`; None si no existe o no es legible."""
+    target = root / _shared_key(version)
+    try:
+        manifest = json.loads((target / SHARED_MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SHARED_FORMAT_VERSION or manifest.get('version') != version:
+        return None
+    start = time.perf_counter()
+    try:
+        frames = {name: _read_columnar_dir(target / rel) for name, rel in manifest['frames'].items()}
+        compact = {}
+        for name, entry in manifest['compact'].items():
+            parts = tuple(
+                CompactPart(p['table'], np.load(target / p['codes'], mmap_mode='r'), tuple(tuple(c) for c in p['columns']))
+                for p in entry['parts']
+            )
+            tables = {t: _read_columnar_dir(target / rel) for t, rel in entry['tables'].items()}
+            compact[name] = CompactTable(rows=entry['rows'], columns=tuple(entry['columns']), tables=MappingProxyType(tables), parts=parts)
+        indexes = {}
+        for name, entry in manifest['indexes'].items():
+            positions = np.load(target / entry['positions'], mmap_mode='r')
+            offsets = np.load(target / entry['offsets'])
+            indexes[name] = CountryIndex({k: positions[offsets[i]:offsets[i + 1]] for i, k in enumerate(entry['keys'])})
+    except (OSError, ValueError, KeyError):
+        logger.exception("Could not attach shared snapshot %s", target)
+        return None
+    return DataSnapshot(
+        version=version,
+        frames=MappingProxyType(frames),
+        country_aliases=MappingProxyType({k: tuple(v) for k, v in manifest['country_aliases'].items()}),
+        country_indexes=MappingProxyType(indexes),
+        source_stats=stats,
+        timings=MappingProxyType({'attach_shared': time.perf_counter() - start}),
+        created_at=time.time(),
+        compact=MappingProxyType(compact),
+        raw_bytes=MappingProxyType(manifest.get('raw_bytes', {})),
+        shared_path=str(target),
+        canonical_frames=MappingProxyType(_canonical_frames(frames)),
+    )
+
+
+def _shared_snapshot(root: Path, version: str, stats: Tuple[tuple, ...], max_workers: Optional[int]) -> DataSnapshot:
+    """Snapshot compartido de `version`: lo abre si existe; si no, lo construye (bajo lock) y lo publica."""
+    snapshot = attach_shared_snapshot(root, version, stats)
+    if snapshot is not None:
+        return snapshot
+    with _store_lock(root):
+        snapshot = attach_shared_snapshot(root, version, stats)
+        if snapshot is not None:
+            return snapshot
+        built = _build_snapshot(version, stats, max_workers)
+        try:
+            start = time.perf_counter()
+            write_shared_snapshot(built, root)
+            elapsed = time.perf_counter() - start
+        except OSError:
+            logger.exception("Could not write shared snapshot to %s; using a private copy", root)
+            return built
+    # también el worker que lo construyó pasa a usar las páginas compartidas
+    snapshot = attach_shared_snapshot(root, version, stats)
+    if snapshot is None:
+        return built
+    logger.info("Published shared snapshot %s in %s", version, root)
+    return replace(snapshot, timings=MappingProxyType({**built.timings, 'write_shared': elapsed, **snapshot.timings}))
+
+
+def _process_rss() -> Optional[int]:
+    """RSS actual del proceso en bytes (Linux); None si no se puede leer."""
+    try:
+        with open('/proc/self/status', encoding='ascii') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def memory_report(snapshot: DataSnapshot) -> Dict[str, Any]:
+    """Memoria por dataset: al cargar (`raw_bytes`) frente a lo que ocupa en el snapshot.
+
+    Para los datasets compactados se desglosan sus tablas y códigos, y se
+    indica si la vista reconstruida está materializada (y cuánto ocupa).
+    """
+    datasets = {}
+    for name in DATASET_NAMES:
+        raw = snapshot.raw_bytes.get(name)
+        if name in snapshot.compact:
+            table = snapshot.compact[name]
+            entry = {
+                'storage': 'compact',
+                'rows': table.rows,
+                'bytes': table.nbytes(),
+                'tables': {k: {'rows': len(t), 'bytes': frame_nbytes(t)} for k, t in table.tables.items()},
+                'codes_bytes': int(sum(p.codes.nbytes for p in table.parts)),
+            }
+            view = snapshot._derived.get(('view', name))
+            entry['view_bytes'] = frame_nbytes(view) if view is not None else None
+        elif name in snapshot.frames:
+            df = snapshot.frames[name]
+            usage = df.memory_usage(deep=True, index=False)
+            entry = {
+                'storage': 'frame',
+                'rows': len(df),
+                'bytes': int(usage.sum()),
+                'columns': {str(c): {'dtype': str(df[c].dtype), 'bytes': int(usage[c])} for c in df.columns},
+            }
+        else:
+            continue
+        entry['raw_bytes'] = raw
+        entry['saved_bytes'] = raw - entry['bytes'] if raw is not None else None
+        datasets[name] = entry
+    raw_total = sum(e['raw_bytes'] or 0 for e in datasets.values())
+    total = sum(e['bytes'] for e in datasets.values())
+    return {
+        'version': snapshot.version,
+        'shared_path': snapshot.shared_path,
+        'float_precision': float_precision(),
+        'compaction': compaction_enabled(),
+        'rss_bytes': _process_rss(),
+        'raw_bytes': raw_total,
+        'bytes': total,
+        'saved_bytes': raw_total - total,
+        'datasets': datasets,
+    }
+
+
+_snapshot: Optional[DataSnapshot] = None
+_snapshot_lock = threading.Lock()
+_snapshot_listeners = []
+
+
+def add_snapshot_listener(callback: Callable[[DataSnapshot], None]) -> None:
+    """Registra `callback(snapshot)` para cada snapshot publicado (p.ej. limpiar cachés)."""
+    _snapshot_listeners.append(callback)
+
+
+def publish_snapshot(snapshot: DataSnapshot) -> None:
+    """Reemplaza el snapshot vigente (asignación atómica) y avisa a los listeners."""
+    global _snapshot
+    _snapshot = snapshot
+    for callback in list(_snapshot_listeners):
+        try:
+            callback(snapshot)
+        except Exception:
+            logger.exception("Snapshot listener failed")
+
+
+def current_snapshot() -> DataSnapshot:
+    """Snapshot vigente; el primero se construye bajo lock (una sola carga en frío)."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            publish_snapshot(build_snapshot())
+        return _snapshot
+
+
+def warm_up(max_workers: Optional[int] = None) -> Dict[str, float]:
+    """Precarga todos los datasets en paralelo y construye las estructuras derivadas.
+
+    Devuelve los tiempos de carga en segundos por dataset y por etapa derivada.
+    """
+    with _snapshot_lock:
+        if _snapshot is None:
+            publish_snapshot(build_snapshot(max_workers))
+        return dict(_snapshot.timings)
+
+
+class SnapshotWatcher:
+    """Hilo que sondea los JSON de `data/` y recarga el snapshot cuando cambia su contenido.
+
+    Cada `interval` segundos compara tamaño/mtime (barato); solo si difieren
+    calcula la huella de contenido y, si también cambió, construye el nuevo
+    snapshot en este hilo y lo publica. Un error de carga (p.ej. un archivo a
+    medio escribir) deja el snapshot vigente y se reintenta en el siguiente ciclo.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_stats: Optional[Tuple[tuple, ...]] = None
+
+    def start(self) -> None:
+        self._last_stats = current_snapshot().source_stats
+        self._thread = threading.Thread(target=self._run, name='snapshot-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self) -> bool:
+        """Un ciclo de sondeo; devuelve True si publicó un snapshot nuevo."""
+        stats = _source_stats()
+        if stats == self._last_stats:
+            return False
+        try:
+            if _content_version() == current_snapshot().version:
+                self._last_stats = stats
+                return False
+            snapshot = build_snapshot()
+        except Exception:
+            logger.exception("Data reload failed; keeping snapshot %s", current_snapshot().version)
+            return False
+        self._last_stats = snapshot.source_stats
+        publish_snapshot(snapshot)
+        logger.info("Reloaded data snapshot %s", snapshot.version)
+        return True
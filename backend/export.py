@@ -0,0 +1,131 @@
+"""Exportación en streaming por bloques de filas: CSV, NDJSON y Parquet, con gzip opcional.
+
+Cada generador recibe bloques de filas (DataFrames pequeños) y produce bytes a
+medida que se consumen, así que la memoria por exportación queda acotada por
+el tamaño del bloque y no por el de la tabla.
+"""
+import io
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# formato -> (media type, extensión)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def parquet_available() -> bool:
+    """Parquet requiere `pyarrow` (dependencia opcional)."""
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def iter_row_chunks(df: pd.DataFrame, positions: Optional[np.ndarray], columns: Optional[List[str]], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Bloques de `df` (filas `positions` o todas, columnas `columns` o todas).
+
+    Si no hay filas se emite un único bloque vacío para que los formatos con
+    cabecera/esquema la escriban igualmente.
+    """
+    col_idx = [df.columns.get_loc(c) for c in columns] if columns else slice(None)
+    total = len(df) if positions is None else len(positions)
+    if total == 0:
+        yield df.iloc[0:0, col_idx]
+        return
+    for start in range(0, total, chunk_rows):
+        rows = slice(start, start + chunk_rows) if positions is None else positions[start:start + chunk_rows]
+        yield df.iloc[rows, col_idx]
+
+
+def csv_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+def ndjson_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    for frame in frames:
+        if frame.empty:
+            continue
+        text = frame.to_json(orient='records', lines=True, force_ascii=False)
+        if not text.endswith('\n'):
+            text += '\n'
+        yield text.encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura que acumula bytes hasta que se drenan.
+
+    `tell()` devuelve la posición absoluta: el writer de Parquet la usa para
+    los offsets del footer, así que no puede reiniciarse al drenar.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def parquet_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Un row group por bloque; el esquema sale del primer bloque (dtypes de la tabla)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    for frame in frames:
+        if schema is None:
+            schema = pa.Schema.from_pandas(frame.iloc[0:0], preserve_index=False)
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+        data = sink.drain()
+        if data:
+            yield data
+    if writer is not None:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Comprime un flujo de bytes como un único miembro gzip, bloque a bloque."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+ENCODERS = {
+    'csv': csv_chunks,
+    'ndjson': ndjson_chunks,
+    'parquet': parquet_chunks,
+}
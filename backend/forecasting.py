@@ -0,0 +1,191 @@
+"""Proyecciones de tendencia por país, ajustadas en bloque para todos los países.
+
+Cada métrica se ajusta con mínimos cuadrados sobre el año, para todos los
+países a la vez: con la matriz `países x años` (NaN donde falta) las sumas de
+las ecuaciones normales salen de operaciones por fila, sin bucle por país.
+
+- `linear`: `y = a + b * t`
+- `loglinear`: `log(y) = a + b * t` (crecimiento a tasa constante; solo
+  valores > 0). La proyección es la mediana `exp(a + b * t)`.
+
+Los intervalos usan la t de Student con `n - 2` grados de libertad: de
+confianza para la tendencia o de predicción para un año concreto.
+"""
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from serialization import float_array
+
+FORECAST_MODELS = ('linear', 'loglinear')
+FORECAST_INTERVALS = ('prediction', 'confidence')
+
+
+def t_quantile(level: float, dof: np.ndarray) -> np.ndarray:
+    """Cuantil bilateral de la t de Student: `P(|T| < q) = level`, por grados de libertad enteros.
+
+    Usa la fórmula cerrada de la distribución para `dof` entero (Abramowitz &
+    Stegun 26.7.3/26.7.4) y bisección sobre `theta = atan(q / sqrt(dof))`.
+    `dof < 1` -> NaN.
+    """
+    dof = np.asarray(dof, dtype=np.int64)
+    out = np.full(dof.shape, np.nan)
+    ok = dof >= 1
+    if not ok.any():
+        return out
+    nu = dof[ok]
+    lo = np.zeros(nu.shape)
+    hi = np.full(nu.shape, math.pi / 2)
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        below = _t_abs_cdf(mid, nu) < level
+        lo = np.where(below, mid, lo)
+        hi = np.where(below, hi, mid)
+    out[ok] = np.sqrt(nu) * np.tan((lo + hi) / 2)
+    return out
+
+
+@lru_cache(maxsize=1024)
+def _cached_t_quantile(level: float, dof: int) -> float:
+    return float(t_quantile(level, np.array([dof]))[0])
+
+
+def _t_abs_cdf(theta: np.ndarray, nu: np.ndarray) -> np.ndarray:
+    """`P(|T| < sqrt(nu) * tan(theta))` para `nu` entero >= 1."""
+    s, c2 = np.sin(theta), np.cos(theta) ** 2
+    odd = nu % 2 == 1
+    # serie en potencias de cos^2: términos hasta cos^(nu - 2)
+    term = np.ones(theta.shape)
+    total = np.where(odd, np.where(nu > 1, 1.0, 0.0), 1.0)
+    for k in range(1, int(nu.max()) // 2):
+        active = 2 * k <= nu - 2
+        ratio = np.where(odd, (2 * k) / (2 * k + 1), (2 * k - 1) / (2 * k))
+        term = np.where(active, term * ratio * c2, term)
+        total = total + np.where(active, term, 0.0)
+    odd_cdf = 2 / math.pi * (theta + s * np.sqrt(c2) * total)
+    even_cdf = s * total
+    return np.where(odd, odd_cdf, even_cdf)
+
+
+@dataclass(frozen=True)
+class TrendFit:
+    """Ajuste por país de una métrica y su proyección hasta `len(forecast_years)` años.
+
+    Todo en la escala del modelo (logaritmo en `loglinear`): `center` es la
+    tendencia en cada año proyectado y `se_confidence`/`se_prediction` sus
+    errores estándar. `interval()` pasa a la escala de los datos.
+    """
+
+    model: str
+    years: np.ndarray            # (T,) años observados (rejilla común)
+    values: np.ndarray           # (C, T) histórico, NaN donde falta
+    forecast_years: np.ndarray   # (H,)
+    intercept: np.ndarray        # (C,) en t = año - origin
+    slope: np.ndarray            # (C,) por año
+    n: np.ndarray                # (C,) años usados en el ajuste
+    r2: np.ndarray               # (C,)
+    sigma: np.ndarray            # (C,) desviación residual (n >= 3)
+    center: np.ndarray           # (C, H)
+    se_confidence: np.ndarray    # (C, H)
+    se_prediction: np.ndarray    # (C, H)
+
+    def interval(self, horizon: int, level: float, kind: str = 'prediction') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(proyección, límite inferior, superior) `(C, horizon)` en la escala de los datos."""
+        se = self.se_prediction if kind == 'prediction' else self.se_confidence
+        dof, inverse = np.unique(self.n - 2, return_inverse=True)
+        q = np.array([_cached_t_quantile(level, int(d)) for d in dof])[inverse][:, None]
+        center, se = self.center[:, :horizon], se[:, :horizon]
+        lower, upper = center - q * se, center + q * se
+        if self.model == 'loglinear':
+            return np.exp(center), np.exp(lower), np.exp(upper)
+        return center, lower, upper
+
+
+def fit_trends(years: np.ndarray, values: np.ndarray, model: str, horizon: int) -> TrendFit:
+    """Ajusta `values` `(C, T)` contra `years` `(T,)` para cada país y proyecta `horizon` años.
+
+    Países con menos de 2 años válidos quedan sin tendencia (NaN); con 2, sin
+    intervalo. Los años proyectados siguen al último año de la rejilla.
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"unknown model '{model}'")
+    years = np.array(years, dtype=np.int64)
+    values = np.array(values, dtype='float64')
+    origin = int(years[-1]) if len(years) else 0
+    t = (years - origin).astype('float64')
+    y = values
+    if model == 'loglinear':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            y = np.where(values > 0, np.log(values), np.nan)
+    mask = ~np.isnan(y)
+    m = mask.astype('float64')
+    yz = np.where(mask, y, 0.0)
+    n = m.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_mean = (m @ t) / n
+        y_mean = yz.sum(axis=1) / n
+        dt = np.where(mask, t[None, :] - t_mean[:, None], 0.0)
+        dy = np.where(mask, yz - y_mean[:, None], 0.0)
+        sxx = (dt * dt).sum(axis=1)
+        slope = (dt * dy).sum(axis=1) / sxx
+        intercept = y_mean - slope * t_mean
+        residual = np.where(mask, yz - (intercept[:, None] + slope[:, None] * t[None, :]), 0.0)
+        ssr = (residual * residual).sum(axis=1)
+        sst = (dy * dy).sum(axis=1)
+        r2 = np.where(sst > 0, 1.0 - ssr / sst, np.nan)
+        sigma = np.where(n >= 3, np.sqrt(ssr / (n - 2)), np.nan)
+    fitted = (n >= 2) & (sxx > 0)
+    slope, intercept = np.where(fitted, slope, np.nan), np.where(fitted, intercept, np.nan)
+    r2 = np.where(fitted, r2, np.nan)
+
+    forecast_years = origin + np.arange(1, horizon + 1, dtype=np.int64)
+    tf = (forecast_years - origin).astype('float64')
+    center = intercept[:, None] + slope[:, None] * tf[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = 1.0 / n[:, None] + (tf[None, :] - t_mean[:, None]) ** 2 / sxx[:, None]
+        se_confidence = sigma[:, None] * np.sqrt(spread)
+        se_prediction = sigma[:, None] * np.sqrt(1.0 + spread)
+    arrays = dict(
+        years=years, values=values, forecast_years=forecast_years, intercept=intercept, slope=slope,
+        n=n.astype(np.int64), r2=r2, sigma=np.where(fitted, sigma, np.nan),
+        center=center, se_confidence=se_confidence, se_prediction=se_prediction,
+    )
+    for arr in arrays.values():
+        arr.setflags(write=False)
+    return TrendFit(model=model, **arrays)
+
+
+@dataclass(frozen=True)
+class CountryForecasts:
+    """Ajustes de todos los países por (modelo, métrica); `countries[i]` es la fila i de cada ajuste."""
+
+    countries: Tuple[str, ...]
+    positions: Mapping[str, int]
+    fits: Mapping[Tuple[str, str], TrendFit]
+
+
+def build_forecasts(df: pd.DataFrame, metrics: Sequence[str], horizon: int) -> CountryForecasts:
+    """Ajusta cada métrica de `df` (una fila por country/year) con todos los modelos."""
+    valid = df['country'].notna().to_numpy(dtype=bool) & df['year'].notna().to_numpy(dtype=bool)
+    df = df[valid]
+    countries, c_codes = np.unique(df['country'].astype(str).to_numpy(), return_inverse=True)
+    years, y_codes = np.unique(df['year'].to_numpy(dtype='int64'), return_inverse=True)
+    fits = {}
+    for metric in metrics:
+        grid = np.full((len(countries), len(years)), np.nan)
+        if metric in df.columns:
+            values = float_array(df[metric])
+            # la primera fila de cada (country, year) gana, como en el resto de la API
+            order = np.flatnonzero(~np.isnan(values))[::-1]
+            grid[c_codes[order], y_codes[order]] = values[order]
+        for model in FORECAST_MODELS:
+            fits[(model, metric)] = fit_trends(years, grid, model, horizon)
+    return CountryForecasts(
+        countries=tuple(countries.tolist()),
+        positions={name: i for i, name in enumerate(countries.tolist())},
+        fits=fits,
+    )
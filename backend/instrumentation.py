@@ -0,0 +1,232 @@
+"""Métricas de la API en formato de texto de Prometheus (`/metrics`), sin dependencias.
+
+- `MetricsMiddleware` (ASGI) mide cada petición: histograma de latencia y
+  contador por (método, ruta, estado). La ruta es la plantilla (`/ewaste/stats`),
+  no la URL, así que la cardinalidad no crece con los parámetros.
+- `span(stage)` mide un tramo dentro de un handler (`load`, `filter`,
+  `transform`, `validate`, `serialize`, `compress`). Los tramos pueden
+  anidarse: cada uno cuenta solo su tiempo propio (sin el de sus hijos) y lo
+  no cubierto por ninguno sale como `other`. Fuera de una petición (precarga, listeners) no
+  hace nada.
+- `REGISTRY.add_collector(fn)` añade líneas calculadas al raspar (tiempos de
+  carga, cachés...), así que no cuestan nada entre raspados.
+
+Una petición guarda sus tramos en una lista propia y los vuelca en los
+histogramas al terminar, con un solo lock.
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ruta para las peticiones que no encajan con ningún endpoint (404 de escáneres...)
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def sample(name: str, value: float, labels: Optional[Dict[str, str]] = None) -> str:
+    """Una línea `nombre{etiquetas} valor` (para los collectors)."""
+    labels = labels or {}
+    return f'{name}{_labels(list(labels), list(labels.values()))} {_number(value)}'
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{_labels(self.label_names, k)} {_number(v)}' for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteo por bucket (no acumulado) + desbordamiento, suma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._observe(labels, value)
+
+    def observe_many(self, observations: Iterable[Tuple[Tuple[str, ...], float]]) -> None:
+        with self._lock:
+            for labels, value in observations:
+                self._observe(labels, value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(counts), total)) for k, (counts, total) in self._series.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Métricas registradas + collectors (`fn() -> líneas`) evaluados al raspar."""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            lines += list(collector())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'ewaste_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta.', ('method', 'route'),
+))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'ewaste_http_requests_total', 'Peticiones HTTP por ruta y código de estado.', ('method', 'route', 'status'),
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'ewaste_stage_duration_seconds', 'Tiempo propio de cada tramo de un handler por ruta.', ('route', 'stage'),
+))
+
+
+class _RequestTimer:
+    """Tramos de una petición en curso: pila de hijos abiertos y totales por tramo."""
+
+    __slots__ = ('stages', 'stack')
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        # tiempo de los hijos ya cerrados de cada tramo abierto
+        self.stack: List[float] = []
+
+
+_current: contextvars.ContextVar[Optional[_RequestTimer]] = contextvars.ContextVar('ewaste_request_timer', default=None)
+
+
+class _Span:
+    __slots__ = ('timer', 'stage', 'start')
+
+    def __init__(self, timer: _RequestTimer, stage: str):
+        self.timer, self.stage = timer, stage
+
+    def __enter__(self):
+        self.timer.stack.append(0.0)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        timer = self.timer
+        children = timer.stack.pop()
+        timer.stages[self.stage] = timer.stages.get(self.stage, 0.0) + elapsed - children
+        if timer.stack:
+            timer.stack[-1] += elapsed
+        return False
+
+
+_IDLE = nullcontext()
+
+
+def span(stage: str):
+    """Mide el bloque `with span(stage):` como tramo de la petición en curso (no-op fuera de una petición)."""
+    timer = _current.get()
+    return _IDLE if timer is None else _Span(timer, stage)
+
+
+def _route_path(scope) -> str:
+    route = scope.get('route')
+    return getattr(route, 'path', None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia y conteo por ruta, y los tramos de `span()` de cada petición."""
+
+    def __init__(self, app, exclude: Sequence[str] = ('/metrics',)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path') in self.exclude:
+            await self.app(scope, receive, send)
+            return
+        timer = _RequestTimer()
+        token = _current.set(timer)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = _route_path(scope)
+            method = scope.get('method', '')
+            REQUEST_SECONDS.observe((method, route), elapsed)
+            REQUESTS_TOTAL.inc((method, route, str(status[0])))
+            covered = sum(timer.stages.values())
+            stages = [((route, stage), seconds) for stage, seconds in timer.stages.items()]
+            stages.append(((route, 'other'), max(elapsed - covered, 0.0)))
+            STAGE_SECONDS.observe_many(stages)
@@ -1,18 +1,33 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
-import io
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import weakref
 import pandas as pd
 import numpy as np
 from fastapi.encoders import jsonable_encoder
 
+from pydantic import TypeAdapter
+
 from data_loader import (
-    load_df_country_year,
-    load_df_category_long,
-    load_df_category_pairs,
-    load_master_normalized,
-    load_master_final_fallback,
+    COLUMN_ALIASES,
+    SnapshotWatcher,
+    add_snapshot_listener,
+    build_country_index,
+    canonical_view,
+    country_iso3_codes,
+    current_snapshot,
+    normalize_country_key,
+    memory_report,
+    warm_up,
 )
 from schemas import (
     ChoroplethEntry,
@@ -27,12 +42,79 @@ from schemas import (
     PlacedMarket,
     ScatterPoint,
     ScenarioResult,
+    ScenarioSweep,
+    BatchSeries,
+    ValueSimulation,
+    Aggregate,
+    CategoryPairRows,
+    CategoryCorrelation,
+    Forecast,
+    ForecastBulk,
+    CountryList,
+    CountrySearch,
+)
+from response_cache import ResponseCache, etag_matches, make_key
+from compression import negotiate
+from profiling import PROFILES, TOKEN_HEADER, ProfilingMiddleware, ProfilingRoute, profiling_enabled, token_matches
+from instrumentation import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, sample, span
+from offload import Offloader, Overloaded, work_class_from_env
+from category_pairs import PAIR_SIDES, CategoryPairs, build_category_pairs, pair_sides_from_compact, pair_sides_from_frame
+from category_cube import CategoryCube, build_category_cube
+from export import ENCODERS, EXPORT_FORMATS, gzip_chunks, iter_row_chunks, parquet_available
+from serialization import column_values, float_objects, frame_records, records_from_frame
+from rollups import ALL_GROUP, ROLLUP_METRICS, Rollups, build_rollups, region_groups
+from country_search import CountrySearchIndex, build_search_index
+from forecasting import FORECAST_INTERVALS, FORECAST_MODELS, CountryForecasts, build_forecasts
+from simulation import SimulationSpec, default_spec, simulate_values
+from utils import (
+    PRICE_PER_TONNE_RECOVERED_USD,
+    RECOVERY_FRACTION,
+    value_recoverable_usd_array,
+    value_recoverable_usd_from_kt,
 )
-from utils import value_recoverable_usd_from_kt
 
+logger = logging.getLogger(__name__)
+
+# Estado de la precarga de datasets (lo consulta `/ready`)
+WARMUP_STATE = {'status': 'pending', 'seconds': None, 'timings_ms': {}, 'error': None}
+
+
+# Segundos entre sondeos de `data/` para recargar el snapshot en caliente (0 desactiva)
+DATA_RELOAD_INTERVAL = float(os.environ.get('DATA_RELOAD_INTERVAL', '10'))
+
+
+def _run_warm_up(watcher: Optional[SnapshotWatcher] = None):
+    start = time.perf_counter()
+    try:
+        timings = warm_up()
+    except Exception as exc:  # el worker sigue vivo; /ready lo reporta
+        logger.exception("Dataset warm-up failed")
+        WARMUP_STATE.update(status='error', error=str(exc))
+        return
+    WARMUP_STATE.update(
+        status='ready',
+        seconds=time.perf_counter() - start,
+        timings_ms={k: round(v * 1000.0, 2) for k, v in timings.items()},
+    )
+    logger.info("Dataset warm-up finished in %.3fs: %s", WARMUP_STATE['seconds'], WARMUP_STATE['timings_ms'])
+    if watcher is not None:
+        watcher.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # la precarga corre en segundo plano: /health responde de inmediato y /ready
+    # devuelve 503 hasta que todos los datasets y los índices estén listos;
+    # después el watcher recarga el snapshot si cambian los archivos de data/
+    watcher = SnapshotWatcher(DATA_RELOAD_INTERVAL) if DATA_RELOAD_INTERVAL > 0 else None
+    threading.Thread(target=_run_warm_up, args=(watcher,), name='dataset-warmup', daemon=True).start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    OFFLOAD.shutdown()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,178 +122,415 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "Retry-After"],
 )
+# perfilado bajo demanda solo con PROFILE_TOKEN (ver profiling.py); la clase de
+# ruta tiene que fijarse antes de declarar los endpoints
+if profiling_enabled():
+    app.router.route_class = ProfilingRoute
+    app.add_middleware(ProfilingMiddleware)
+# el último middleware añadido es el más externo: la latencia incluye CORS
+app.add_middleware(MetricsMiddleware)
+
+
+
+# Especificaciones de campos (salida, [columna canónica,] tipo) para `records_from_frame`
+TON_FIELDS = [('country', 'str'), ('year', 'int'), ('e_waste_generated_kt', 'float')]
+PERCAPITA_FIELDS = [
+    ('country', 'str'),
+    ('year', 'int'),
+    ('e_waste_generated_per_capita', 'float'),
+    ('gdp_per_capita', 'float'),
+]
+RECOLECTION_FIELDS = [('country', 'str'), ('year', 'int'), ('e_waste_formally_collected_kt', 'float')]
+PLACED_MARKET_FIELDS = [('country', 'str'), ('year', 'int'), ('eee_placed_on_market_kg_inh', 'float')]
+COLECTION_RATE_FIELDS = [('country', 'str'), ('year', 'int'), ('e_waste_collection_rate', 'float')]
+CHOROPLETH_FIELDS = [
+    ('country', 'str'),
+    ('country_clean', 'str'),
+    ('iso3', 'str'),
+    ('year', 'int'),
+    ('e_waste_generated_per_capita', 'float'),
+    ('e_waste_generated_kt', 'float'),
+    ('e_waste_collection_rate', 'float'),
+]
+TIME_SERIES_FIELDS = [
+    ('year', 'int'),
+    ('ewaste_generated_kg_inh', 'e_waste_generated_per_capita', 'float'),
+    ('eee_placed_on_market_kg_inh', 'float'),
+]
+TIME_SERIES_FULL_FIELDS = [
+    ('year', 'int'),
+    ('e_waste_generated_kt', 'float'),
+    ('ewaste_generated_kg_inh', 'e_waste_generated_per_capita', 'float'),
+    ('eee_placed_on_market_kg_inh', 'float'),
+    ('e_waste_collection_rate', 'float'),
+    ('e_waste_formally_collected_kt', 'float'),
+    ('value_recoverable_usd', 'float'),
+]
+SCATTER_FIELDS = [
+    ('country', 'str'),
+    ('iso3', 'str'),
+    ('gdp_per_capita', 'float'),
+    ('e_waste_generated_per_capita', 'float'),
+    ('population', 'int'),
+    ('e_waste_collection_rate', 'float'),
+]
+CATEGORY_COLUMNS = [
+    'temperature_exchange_equipment_kt',
+    'screens_kt',
+    'lamps_kt',
+    'large_equipment_kt',
+    'small_equipment_kt',
+    'small_it_kt',
+]
+
+
+# Caché de respuestas serializadas para los endpoints más consultados por el dashboard
+RESPONSE_CACHE = ResponseCache(
+    maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', '256')),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(64 << 20))),
+    max_entry_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRY_BYTES', str(8 << 20))),
+)
+RESPONSE_MAX_AGE = int(os.environ.get('RESPONSE_CACHE_MAX_AGE', '60'))
+# un snapshot nuevo deja obsoletas todas las entradas (su versión ya no coincide)
+add_snapshot_listener(lambda snapshot: RESPONSE_CACHE.clear())
+
+# Trabajo pesado (exportaciones, páginas grandes de /data/table): concurrencia y
+# cola acotadas por clase y, con OFFLOAD_WORKERS > 0, pool de procesos que abre
+# el snapshot mapeado en memoria (ver offload.py)
+OFFLOAD = Offloader(
+    workers=int(os.environ.get('OFFLOAD_WORKERS', '0')),
+    classes=[work_class_from_env('export', 2, 4), work_class_from_env('table', 4, 8)],
+    preload=(__name__,),
+    nice=int(os.environ.get('OFFLOAD_WORKER_NICE', '10')),
+)
+add_snapshot_listener(OFFLOAD.prepare)
+# páginas de /data/table con `limit` a partir de este valor cuentan como trabajo pesado
+TABLE_OFFLOAD_ROWS = int(os.environ.get('OFFLOAD_TABLE_MIN_ROWS', '1000'))
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(status_code=503, content={'detail': str(exc)}, headers={'Retry-After': str(exc.retry_after)})
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def _cached_json(request: Request, endpoint: str, params: dict, build: Callable[[], Any], response_type=Any) -> Response:
+    """Respuesta JSON cacheada por (endpoint, params, versión del dataset) con ETag/304.
+
+    `build()` solo se ejecuta si no hay entrada en caché; la validación contra
+    `response_type` (el mismo `response_model` del endpoint) se hace una vez
+    por entrada. Un `If-None-Match` que coincide responde 304 sin tocar pandas.
+    """
+    def render() -> bytes:
+        adapter = _type_adapter(response_type)
+        with span('transform'):
+            payload = build()
+        with span('validate'):
+            payload = adapter.validate_python(payload)
+        with span('serialize'):
+            return adapter.dump_json(payload)
+
+    return _cached_response(request, endpoint, params, render)
+
+
+def _cached_response(request: Request, endpoint: str, params: dict, render: Callable[[], bytes]) -> Response:
+    """Como `_cached_json`, con `render()` devolviendo ya los bytes JSON.
+
+    Si el cliente acepta brotli o gzip (`Accept-Encoding`) y el cuerpo supera
+    `COMPRESS_MIN_BYTES`, se sirve la variante comprimida, que se guarda en la
+    entrada: se comprime una vez por entrada y snapshot, no por petición.
+    """
+    key = make_key(endpoint, params, current_snapshot().version)
+    entry = RESPONSE_CACHE.get_or_build(key, render)
+    headers = {'Cache-Control': f'public, max-age={RESPONSE_MAX_AGE}'}
+    encoding = None
+    if entry.compressible:
+        headers['Vary'] = 'Accept-Encoding'
+        encoding = negotiate(request.headers.get('accept-encoding'))
+    with span('compress'):
+        body, headers['ETag'], content_encoding = RESPONSE_CACHE.encoded(key, entry, encoding)
+    if etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+        return Response(status_code=304, headers=headers)
+    if content_encoding is not None:
+        headers['Content-Encoding'] = content_encoding
+    return Response(content=body, media_type=entry.media_type, headers=headers)
+
+# Métricas disponibles en `/ewaste/batch`: columnas canónicas por país/año,
+# derivadas (calculadas en bloque) y kt por categoría (tabla larga pivotada).
+BATCH_DERIVED_METRICS = ('value_recoverable_usd', 'informal_kt')
+BATCH_METRICS = (
+    tuple(c for c in COLUMN_ALIASES if c not in CATEGORY_COLUMNS)
+    + BATCH_DERIVED_METRICS
+    + tuple(CATEGORY_COLUMNS)
+)
+BATCH_DEFAULT_METRICS = (
+    'e_waste_generated_kt',
+    'e_waste_generated_per_capita',
+    'eee_placed_on_market_kg_inh',
+    'e_waste_collection_rate',
+    'e_waste_formally_collected_kt',
+    'value_recoverable_usd',
+)
+
+def _country_year_source():
+    """Tabla macro por (country, year) y su índice de países; cae a master normalizado."""
+    with span('load'):
+        snap = current_snapshot()
+        df = snap.canonical('df_country_year')
+        if df.empty:
+            return snap.canonical('master_dataset_normalized'), snap.country_index('master_dataset_normalized')
+        return df, snap.country_index('df_country_year')
+
+
+def _master_name(snap) -> str:
+    """Master normalizado, o el denormalizado como respaldo si aquel está vacío."""
+    if snap.frame('master_dataset_normalized').empty:
+        return 'master_final_dataset'
+    return 'master_dataset_normalized'
+
+
+def _category_source():
+    """Tabla larga de categorías (o el master normalizado, también largo) y su índice."""
+    with span('load'):
+        snap = current_snapshot()
+        df = snap.canonical('df_category_long')
+        if df.empty:
+            return snap.canonical('master_dataset_normalized'), snap.country_index('master_dataset_normalized')
+        return df, snap.country_index('df_category_long')
 
 
+def _country_year_table(snap):
+    """Una fila por (country, year) y su índice: `df_country_year` o el master normalizado agrupado."""
+    def build(snap):
+        df = snap.canonical('df_country_year')
+        if not df.empty:
+            return df, snap.country_index('df_country_year')
+        df = snap.canonical('master_dataset_normalized')
+        if 'country' not in df.columns or 'year' not in df.columns:
+            df = pd.DataFrame({'country': pd.Series(dtype=object), 'year': pd.Series(dtype='Int16')})
+        elif 'category' in df.columns:
+            # master normalizado (largo): una fila por country/year
+            df = df.groupby(['country', 'year'], sort=False).first().reset_index()
+        return df, build_country_index(df, snap.country_aliases)
+
+    with span('load'):
+        return snap.derived('country_year_table', build)
+
+
+def _select_country(df: pd.DataFrame, index, country: str, year: Optional[int] = None) -> pd.DataFrame:
+    """Filas de `country` (nombre, nombre limpio o ISO3) ordenadas por año, vía índice."""
+    with span('filter'):
+        sel = df.iloc[index.lookup(country)]
+        if year is not None:
+            sel = sel[sel['year'] == year]
+        return sel
+
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+@app.get("/ready")
+def ready():
+    """Readiness para el balanceador: 200 solo cuando terminó la precarga de datos."""
+    if WARMUP_STATE['status'] != 'ready':
+        return JSONResponse(status_code=503, content=WARMUP_STATE)
+    return {**WARMUP_STATE, 'data_version': current_snapshot().version}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus (ver `instrumentation.py`)."""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def _structure_label(key) -> str:
+    return '/'.join(str(k) for k in key) if isinstance(key, tuple) else str(key)
+
+
+def _snapshot_metrics():
+    """Tiempos de carga del snapshot vigente (sin forzar una carga si aún no hay)."""
+    if WARMUP_STATE['status'] != 'ready':
+        return
+    snap = current_snapshot()
+    yield '# TYPE ewaste_data_snapshot_info gauge'
+    yield sample('ewaste_data_snapshot_info', 1, {'version': snap.version})
+    yield '# TYPE ewaste_warmup_seconds gauge'
+    yield sample('ewaste_warmup_seconds', WARMUP_STATE['seconds'] or 0.0)
+    yield '# HELP ewaste_dataset_load_seconds Tiempo de carga por dataset y etapa del snapshot vigente.'
+    yield '# TYPE ewaste_dataset_load_seconds gauge'
+    for stage, seconds in snap.timings.items():
+        yield sample('ewaste_dataset_load_seconds', seconds, {'stage': stage})
+    yield '# HELP ewaste_derived_build_seconds Tiempo de construcción de cada estructura derivada del snapshot vigente.'
+    yield '# TYPE ewaste_derived_build_seconds gauge'
+    for key, seconds in list(snap.derived_timings.items()):
+        yield sample('ewaste_derived_build_seconds', seconds, {'structure': _structure_label(key)})
+
+
+def _cache_metrics():
+    """Aciertos, fallos, entradas y tasa de acierto de las cachés de respuestas y simulaciones; bytes de la de respuestas."""
+    info = _simulation.cache_info()
+    caches = {
+        'response': (RESPONSE_CACHE.hits, RESPONSE_CACHE.misses, len(RESPONSE_CACHE)),
+        'simulation': (info.hits, info.misses, info.currsize),
+    }
+    for name, kind in (('hits_total', 'counter'), ('misses_total', 'counter'), ('entries', 'gauge'), ('hit_ratio', 'gauge')):
+        yield f'# TYPE ewaste_cache_{name} {kind}'
+        for cache, (hits, misses, entries) in caches.items():
+            value = {
+                'hits_total': hits,
+                'misses_total': misses,
+                'entries': entries,
+                'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+            }[name]
+            yield sample(f'ewaste_cache_{name}', value, {'cache': cache})
+    # solo la caché de respuestas guarda bytes con tamaño conocido
+    yield '# TYPE ewaste_cache_bytes gauge'
+    yield sample('ewaste_cache_bytes', RESPONSE_CACHE.nbytes, {'cache': 'response'})
+
+
+def _offload_metrics():
+    """Estado de las clases de trabajo pesado (ver `OFFLOAD`)."""
+    yield '# TYPE ewaste_offload_workers gauge'
+    yield sample('ewaste_offload_workers', OFFLOAD.workers)
+    stats = {name: work.stats() for name, work in OFFLOAD.classes.items()}
+    for name, kind in (('running', 'gauge'), ('waiting', 'gauge'), ('rejected', 'counter'), ('completed', 'counter')):
+        metric = f'ewaste_offload_{name}' + ('_total' if kind == 'counter' else '')
+        yield f'# TYPE {metric} {kind}'
+        for work_class, values in stats.items():
+            yield sample(metric, values[name], {'class': work_class})
+
+
+REGISTRY.add_collector(_snapshot_metrics)
+REGISTRY.add_collector(_cache_metrics)
+REGISTRY.add_collector(_offload_metrics)
+
+
+def _check_profile_token(request: Request) -> None:
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILE_TOKEN)")
+    if not token_matches(request.headers.get(TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+
+@app.get("/debug/profiles")
+def debug_profiles(request: Request):
+    """Informes de perfilado guardados, el más reciente primero (resumen)."""
+    _check_profile_token(request)
+    return {'profiles': PROFILES.summaries()}
+
+
+@app.get("/debug/profiles/{profile_id}")
+def debug_profile(request: Request, profile_id: str):
+    """Informe completo: funciones por tiempo acumulado y propio, pandas y asignaciones."""
+    _check_profile_token(request)
+    report = PROFILES.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Unknown profile id")
+    return report
+
+
+@app.get("/debug/memory")
+def debug_memory(request: Request):
+    """Memoria por dataset antes/después de la compactación y RSS del worker (con `X-Profile-Token`)."""
+    _check_profile_token(request)
+    return memory_report(current_snapshot())
+
 @app.get("/ewaste/ton", response_model=List[Ton])
 def tonelada(country: str = Query(...)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    out = []
-    for _, r in sel.sort_values(by='year').iterrows():
-        out.append(
-            {
-                'country': _clean_value(r.get('country')),
-                'year': int(r.get('year')) if pd.notna(r.get('year')) else None,
-                'e_waste_generated_kt': _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt')),
-            }
-        )
-    return out
+    return records_from_frame(sel, TON_FIELDS)
 
 @app.get("/ewaste/percapita", response_model=List[Percapita])
 def percapita(country:str = Query(...)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    out = []
-    for _, r in sel.sort_values(by='year').iterrows():
-        out.append(
-            {
-                'country': _clean_value(r.get('country')),
-                'year': int(r.get('year')) if pd.notna(r.get('year')) else None,
-                'e_waste_generated_per_capita': _safe_float(r.get('ewaste_generated_kg_inh') or r.get('E_waste_generated_per_capita') or r.get('e_waste_generated_per_capita')),
-                'gdp_per_capita': _safe_float(r.get('gdp_per_capita') or r.get('GDP_per_capita')),
-            }
-        )
-    return out
+    return records_from_frame(sel, PERCAPITA_FIELDS)
 
 @app.get("/ewaste/formal_recolect", response_model=List[Recolection])
 def formal_recolect(country:str = Query(...)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    out = []
-    for _, r in sel.sort_values(by='year').iterrows():
-        out.append(
-            {
-                'country': _clean_value(r.get('country')),
-                'year': int(r.get('year')) if pd.notna(r.get('year')) else None,
-                'e_waste_formally_collected_kt': _safe_float(r.get('e_waste_formally_collected_kt') or r.get('E_waste_formally_collected_kt') or r.get('ewaste_formally_collected_kg_inh')),
-            }
-        )
-    return out
+    return records_from_frame(sel, RECOLECTION_FIELDS)
 
 @app.get("/ewaste/placed_market", response_model=List[PlacedMarket])
 def placed_market(country: str = Query(...)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    out = []
-    for _, r in sel.sort_values(by='year').iterrows():
-        out.append(
-            {
-                'country': _clean_value(r.get('country')),
-                'year': int(r.get('year')) if pd.notna(r.get('year')) else None,
-                'eee_placed_on_market_kg_inh': _safe_float(r.get('eee_placed_on_market_kg_inh') or r.get('EEE_placed_on_market_kg_inh')),
-            }
-        )
-    return out
+    return records_from_frame(sel, PLACED_MARKET_FIELDS)
 
 @app.get("/ewaste/colection_rate", response_model=List[ColectionRate])
 def colection_rate(country: str = Query(...)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    out = []
-    for _, r in sel.sort_values(by='year').iterrows():
-        out.append(
-            {
-                'country': _clean_value(r.get('country')),
-                'year': int(r.get('year')) if pd.notna(r.get('year')) else None,
-                'e_waste_collection_rate': _safe_float(r.get('e_waste_collection_rate') or r.get('E_waste_collection_rate') or r.get('ewaste_management_collection_rate')),
-            }
-        )
-    return out
+    return records_from_frame(sel, COLECTION_RATE_FIELDS)
 
 @app.get("/ewaste/choropleth", response_model=List[ChoroplethEntry])
-def choropleth(year: Optional[int] = Query(None, description="Año (ej: 2018)")):
-    df = load_df_country_year()
+def choropleth(request: Request, year: Optional[int] = Query(None, description="Año (ej: 2018)")):
+    return _cached_json(request, 'choropleth', {'year': year}, lambda: _choropleth_payload(year), List[ChoroplethEntry])
+
+
+def _choropleth_payload(year: Optional[int]) -> List[dict]:
+    snap = current_snapshot()
+    df = snap.canonical('df_country_year')
     if df.empty:
         # fallback
-        df = load_master_normalized()
+        df = snap.canonical('master_dataset_normalized')
     if year is not None:
         df = df[df['year'] == year]
-    # Seleccionar columnas clave
-    out = []
-    for _, r in df.iterrows():
-        out.append(
-            {
-                'country': _clean_value(r.get('country')),
-                'country_clean': _clean_value(r.get('country_clean')),
-                'iso3': _clean_value(r.get('iso3')),
-                'year': int(r['year']) if pd.notna(r.get('year')) else None,
-                'e_waste_generated_per_capita': _safe_float(r.get('ewaste_generated_kg_inh') or r.get('E_waste_generated_per_capita') or r.get('e_waste_generated_per_capita')),
-                'e_waste_generated_kt': _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt')),
-                'e_waste_collection_rate': _safe_float(r.get('e_waste_collection_rate') or r.get('E_waste_collection_rate') or r.get('ewaste_management_collection_rate')),
-            }
-        )
-    return out
+    return _choropleth_records(df)
+
+
+def _choropleth_records(df: pd.DataFrame) -> List[dict]:
+    return records_from_frame(df, CHOROPLETH_FIELDS)
 
 
 def _safe_float(v):
     try:
         if pd.isna(v):
             return None
+        if isinstance(v, np.float32):
+            # decimal más corto (7.7, no 7.699999809265137) con DATA_FLOAT_PRECISION=32
+            return float(str(v))
         return float(v)
     except Exception:
         return None
 
 
-def _clean_value(v):
-    """Convierte valores pandas/numpy a tipos Python serializables por JSON.
-
-    - NaN / pd.NA -> None
-    - numpy scalars -> native python via .item()
-    """
-    try:
-        if pd.isna(v):
-            return None
-    except Exception:
-        pass
-    if isinstance(v, (np.generic,)):
-        try:
-            return v.item()
-        except Exception:
-            return v
-    return v
+@app.get("/ewaste/stats", response_model=KPIStats)
+def ewaste_stats(request: Request, country: str = Query(...), year: Optional[int] = Query(None)):
+    params = {'country': normalize_country_key(country), 'year': year}
+    return _cached_json(request, 'stats', params, lambda: _stats_payload(country, year), KPIStats)
 
 
-@app.get("/ewaste/stats", response_model=KPIStats)
-def ewaste_stats(country: str = Query(...), year: Optional[int] = Query(None)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
-    if year is not None:
-        sel = sel[sel['year'] == year]
+def _stats_payload(country: str, year: Optional[int]) -> dict:
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country, year)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country/year")
     r = sel.iloc[0]
-    ekt = _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt') or r.get('e_waste_generated_kt_x') or r.get('e_waste_generated_kt_y'))
-    percap = _safe_float(r.get('ewaste_generated_kg_inh') or r.get('E_waste_generated_per_capita') or r.get('e_waste_generated_per_capita'))
-    coll_rate = _safe_float(r.get('e_waste_collection_rate') or r.get('E_waste_collection_rate') or r.get('ewaste_management_collection_rate'))
-    formally_kt = _safe_float(r.get('e_waste_formally_collected_kt') or r.get('E_waste_formally_collected_kt') or r.get('ewaste_formally_collected_kg_inh'))
+    ekt = _safe_float(r.get('e_waste_generated_kt'))
+    percap = _safe_float(r.get('e_waste_generated_per_capita'))
+    coll_rate = _safe_float(r.get('e_waste_collection_rate'))
+    formally_kt = _safe_float(r.get('e_waste_formally_collected_kt'))
     value = value_recoverable_usd_from_kt(ekt)
     return {
         'country': r.get('country'),
@@ -228,22 +547,11 @@ def ewaste_stats(country: str = Query(...), year: Optional[int] = Query(None)):
 
 @app.get("/ewaste/time_series", response_model=List[TimeSeriesPoint])
 def time_series(country: str = Query(...)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    rows = []
-    if isinstance(sel, pd.Series):
-        sel = sel.to_frame().T
-    for _, r in sel.sort_values(by='year').iterrows():
-        rows.append({
-            'year': int(r['year']) if pd.notna(r.get('year')) else None,
-            'ewaste_generated_kg_inh': _safe_float(r.get('ewaste_generated_kg_inh') or r.get('ewaste_generated_kg_inh')),
-            'eee_placed_on_market_kg_inh': _safe_float(r.get('eee_placed_on_market_kg_inh') or r.get('eee_placed_on_market_kg_inh')),
-        })
-    return rows
+    return records_from_frame(sel, TIME_SERIES_FIELDS)
 
 
 @app.get("/ewaste/time_series_full")
@@ -259,67 +567,44 @@ def time_series_full(country: str = Query(...)):
     - e_waste_formally_collected_kt
     - value_recoverable_usd (calculado)
     """
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country")
-    out = []
-    if isinstance(sel, pd.Series):
-        sel = sel.to_frame().T
-    for _, r in sel.sort_values('year').iterrows():
-        ekt = _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt'))
-        percap = _safe_float(r.get('ewaste_generated_kg_inh') or r.get('E_waste_generated_per_capita') or r.get('e_waste_generated_per_capita'))
-        market = _safe_float(r.get('eee_placed_on_market_kg_inh') or r.get('eee_placed_on_market_kg_inh'))
-        coll = _safe_float(r.get('e_waste_collection_rate') or r.get('E_waste_collection_rate') or r.get('ewaste_management_collection_rate'))
-        formally = _safe_float(r.get('e_waste_formally_collected_kt') or r.get('E_waste_formally_collected_kt') or r.get('ewaste_formally_collected_kg_inh'))
-        value = value_recoverable_usd_from_kt(ekt) if ekt is not None else None
-        out.append({
-            'year': int(r['year']) if pd.notna(r.get('year')) else None,
-            'e_waste_generated_kt': ekt,
-            'ewaste_generated_kg_inh': percap,
-            'eee_placed_on_market_kg_inh': market,
-            'e_waste_collection_rate': coll,
-            'e_waste_formally_collected_kt': formally,
-            'value_recoverable_usd': value,
-        })
-    return out
+    sel = sel.assign(value_recoverable_usd=value_recoverable_usd_array(sel['e_waste_generated_kt']))
+    return records_from_frame(sel, TIME_SERIES_FULL_FIELDS)
 
 
 @app.get("/ewaste/categories", response_model=CategoryBreakdown)
 def categories(country: str = Query(...), year: Optional[int] = Query(None)):
     # usar la tabla larga de categorías
-    cat = load_df_category_long()
+    snap = current_snapshot()
+    cat = snap.canonical('df_category_long')
     if cat.empty:
         # fallback a master normalizado
-        master = load_master_normalized()
+        master = snap.canonical('master_dataset_normalized')
         if master.empty:
             raise HTTPException(status_code=404, detail="No category data available")
         # intentar construir respuesta desde master_normalized agrupando
-        sel = master[master['country'].str.lower() == country.lower()]
-        if year is not None:
-            sel = sel[sel['year'] == year]
+        sel = _select_country(master, snap.country_index('master_dataset_normalized'), country, year)
         if sel.empty:
             raise HTTPException(status_code=404, detail="No data for country/year")
         r = sel.iloc[0]
         return {
             'country': r.get('country'),
             'year': int(r['year']) if pd.notna(r.get('year')) else None,
-            'temperature_exchange_equipment_kt': _safe_float(r.get('temperature_exchange_equipment_kt') or r.get('temperature_exchange_equipment_kt')),
-            'screens_kt': _safe_float(r.get('screens_kt') or r.get('screens_kt')),
-            'lamps_kt': _safe_float(r.get('lamps_kt') or r.get('lamps_kt')),
-            'large_equipment_kt': _safe_float(r.get('large_equipment_kt') or r.get('large_equipment_kt')),
-            'small_equipment_kt': _safe_float(r.get('small_equipment_kt') or r.get('small_equipment_kt')),
-            'small_it_kt': _safe_float(r.get('small_it_kt') or r.get('small_it_kt')),
+            'temperature_exchange_equipment_kt': _safe_float(r.get('temperature_exchange_equipment_kt')),
+            'screens_kt': _safe_float(r.get('screens_kt')),
+            'lamps_kt': _safe_float(r.get('lamps_kt')),
+            'large_equipment_kt': _safe_float(r.get('large_equipment_kt')),
+            'small_equipment_kt': _safe_float(r.get('small_equipment_kt')),
+            'small_it_kt': _safe_float(r.get('small_it_kt')),
         }
     # filtrar por país/año y pivotar
-    sel = cat[cat['country'].str.lower() == country.lower()]
-    if year is not None:
-        sel = sel[sel['year'] == year]
+    sel = _select_country(cat, snap.country_index('df_category_long'), country, year)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country/year")
-    pivot = sel.pivot_table(index=['country', 'year'], columns='category', values='kt', aggfunc='first')
+    pivot = sel.pivot_table(index=['country', 'year'], columns='category', values='kt', aggfunc='first', sort=False)
     row = pivot.reset_index().iloc[0]
     return {
         'country': row['country'],
@@ -335,19 +620,15 @@ def categories(country: str = Query(...), year: Optional[int] = Query(None)):
 
 @app.get("/ewaste/sankey", response_model=SankeyNodes)
 def sankey(country: str = Query(...), year: Optional[int] = Query(None)):
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-    sel = df[df['country'].str.lower() == country.lower()]
-    if year is not None:
-        sel = sel[sel['year'] == year]
+    df, index = _country_year_source()
+    sel = _select_country(df, index, country, year)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country/year")
     r = sel.iloc[0]
-    generated = _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt') or r.get('e_waste_generated_kt_x') or r.get('e_waste_generated_kt_y') or 0.0) or 0.0
-    formal = _safe_float(r.get('e_waste_formally_collected_kt') or r.get('E_waste_formally_collected_kt') or r.get('ewaste_formally_collected_kg_inh') or 0.0) or 0.0
-    exported = _safe_float(r.get('e_waste_exported_kt') or r.get('E_waste_exported_kt') or 0.0) or 0.0
-    imported = _safe_float(r.get('e_waste_imported_kt') or r.get('E_waste_imported_kt') or 0.0) or 0.0
+    generated = _safe_float(r.get('e_waste_generated_kt')) or 0.0
+    formal = _safe_float(r.get('e_waste_formally_collected_kt')) or 0.0
+    exported = _safe_float(r.get('e_waste_exported_kt')) or 0.0
+    imported = _safe_float(r.get('e_waste_imported_kt')) or 0.0
     informal = generated - formal - exported + imported
     informal = float(max(informal, 0.0))
     return {
@@ -360,179 +641,358 @@ def sankey(country: str = Query(...), year: Optional[int] = Query(None)):
 
 
 @app.get("/ewaste/heatmap")
-def heatmap(year: Optional[int] = Query(None), metric: str = Query("share", description="'share' or 'kt'")):
+def heatmap(request: Request, year: Optional[int] = Query(None), metric: str = Query("share", description="'share' or 'kt'")):
     """Devuelve por país y año la matriz de categorías para heatmap.
 
     - metric='kt' devuelve los valores en kt para cada categoría.
     - metric='share' devuelve la fracción respecto a e_waste_generated_kt (0-1) para cada categoría.
     """
-    # Prefer the long-format category table (one row per country/year/category)
-    cat = load_df_category_long()
-    if cat.empty:
-        # fallback to master normalized (also long) and pivot
-        cat = load_master_normalized()
+    return _cached_json(request, 'heatmap', {'year': year, 'metric': metric}, lambda: _heatmap_payload(year, metric), List[dict])
+
+
+def _heatmap_cube(snap) -> CategoryCube:
+    """Cubo de categorías del snapshot (se construye al publicarlo, ver listener abajo)."""
+    def build(snap):
+        # preferimos la tabla larga de categorías (una fila por country/year/category)
+        cat = snap.canonical('df_category_long')
         if cat.empty:
-            # final fallback to denormalized master
-            df_f = load_master_final_fallback()
-            if df_f.empty:
-                raise HTTPException(status_code=404, detail="No category data available")
-            # assume df_f is wide: return rows directly (best-effort)
-            df = df_f
-            if year is not None:
-                df = df[df['year'] == year]
-            categories = [
-                'temperature_exchange_equipment_kt',
-                'screens_kt',
-                'lamps_kt',
-                'large_equipment_kt',
-                'small_equipment_kt',
-                'small_it_kt',
-            ]
-            out = []
-            for _, r in df.iterrows():
-                rec = {'country': r.get('country'), 'iso3': r.get('iso3'), 'year': int(r['year']) if pd.notna(r.get('year')) else None}
-                total = _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt'))
-                for c in categories:
-                    val = _safe_float(r.get(c))
-                    if metric == 'kt':
-                        rec[c] = val
-                    else:
-                        rec[c + '_share'] = float(val) / float(total) if total and val is not None and total > 0 else None
-                out.append(rec)
-            return out
-    # now cat is long-format with columns: country, year, category, kt (or similar)
-    df = cat.copy()
-    if year is not None:
-        df = df[df['year'] == year]
-    # pivot to wide so each category becomes a column with kt
-    if 'category' in df.columns and 'kt' in df.columns:
-        pivot = df.pivot_table(index=['country', 'year', 'iso3'] if 'iso3' in df.columns else ['country', 'year'], columns='category', values='kt', aggfunc='first').reset_index()
+            # respaldo: master normalizado (también largo)
+            cat = snap.canonical('master_dataset_normalized')
+        if cat.empty:
+            # último respaldo: las filas macro del master denormalizado ya son
+            # anchas (una columna *_kt por categoría), una por country/year
+            cat = canonical_view(snap.master_final_facts())
+        if cat.empty:
+            return None
+        return build_category_cube(cat, CATEGORY_COLUMNS, totals=snap.canonical('df_country_year'))
+
+    return snap.derived('heatmap_cube', build)
+
+
+add_snapshot_listener(_heatmap_cube)
+
+
+def _heatmap_payload(year: Optional[int], metric: str) -> List[dict]:
+    cube = _heatmap_cube(current_snapshot())
+    if cube is None:
+        raise HTTPException(status_code=404, detail="No category data available")
+    cells = cube.cells_for(year)
+    c, y = cells[:, 0], cells[:, 1]
+    if metric == 'kt':
+        plane, names = cube.kt, list(cube.categories)
     else:
-        # If the long file already has wide-like column names, try to use as-is
-        pivot = df
-    cats = [
-        'temperature_exchange_equipment_kt',
-        'screens_kt',
-        'lamps_kt',
-        'large_equipment_kt',
-        'small_equipment_kt',
-        'small_it_kt',
-    ]
-    out = []
-    for _, r in pivot.iterrows():
-        rec = {'country': _clean_value(r.get('country')), 'iso3': _clean_value(r.get('iso3')) if 'iso3' in r.index else None, 'year': int(r['year']) if pd.notna(r.get('year')) else None}
-        # total ewaste for share computation: prefer e_waste_generated_kt or a column named similarly
-        total = _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt') or r.get('e_waste_generated_kt_x') or r.get('e_waste_generated_kt_y'))
-        for c in cats:
-            val = _safe_float(r.get(c))
-            if metric == 'kt':
-                rec[c] = val
-            else:
-                rec[c + '_share'] = float(val) / float(total) if total and val is not None and total > 0 else None
-        out.append(rec)
-    return out
+        # share = kt / e_waste_generated_kt, solo cuando el total existe y es > 0
+        plane, names = cube.share, [name + '_share' for name in cube.categories]
+    values = plane[c, y]
+    columns = [cube.countries[c].tolist(), cube.iso3[c].tolist(), cube.years[y].tolist()]
+    columns += [float_objects(values[:, k]).tolist() for k in range(len(names))]
+    names = ['country', 'iso3', 'year'] + names
+    return [dict(zip(names, row)) for row in zip(*columns)]
 
 
 @app.get("/ewaste/scatter", response_model=List[ScatterPoint])
-def scatter(year: Optional[int] = Query(None)):
+def scatter(request: Request, year: Optional[int] = Query(None)):
+    return _cached_json(request, 'scatter', {'year': year}, lambda: _scatter_payload(year), List[ScatterPoint])
+
+
+def _scatter_payload(year: Optional[int]) -> List[dict]:
     # Prefer country-year macro table for scatter (one row per country/year)
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-        # if long-format, reduce to one row per country/year by taking first macro columns
-        if not df.empty and 'category' in df.columns:
-            df = df.groupby(['country', 'year']).first().reset_index()
+    df, _ = _country_year_table(current_snapshot())
     if year is not None:
         df = df[df['year'] == year]
-    out = []
-    for _, r in df.iterrows():
-        out.append({
-            'country': _clean_value(r.get('country')),
-            'iso3': _clean_value(r.get('iso3')),
-            'gdp_per_capita': _safe_float(r.get('gdp_per_capita')),
-            'e_waste_generated_per_capita': _safe_float(r.get('ewaste_generated_kg_inh') or r.get('E_waste_generated_per_capita') or r.get('e_waste_generated_per_capita')),
-            'population': (lambda v: int(v) if v is not None else None)(_safe_float(r.get('population'))),
-            'e_waste_collection_rate': _safe_float(r.get('e_waste_collection_rate') or r.get('E_waste_collection_rate')),
-        })
-    return out
+    return records_from_frame(df, SCATTER_FIELDS)
 
 
 @app.get("/data/table")
-def data_table(country: Optional[str] = None, year: Optional[int] = None, limit: int = 100, offset: int = 0):
-    df = load_master_normalized()
-    if df.empty:
-        df = load_master_final_fallback()
+def data_table(
+    request: Request,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    limit: int = 100,
+    offset: int = 0,
+    fields: Optional[List[str]] = Query(None, description="Columnas a devolver (repetir o separar por comas)"),
+    sort: Optional[str] = Query(None, description="Columna de orden; prefijo '-' para descendente"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` de la página anterior (sustituye a offset)"),
+):
+    """Página del master con proyección, orden y paginación por cursor.
+
+    El orden usa permutaciones precalculadas por snapshot (`DataSnapshot.sort_order`)
+    y el cursor guarda el rango de la última fila devuelta, así que una página
+    profunda cuesta lo mismo que la primera. Sin `sort`, las filas salen en el
+    orden del archivo y el cursor guarda la posición de la última.
+    """
+    snap = current_snapshot()
+    name = _master_name(snap)
+    df = snap.frame(name)
+    columns = _split_fields(fields)
+    unknown = [c for c in columns if c not in df.columns]
+    sort_column = sort[1:] if sort and sort.startswith('-') else sort
+    if sort_column and sort_column not in df.columns:
+        unknown.append(sort_column)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    after = _decode_cursor(cursor, snap.version, sort) if cursor is not None else None
+    args = (name, country, year, columns, sort, after, offset, limit)
+
+    def render() -> bytes:
+        if limit >= TABLE_OFFLOAD_ROWS:
+            return OFFLOAD.run('table', snap, _table_page_json, *args)
+        with span('transform'):
+            return _table_page_json(snap, *args)
+
+    params = {'country': country, 'year': year, 'limit': limit, 'offset': offset, 'fields': tuple(columns), 'sort': sort, 'cursor': cursor}
+    return _cached_response(request, 'table', params, render)
+
+
+def _table_page(snap, name: str, country: Optional[str], year: Optional[int], columns: List[str],
+                sort: Optional[str], after: Optional[int], offset: int, limit: int) -> dict:
+    """Página de `/data/table` ya validada; `after` es la clave del cursor (None = usar `offset`)."""
+    df, index = snap.frame(name), snap.country_index(name)
+    sort_column = sort[1:] if sort and sort.startswith('-') else sort
+    positions = _row_positions(df, index, country, year)
+
+    # `ordered`: posiciones en el orden de salida (None = todas, en orden de archivo)
+    # `rank`: clave monótona del cursor para cada posición (None = la propia posición)
+    rank = None
+    if sort_column:
+        order, rank = snap.sort_order(name, sort_column, sort.startswith('-'))
+        ordered = order if positions is None else positions[np.argsort(rank[positions], kind='stable')]
+    else:
+        ordered = positions
+    total = len(df) if ordered is None else len(ordered)
+
+    if after is not None:
+        if positions is None:
+            start = after + 1
+        else:
+            keys = ordered if rank is None else rank[ordered]
+            start = int(np.searchsorted(keys, after, side='right'))
+    else:
+        start = max(offset, 0)
+    stop = min(start + max(limit, 0), total)
+    page = np.arange(start, stop, dtype=np.intp) if ordered is None else ordered[start:stop]
+
+    df_page = df.iloc[page, [df.columns.get_loc(c) for c in columns]] if columns else df.iloc[page]
+    next_cursor = None
+    if stop < total and len(page):
+        last = int(page[-1])
+        next_cursor = _encode_cursor(snap.version, sort, last if rank is None else int(rank[last]))
+    return {"total": int(total), "rows": frame_records(df_page), "next_cursor": next_cursor}
+
+
+def _table_page_json(snap, *args) -> bytes:
+    """`_table_page` serializada como la respondería FastAPI (en el pool si la página es grande)."""
+    return JSONResponse(content=jsonable_encoder(_table_page(snap, *args))).body
+
+
+def _encode_cursor(version: str, sort: Optional[str], key: int) -> str:
+    raw = json.dumps({'v': version[:16], 's': sort or '', 'k': key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str, version: str, sort: Optional[str]) -> int:
+    """Clave del cursor; 400 si está mal formado, es de otro orden o de otra versión de los datos."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        key = int(data['k'])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if data.get('s') != (sort or ''):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort")
+    if data.get('v') != version[:16]:
+        raise HTTPException(status_code=400, detail="Cursor expired (data reloaded); restart pagination")
+    return key
+
+
+def _row_positions(df: pd.DataFrame, index, country: Optional[str], year: Optional[int]) -> Optional[np.ndarray]:
+    """Posiciones de fila que cumplen el filtro (None = todas), sin materializar la selección.
+
+    Siempre en orden de archivo: el índice de países las guarda por año, que es
+    lo que quieren las series, pero tabla y exportación respetan el archivo.
+    """
     if country:
-        df = df[df['country'].str.lower() == country.lower()]
+        positions = np.sort(index.lookup(country))
+        if year is not None and len(positions):
+            keep = df['year'].take(positions).eq(year).to_numpy(dtype=bool, na_value=False)
+            positions = positions[keep]
+        return positions
     if year is not None:
-        df = df[df['year'] == year]
-    total = len(df)
-    df_page = df.iloc[offset: offset + limit]
-    # Convert DataFrame page to JSON-serializable records (replace NaN/pd.NA and numpy types)
-    df_page_clean = df_page.where(pd.notnull(df_page), None)
-    records = df_page_clean.to_dict(orient='records')  # type: ignore
-    # Convert numpy scalars to python primitives
-    def _normalize_record(rec):
-        out = {}
-        for k, v in rec.items():
-            # Convert pandas/np missing values to None
-            try:
-                if pd.isna(v):
-                    out[k] = None
-                    continue
-            except Exception:
-                pass
-            # numpy scalar -> python native
-            if isinstance(v, (np.generic,)):
-                try:
-                    out[k] = v.item()
-                    continue
-                except Exception:
-                    pass
-            # floats that are NaN
-            if isinstance(v, float) and np.isnan(v):
-                out[k] = None
-                continue
-            out[k] = v
-        return out
-
-    rows = [_normalize_record(r) for r in records]
-    # Ensure final structure is JSON-serializable (handles any remaining numpy types)
-    payload = {"total": int(total), "rows": rows}
-    return jsonable_encoder(payload)
+        return np.flatnonzero(df['year'].eq(year).to_numpy(dtype=bool, na_value=False))
+    return None
+
+
+def _split_fields(fields: Optional[List[str]]) -> List[str]:
+    """`fields=a,b&fields=c` -> ['a', 'b', 'c'] (sin duplicados, en orden)."""
+    names = [f.strip() for raw in fields or [] for f in raw.split(',')]
+    return list(dict.fromkeys(f for f in names if f))
+
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', '5000'))
 
 
 @app.get("/data/export")
-def data_export(country: Optional[str] = None, year: Optional[int] = None):
-    df = load_master_normalized()
-    if df.empty:
-        df = load_master_final_fallback()
-    if country:
-        df = df[df['country'].str.lower() == country.lower()]
-    if year is not None:
-        df = df[df['year'] == year]
-    buffer = io.StringIO()
-    df.to_csv(buffer, index=False)
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type='text/csv', headers={"Content-Disposition": "attachment; filename=export.csv"})
+def data_export(
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    format: str = Query('csv', description="'csv', 'ndjson' o 'parquet'"),
+    gzip: bool = Query(False, description="Comprimir la salida con gzip"),
+    fields: Optional[List[str]] = Query(None, description="Columnas a exportar (repetir o separar por comas)"),
+):
+    """Exporta el master filtrado en streaming, por bloques de `EXPORT_CHUNK_ROWS` filas."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unknown format: {format}")
+    if format == 'parquet' and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    with span('load'):
+        snap = current_snapshot()
+        name = _master_name(snap)
+        df = snap.frame(name)
+    columns = _split_fields(fields)
+    unknown = [c for c in columns if c not in df.columns]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    body = OFFLOAD.stream('export', snap, _export_chunks, name, country, year, columns, format, gzip)
+    filename = f"export.{extension}"
+    if gzip:
+        media_type, filename = 'application/gzip', filename + '.gz'
+    return _ClosingStreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """`StreamingResponse` que cierra su iterador al terminar, también si el cliente corta.
+
+    Starlette deja un iterador síncrono a medias hasta que lo recoge el GC; con
+    la exportación en un worker eso lo dejaría bloqueado en el pipe y con la
+    plaza de `export` ocupada.
+    """
+
+    def __init__(self, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self._content = content
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            close = getattr(self._content, 'close', None)
+            if close is not None:
+                close()
+
+
+def _export_chunks(snap, name: str, country: Optional[str], year: Optional[int], columns: List[str], format: str, gzip: bool):
+    """Bytes de la exportación (iterador perezoso; el filtro de filas se resuelve ya)."""
+    df, index = snap.frame(name), snap.country_index(name)
+    positions = _row_positions(df, index, country, year)
+    body = ENCODERS[format](iter_row_chunks(df, positions, columns, EXPORT_CHUNK_ROWS))
+    return gzip_chunks(body) if gzip else body
+
+
+@app.get("/ewaste/batch", response_model=BatchSeries)
+def batch(
+    request: Request,
+    countries: List[str] = Query(..., description="Países (nombre o ISO3); repetible o separados por comas"),
+    year_from: Optional[int] = Query(None),
+    year_to: Optional[int] = Query(None),
+    metrics: Optional[List[str]] = Query(None, description="Métricas a devolver (repetible o separadas por comas); por defecto las de time_series_full"),
+):
+    """Varias series de varios países en una sola respuesta columnar.
+
+    Pensado para las vistas del dashboard que antes llamaban a `stats`,
+    `time_series_full`, `sankey`, `categories`, `ton`, `percapita`... por país.
+    Las filas son (country, year) ordenadas por país (orden pedido) y año.
+    """
+    countries = _split_fields(countries)
+    metrics = _split_fields(metrics) or list(BATCH_DEFAULT_METRICS)
+    unknown = [m for m in metrics if m not in BATCH_METRICS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metrics: {', '.join(unknown)}")
+    params = {
+        'countries': tuple(normalize_country_key(c) for c in countries),
+        'year_from': year_from,
+        'year_to': year_to,
+        'metrics': tuple(metrics),
+    }
+    return _cached_json(request, 'batch', params, lambda: _batch_payload(countries, year_from, year_to, metrics), BatchSeries)
+
+
+def _positions_for(index, countries: List[str]):
+    """Posiciones (sin duplicados, en el orden pedido) y lista de países no encontrados."""
+    chunks, missing = [], []
+    for c in countries:
+        pos = index.lookup(c)
+        if len(pos):
+            chunks.append(pos)
+        else:
+            missing.append(c)
+    if not chunks:
+        return np.empty(0, dtype=np.intp), missing
+    return pd.unique(np.concatenate(chunks)), missing
+
+
+def _batch_payload(countries: List[str], year_from: Optional[int], year_to: Optional[int], metrics: List[str]) -> dict:
+    df, index = _country_year_table(current_snapshot())
+    positions, missing = _positions_for(index, countries)
+    if not len(positions):
+        raise HTTPException(status_code=404, detail="No data for countries")
+    sel = df.iloc[positions]
+    years = sel['year']
+    mask = years.notna()
+    if year_from is not None:
+        mask &= years >= year_from
+    if year_to is not None:
+        mask &= years <= year_to
+    sel = sel[mask.to_numpy(dtype=bool)]
+
+    derived = {}
+    if 'value_recoverable_usd' in metrics:
+        derived['value_recoverable_usd'] = value_recoverable_usd_array(sel['e_waste_generated_kt'])
+    if 'informal_kt' in metrics:
+        # mismo cálculo que `/ewaste/sankey`, con faltantes como 0
+        flows = sel.reindex(columns=['e_waste_generated_kt', 'e_waste_formally_collected_kt', 'e_waste_exported_kt', 'e_waste_imported_kt']).fillna(0.0)
+        informal = flows.iloc[:, 0] - flows.iloc[:, 1] - flows.iloc[:, 2] + flows.iloc[:, 3]
+        derived['informal_kt'] = informal.clip(lower=0.0).to_numpy(dtype='float64')
+    sel = sel.assign(**derived)
+
+    category_metrics = [m for m in metrics if m in CATEGORY_COLUMNS]
+    if category_metrics:
+        cat, cat_index = _category_source()
+        cat_positions, _ = _positions_for(cat_index, countries)
+        pivot = (
+            cat.iloc[cat_positions]
+            .pivot_table(index=['country', 'year'], columns='category', values='kt', aggfunc='first')
+            .reindex(columns=category_metrics)
+            .reset_index()
+        )
+        pivot.columns.name = None
+        sel = sel.drop(columns=[c for c in category_metrics if c in sel.columns]).merge(pivot, on=['country', 'year'], how='left')
+
+    columns = {
+        'country': column_values(sel, 'country', 'str').tolist(),
+        'year': column_values(sel, 'year', 'int').tolist(),
+    }
+    for m in metrics:
+        columns[m] = column_values(sel, m, 'float').tolist()
+    return {
+        'countries': list(dict.fromkeys(columns['country'])),
+        'missing': missing,
+        'metrics': metrics,
+        'rows': len(sel),
+        'columns': columns,
+    }
 
 
 @app.get("/ewaste/scenario", response_model=ScenarioResult)
 def scenario(country: str = Query(...), year: Optional[int] = Query(None), delta_percent: float = Query(10.0, description="Incremento porcentual en la recolección formal")):
     # Use country-year macro table for scenario calculations
-    df = load_df_country_year()
-    if df.empty:
-        df = load_master_normalized()
-        if not df.empty and 'category' in df.columns:
-            df = df.groupby(['country', 'year']).first().reset_index()
-    sel = df[df['country'].str.lower() == country.lower()]
-    if year is not None:
-        sel = sel[sel['year'] == year]
+    df, index = _country_year_table(current_snapshot())
+    sel = _select_country(df, index, country, year)
     if sel.empty:
         raise HTTPException(status_code=404, detail="No data for country/year")
     r = sel.iloc[0]
-    base_formal = _safe_float(r.get('e_waste_formally_collected_kt') or r.get('E_waste_formally_collected_kt') or r.get('ewaste_formally_collected_kg_inh') or 0.0) or 0.0
-    generated = _safe_float(r.get('e_waste_generated_kt') or r.get('E_waste_generated_kt') or r.get('e_waste_generated_kt_x') or r.get('e_waste_generated_kt_y') or 0.0) or 0.0
+    base_formal = _safe_float(r.get('e_waste_formally_collected_kt')) or 0.0
+    generated = _safe_float(r.get('e_waste_generated_kt')) or 0.0
     new_formal = base_formal * (1.0 + delta_percent / 100.0)
     # no superar el total generado
     new_formal = float(min(new_formal, generated))
@@ -548,3 +1008,575 @@ def scenario(country: str = Query(...), year: Optional[int] = Query(None), delta
         'base_value_recoverable_usd': base_value,
         'new_value_recoverable_usd': new_value,
     }
+
+
+SWEEP_MAX_DELTAS = 201
+SWEEP_MAX_CELLS = int(os.environ.get('SCENARIO_SWEEP_MAX_CELLS', '500000'))
+
+
+@app.get("/ewaste/scenario/sweep", response_model=ScenarioSweep)
+def scenario_sweep(
+    request: Request,
+    countries: Optional[List[str]] = Query(None, description="Países (nombre o ISO3); por defecto todos"),
+    year: Optional[int] = Query(None, description="Año; por defecto todos los años"),
+    deltas: Optional[List[str]] = Query(None, description="Incrementos porcentuales (repetir o separar por comas)"),
+    delta_from: float = Query(0.0),
+    delta_to: float = Query(50.0),
+    delta_step: float = Query(5.0, gt=0),
+    recovery_fraction: Optional[float] = Query(None, ge=0, le=1, description="Sustituye a RECOVERY_FRACTION"),
+    price_per_tonne: Optional[float] = Query(None, ge=0, description="Sustituye a PRICE_PER_TONNE_RECOVERED_USD"),
+):
+    """`/ewaste/scenario` para muchas filas (country, year) y muchos deltas de una vez.
+
+    Sin `deltas` se usa el rango `delta_from..delta_to` (inclusive) con paso
+    `delta_step`. La matriz filas × deltas se calcula con broadcasting y respeta
+    el mismo tope que el escenario simple (no superar el total generado).
+    """
+    grid = _sweep_deltas(deltas, delta_from, delta_to, delta_step)
+    params = {
+        'countries': tuple(normalize_country_key(c) for c in countries) if countries else None,
+        'year': year,
+        'deltas': tuple(grid.tolist()),
+        'recovery_fraction': recovery_fraction,
+        'price_per_tonne': price_per_tonne,
+    }
+    return _cached_json(
+        request, 'scenario_sweep', params,
+        lambda: _sweep_payload(countries, year, grid, recovery_fraction, price_per_tonne),
+        ScenarioSweep,
+    )
+
+
+def _sweep_deltas(deltas: Optional[List[str]], start: float, stop: float, step: float) -> np.ndarray:
+    if deltas:
+        try:
+            grid = np.array([float(d) for d in _split_fields(deltas)], dtype='float64')
+        except ValueError:
+            raise HTTPException(status_code=422, detail="deltas must be numbers")
+    else:
+        if stop < start:
+            raise HTTPException(status_code=422, detail="delta_to must be >= delta_from")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        if count > SWEEP_MAX_DELTAS:
+            raise HTTPException(status_code=422, detail=f"At most {SWEEP_MAX_DELTAS} deltas")
+        grid = np.round(start + step * np.arange(count), 10)
+    if not len(grid) or len(grid) > SWEEP_MAX_DELTAS or not np.isfinite(grid).all():
+        raise HTTPException(status_code=422, detail=f"Between 1 and {SWEEP_MAX_DELTAS} finite deltas required")
+    return grid
+
+
+def _sweep_payload(countries: Optional[List[str]], year: Optional[int], grid: np.ndarray,
+                   recovery_fraction: Optional[float], price_per_tonne: Optional[float]) -> dict:
+    df, index = _country_year_table(current_snapshot())
+    missing = []
+    if countries:
+        positions, missing = _positions_for(index, countries)
+        sel = df.iloc[positions]
+    else:
+        sel = df
+    if year is not None:
+        sel = sel[sel['year'].eq(year).to_numpy(dtype=bool, na_value=False)]
+    if sel.empty:
+        raise HTTPException(status_code=404, detail="No data for countries/year")
+    if len(sel) * len(grid) > SWEEP_MAX_CELLS:
+        raise HTTPException(status_code=422, detail=f"Too many scenarios ({len(sel)} rows x {len(grid)} deltas > {SWEEP_MAX_CELLS})")
+
+    # mismos supuestos que `/ewaste/scenario`: faltantes como 0
+    generated = sel['e_waste_generated_kt'].to_numpy(dtype='float64', na_value=np.nan) if 'e_waste_generated_kt' in sel.columns else np.zeros(len(sel))
+    base = sel['e_waste_formally_collected_kt'].to_numpy(dtype='float64', na_value=np.nan) if 'e_waste_formally_collected_kt' in sel.columns else np.zeros(len(sel))
+    generated, base = np.nan_to_num(generated), np.nan_to_num(base)
+    # filas x deltas
+    new = np.minimum(base[:, None] * (1.0 + grid[None, :] / 100.0), generated[:, None])
+
+    def value(kt):
+        return value_recoverable_usd_array(kt, recovery_fraction, price_per_tonne)
+
+    base_value = value(np.where(base != 0, base, generated))
+    return {
+        'deltas': grid.tolist(),
+        'recovery_fraction': RECOVERY_FRACTION if recovery_fraction is None else recovery_fraction,
+        'price_per_tonne_recovered_usd': PRICE_PER_TONNE_RECOVERED_USD if price_per_tonne is None else price_per_tonne,
+        'missing': missing,
+        'rows': len(sel),
+        'country': column_values(sel, 'country', 'str').tolist(),
+        'year': column_values(sel, 'year', 'int').tolist(),
+        'generated_kt': generated.tolist(),
+        'base_formally_collected_kt': base.tolist(),
+        'base_value_recoverable_usd': base_value.tolist(),
+        'new_formally_collected_kt': new.tolist(),
+        'delta_absolute_kt': (new - base[:, None]).tolist(),
+        'new_value_recoverable_usd': value(new).tolist(),
+    }
+
+
+SIMULATION_MAX_DRAWS = int(os.environ.get('SIMULATION_MAX_DRAWS', '5000000'))
+SIMULATION_MAX_SAMPLES = int(os.environ.get('SIMULATION_MAX_SAMPLES', '100000000'))
+SIMULATION_CHUNK_CELLS = int(os.environ.get('SIMULATION_CHUNK_CELLS', '2000000'))
+SIMULATION_BASES = ('generated', 'formal')
+
+
+@app.get("/ewaste/simulate", response_model=ValueSimulation)
+def simulate(
+    request: Request,
+    countries: Optional[List[str]] = Query(None, description="Países (nombre o ISO3); por defecto todos"),
+    year: Optional[int] = Query(None),
+    basis: str = Query('generated', description="'generated' (como /ewaste/stats) o 'formal' (como /ewaste/scenario)"),
+    delta_percent: Optional[float] = Query(None, description="Escenario: incremento de la recolección formal (usa basis='formal')"),
+    recovery: Optional[str] = Query(None, description="Distribución de RECOVERY_FRACTION, p.ej. 'triangular:0.01,0.02,0.03'"),
+    price: Optional[str] = Query(None, description="Distribución del precio por tonelada, p.ej. 'normal:2000,400'"),
+    draws: int = Query(10000, ge=1),
+    seed: int = Query(0, ge=0),
+    kt_cv: float = Query(0.0, ge=0, le=1, description="Incertidumbre relativa de los kt de cada fila"),
+):
+    """Bandas p5/p50/p95 del valor recuperable con parámetros muestreados (Monte Carlo).
+
+    La simulación se hace de una vez para todas las filas (country, year) y se
+    guarda en una LRU por conjunto de parámetros y versión de datos; los
+    filtros `countries`/`year` solo seleccionan filas del resultado.
+    """
+    if basis not in SIMULATION_BASES:
+        raise HTTPException(status_code=422, detail=f"basis must be one of: {', '.join(SIMULATION_BASES)}")
+    if delta_percent is not None:
+        basis = 'formal'
+    if draws > SIMULATION_MAX_DRAWS:
+        raise HTTPException(status_code=422, detail=f"At most {SIMULATION_MAX_DRAWS} draws")
+    try:
+        spec = default_spec(recovery, price, draws=draws, seed=seed, kt_cv=kt_cv)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    params = {
+        'countries': tuple(normalize_country_key(c) for c in countries) if countries else None,
+        'year': year,
+        'basis': basis,
+        'delta_percent': delta_percent,
+        'spec': (str(spec.recovery), str(spec.price), draws, seed, kt_cv),
+    }
+    return _cached_json(request, 'simulate', params, lambda: _simulation_payload(countries, year, basis, delta_percent, spec), ValueSimulation)
+
+
+class _SnapshotKey:
+    """Snapshot como argumento de `lru_cache`: se compara y se hashea por su versión.
+
+    Guarda una referencia débil: la caché no retiene snapshots ya reemplazados.
+    """
+
+    __slots__ = ('version', '_ref')
+
+    def __init__(self, snap):
+        self.version = snap.version
+        self._ref = weakref.ref(snap)
+
+    @property
+    def snap(self):
+        return self._ref()
+
+    def __hash__(self) -> int:
+        return hash(self.version)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _SnapshotKey) and other.version == self.version
+
+
+@lru_cache(maxsize=int(os.environ.get('SIMULATION_CACHE_SIZE', '32')))
+def _simulation(key: _SnapshotKey, spec: SimulationSpec, basis: str, delta_percent: Optional[float]):
+    """Simulación de todas las filas (country, year) de `key.snap` para un conjunto de parámetros.
+
+    Los datos salen del snapshot de la clave, no del vigente: durante una
+    recarga no se guardan resultados de una versión bajo la clave de otra.
+    """
+    df, _ = _country_year_table(key.snap)
+    rows = df.reindex(columns=['country', 'year', 'e_waste_generated_kt', 'e_waste_formally_collected_kt'])
+    generated = rows['e_waste_generated_kt'].to_numpy(dtype='float64', na_value=np.nan)
+    if basis == 'generated':
+        kt = generated
+    else:
+        # mismos supuestos que `/ewaste/scenario`: faltantes como 0, tope en lo generado
+        generated = np.nan_to_num(generated)
+        formal = np.nan_to_num(rows['e_waste_formally_collected_kt'].to_numpy(dtype='float64', na_value=np.nan))
+        if delta_percent is None:
+            kt = np.where(formal != 0, formal, generated)
+        else:
+            kt = np.minimum(formal * (1.0 + delta_percent / 100.0), generated)
+    if spec.kt_cv > 0 and len(kt) * spec.draws > SIMULATION_MAX_SAMPLES:
+        raise HTTPException(status_code=422, detail=f"Too many samples ({len(kt)} rows x {spec.draws} draws > {SIMULATION_MAX_SAMPLES})")
+    result = simulate_values(kt, spec, chunk_cells=SIMULATION_CHUNK_CELLS)
+    return rows[['country', 'year']].assign(kt=kt), result
+
+
+def _simulation_payload(countries: Optional[List[str]], year: Optional[int], basis: str,
+                        delta_percent: Optional[float], spec: SimulationSpec) -> dict:
+    snap = current_snapshot()
+    rows, result = _simulation(_SnapshotKey(snap), spec, basis, delta_percent)
+    mask = np.ones(len(rows), dtype=bool)
+    missing = []
+    if countries:
+        df, index = _country_year_table(snap)
+        positions, missing = _positions_for(index, countries)
+        wanted = pd.unique(df['country'].to_numpy(dtype=object)[positions])
+        mask &= rows['country'].isin(wanted).to_numpy(dtype=bool)
+    if year is not None:
+        mask &= rows['year'].eq(year).to_numpy(dtype=bool, na_value=False)
+    if not mask.any():
+        raise HTTPException(status_code=404, detail="No data for countries/year")
+    sel = rows[mask]
+    kt = sel['kt'].to_numpy(dtype='float64')
+    percentiles = result.percentiles[mask]
+
+    def floats(values):
+        return column_values(pd.DataFrame({'v': values}), 'v', 'float').tolist()
+
+    return {
+        'basis': basis,
+        'delta_percent': delta_percent,
+        'recovery_fraction': str(spec.recovery),
+        'price_per_tonne_recovered_usd': str(spec.price),
+        'draws': spec.draws,
+        'seed': spec.seed,
+        'kt_cv': spec.kt_cv,
+        'clipped': result.clipped,
+        'missing': missing,
+        'rows': len(sel),
+        'country': column_values(sel, 'country', 'str').tolist(),
+        'year': column_values(sel, 'year', 'int').tolist(),
+        'kt': floats(kt),
+        'value_recoverable_usd': floats(value_recoverable_usd_array(kt)),
+        'mean': floats(result.mean[mask]),
+        'bands': {f"p{q:g}": floats(percentiles[:, j]) for j, q in enumerate(spec.percentiles)},
+    }
+
+
+def _rollups(snap) -> Rollups:
+    """Agregados por grupo/año del snapshot (se calculan al publicarlo, ver listener abajo)."""
+    return snap.derived('rollups', lambda snap: build_rollups(*_country_year_table(snap), region_groups()))
+
+
+add_snapshot_listener(_rollups)
+
+
+@app.get("/ewaste/aggregate", response_model=Aggregate)
+def aggregate(
+    request: Request,
+    group: List[str] = Query([ALL_GROUP], description="Grupo de países ('all', 'andean', 'central_america'...); repetible"),
+    metric: List[str] = Query(['e_waste_generated_kt'], description="Métricas a agregar; repetible"),
+    year: Optional[int] = Query(None, description="Año; por defecto todos"),
+):
+    """Totales y medias ponderadas por grupo de países y año, precalculados por snapshot.
+
+    Las sumas (kt, población, valor recuperable) son el total de los países del
+    grupo con dato; los valores per cápita se ponderan por población y la tasa
+    de recolección por kt generados.
+    """
+    rollups = _rollups(current_snapshot())
+    groups = list(dict.fromkeys(group))
+    metrics = list(dict.fromkeys(metric))
+    unknown = [g for g in groups if g not in rollups.groups]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown groups: {', '.join(unknown)} (use {', '.join(rollups.groups)})")
+    unknown = [m for m in metrics if m not in rollups.metrics]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metrics: {', '.join(unknown)}")
+    params = {'group': tuple(groups), 'metric': tuple(metrics), 'year': year}
+    return _cached_json(request, 'aggregate', params, lambda: _aggregate_payload(rollups, groups, metrics, year), Aggregate)
+
+
+def _aggregate_payload(rollups: Rollups, groups: List[str], metrics: List[str], year: Optional[int]) -> dict:
+    years = rollups.year_positions(year)
+    if not len(years):
+        raise HTTPException(status_code=404, detail=f"No data for year {year}")
+    g_pos, m_pos = rollups.group_positions(groups), rollups.metric_positions(metrics)
+    # filas (grupo, año) en orden grupo-mayor: [grupos][métricas][años] -> [métricas][grupos*años]
+    values = rollups.values[np.ix_(g_pos, m_pos, years)].transpose(1, 0, 2).reshape(len(metrics), -1)
+    reporting = rollups.reporting[np.ix_(g_pos, m_pos, years)].transpose(1, 0, 2).reshape(len(metrics), -1)
+    columns = {
+        'group': [g for g in groups for _ in years],
+        'year': rollups.years[years].tolist() * len(groups),
+    }
+    for j, m in enumerate(metrics):
+        columns[m] = [None if np.isnan(v) else float(v) for v in values[j]]
+    return {
+        'groups': groups,
+        'metrics': metrics,
+        'weights': {m: ROLLUP_METRICS[m] for m in metrics},
+        'members': {g: list(rollups.members[g]) for g in groups},
+        'missing': {g: list(rollups.missing[g]) for g in groups},
+        'rows': len(groups) * len(years),
+        'columns': columns,
+        'reporting': {m: reporting[j].tolist() for j, m in enumerate(metrics)},
+    }
+
+
+def _category_pairs(snap) -> CategoryPairs:
+    """Pares de categorías y correlaciones del snapshot (se calculan al publicarlo)."""
+    def build(snap):
+        table = snap.compact.get('df_category_pairs')
+        if table is not None:
+            sides = pair_sides_from_compact(table)
+        else:
+            sides = pair_sides_from_frame(snap.frame('df_category_pairs'))
+        return build_category_pairs(*sides, aliases=snap.country_aliases)
+
+    return snap.derived('category_pairs', build)
+
+
+add_snapshot_listener(_category_pairs)
+
+
+@app.get("/ewaste/category_pairs", response_model=CategoryPairRows)
+def category_pairs(
+    request: Request,
+    countries: Optional[List[str]] = Query(None, description="Países (nombre o ISO3); por defecto todos"),
+    year: Optional[int] = Query(None),
+):
+    """Pares de categorías (x, y) con sus shares por país y año, sin las filas repetidas de la tabla explotada."""
+    params = {
+        'countries': tuple(normalize_country_key(c) for c in countries) if countries else None,
+        'year': year,
+    }
+    return _cached_json(request, 'category_pairs', params, lambda: _category_pairs_payload(countries, year), CategoryPairRows)
+
+
+def _category_pairs_payload(countries: Optional[List[str]], year: Optional[int]) -> dict:
+    pairs = _category_pairs(current_snapshot())
+    country_pos, missing = None, []
+    if countries:
+        country_pos = []
+        for c in countries:
+            pos = pairs.country_keys.get(normalize_country_key(c))
+            if pos is None:
+                missing.append(c)
+            elif pos not in country_pos:
+                country_pos.append(pos)
+    rows = pairs.pair_positions(country_pos, year)
+    if not len(rows):
+        raise HTTPException(status_code=404, detail="No category pairs for countries/year")
+    categories = np.array(pairs.categories, dtype=object)
+    columns = {
+        'country': pairs.countries[pairs.pair_country[rows]].tolist(),
+        'year': pairs.years[pairs.pair_year[rows]].tolist(),
+    }
+    for side in PAIR_SIDES:
+        columns['category_' + side] = categories[pairs.pair_category[side][rows]].tolist()
+    for side in PAIR_SIDES:
+        columns['share_' + side] = float_objects(pairs.pair_share[side][rows]).tolist()
+    for side in PAIR_SIDES:
+        columns['value_' + side] = float_objects(pairs.pair_value[side][rows]).tolist()
+    return {'categories': list(pairs.categories), 'missing': missing, 'rows': len(rows), 'columns': columns}
+
+
+@app.get("/ewaste/category_pairs/correlation", response_model=CategoryCorrelation)
+def category_correlation(
+    request: Request,
+    year: Optional[int] = Query(None, description="Año; por defecto todas las filas país/año juntas"),
+    side: str = Query('x', description="Lado de la tabla de pares cuyos shares se correlacionan: 'x' o 'y'"),
+):
+    """Matriz de correlación (Pearson) entre los shares de las categorías a través de los países.
+
+    Precalculada por snapshot para cada año y lado; `counts` da los países
+    (o filas país/año) que entran en cada coeficiente.
+    """
+    if side not in PAIR_SIDES:
+        raise HTTPException(status_code=422, detail=f"side must be one of: {', '.join(PAIR_SIDES)}")
+    params = {'year': year, 'side': side}
+    return _cached_json(request, 'category_correlation', params, lambda: _category_correlation_payload(year, side), CategoryCorrelation)
+
+
+def _category_correlation_payload(year: Optional[int], side: str) -> dict:
+    pairs = _category_pairs(current_snapshot())
+    if year is None:
+        pos = len(pairs.years)
+    else:
+        pos = pairs.year_position(year)
+        if pos is None:
+            raise HTTPException(status_code=404, detail=f"No category pairs for year {year}")
+    matrix = pairs.correlation[side][pos]
+    return {
+        'year': year,
+        'side': side,
+        'categories': list(pairs.categories),
+        'matrix': [float_objects(row).tolist() for row in matrix],
+        'counts': pairs.counts[side][pos].tolist(),
+    }
+
+
+FORECAST_METRICS = ('e_waste_generated_kt', 'e_waste_generated_per_capita', 'value_recoverable_usd')
+FORECAST_MAX_HORIZON = int(os.environ.get('FORECAST_MAX_HORIZON', '10'))
+
+
+def _forecasts(snap) -> CountryForecasts:
+    """Tendencias de todos los países y modelos (se ajustan al publicar el snapshot)."""
+    def build(snap):
+        df, _ = _country_year_table(snap)
+        if 'e_waste_generated_kt' in df.columns:
+            df = df.assign(value_recoverable_usd=value_recoverable_usd_array(df['e_waste_generated_kt']))
+        return build_forecasts(df, FORECAST_METRICS, FORECAST_MAX_HORIZON)
+
+    return snap.derived('forecasts', build)
+
+
+add_snapshot_listener(_forecasts)
+
+
+def _check_forecast_params(metrics: List[str], model: str, interval: str) -> None:
+    unknown = [m for m in metrics if m not in FORECAST_METRICS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metrics: {', '.join(unknown)} (use {', '.join(FORECAST_METRICS)})")
+    if model not in FORECAST_MODELS:
+        raise HTTPException(status_code=422, detail=f"model must be one of: {', '.join(FORECAST_MODELS)}")
+    if interval not in FORECAST_INTERVALS:
+        raise HTTPException(status_code=422, detail=f"interval must be one of: {', '.join(FORECAST_INTERVALS)}")
+
+
+@app.get("/ewaste/forecast", response_model=Forecast)
+def forecast(
+    request: Request,
+    country: str = Query(...),
+    metric: Optional[List[str]] = Query(None, description="Métricas a proyectar; por defecto todas"),
+    horizon: int = Query(5, ge=1, le=FORECAST_MAX_HORIZON, description="Años a proyectar tras el último año con datos"),
+    model: str = Query('linear', description="'linear' o 'loglinear'"),
+    level: float = Query(0.95, gt=0, lt=1, description="Nivel del intervalo"),
+    interval: str = Query('prediction', description="'prediction' (un año concreto) o 'confidence' (la tendencia)"),
+):
+    """Histórico y proyección de tendencia de un país, con intervalos.
+
+    Los ajustes de todos los países se hacen una vez por snapshot
+    (`forecasting.py`); una petición solo lee la fila del país.
+    """
+    metrics = list(dict.fromkeys(metric or FORECAST_METRICS))
+    _check_forecast_params(metrics, model, interval)
+    params = {
+        'country': normalize_country_key(country),
+        'metric': tuple(metrics),
+        'horizon': horizon,
+        'model': model,
+        'level': level,
+        'interval': interval,
+    }
+    return _cached_json(request, 'forecast', params, lambda: _forecast_payload(country, metrics, horizon, model, level, interval), Forecast)
+
+
+def _forecast_payload(country: str, metrics: List[str], horizon: int, model: str, level: float, interval: str) -> dict:
+    snap = current_snapshot()
+    forecasts = _forecasts(snap)
+    df, index = _country_year_table(snap)
+    positions = index.lookup(country)
+    if not len(positions):
+        raise HTTPException(status_code=404, detail="No data for country")
+    name = str(df['country'].iloc[positions[0]])
+    pos = forecasts.positions.get(name)
+    if pos is None:
+        raise HTTPException(status_code=404, detail="No data for country")
+    first = forecasts.fits[(model, metrics[0])]
+    observed = np.zeros(len(first.years), dtype=bool)
+    for m in metrics:
+        observed |= ~np.isnan(forecasts.fits[(model, m)].values[pos])
+    history = {'year': first.years[observed].tolist()}
+    projection = {'year': first.forecast_years[:horizon].tolist()}
+    fit = {}
+    for m in metrics:
+        trend = forecasts.fits[(model, m)]
+        history[m] = float_objects(trend.values[pos, observed]).tolist()
+        value, lower, upper = (a[pos] for a in trend.interval(horizon, level, interval))
+        projection[m] = float_objects(value).tolist()
+        projection[m + '_lower'] = float_objects(lower).tolist()
+        projection[m + '_upper'] = float_objects(upper).tolist()
+        fit[m] = {
+            'slope': _safe_float(trend.slope[pos]),
+            'r2': _safe_float(trend.r2[pos]),
+            'n': int(trend.n[pos]),
+        }
+    return {
+        'country': name,
+        'model': model,
+        'interval': interval,
+        'level': level,
+        'metrics': metrics,
+        'history': history,
+        'forecast': projection,
+        'fit': fit,
+    }
+
+
+@app.get("/ewaste/forecast/all", response_model=ForecastBulk)
+def forecast_all(
+    request: Request,
+    metric: str = Query('e_waste_generated_kt'),
+    horizon: int = Query(5, ge=1, le=FORECAST_MAX_HORIZON),
+    model: str = Query('linear', description="'linear' o 'loglinear'"),
+    level: float = Query(0.95, gt=0, lt=1),
+    interval: str = Query('prediction', description="'prediction' o 'confidence'"),
+):
+    """Proyección de una métrica para todos los países: matrices `[país][año proyectado]`."""
+    _check_forecast_params([metric], model, interval)
+    params = {'metric': metric, 'horizon': horizon, 'model': model, 'level': level, 'interval': interval}
+    return _cached_json(request, 'forecast_all', params, lambda: _forecast_all_payload(metric, horizon, model, level, interval), ForecastBulk)
+
+
+def _forecast_all_payload(metric: str, horizon: int, model: str, level: float, interval: str) -> dict:
+    forecasts = _forecasts(current_snapshot())
+    if not forecasts.countries:
+        raise HTTPException(status_code=404, detail="No country data available")
+    trend = forecasts.fits[(model, metric)]
+    value, lower, upper = trend.interval(horizon, level, interval)
+
+    def matrix(arr):
+        return [float_objects(row).tolist() for row in arr]
+
+    return {
+        'metric': metric,
+        'model': model,
+        'interval': interval,
+        'level': level,
+        'years': trend.forecast_years[:horizon].tolist(),
+        'countries': list(forecasts.countries),
+        'value': matrix(value),
+        'lower': matrix(lower),
+        'upper': matrix(upper),
+        'slope': float_objects(trend.slope).tolist(),
+        'r2': float_objects(trend.r2).tolist(),
+        'n': trend.n.tolist(),
+    }
+
+
+def _country_search(snap) -> CountrySearchIndex:
+    """Trie + trigramas sobre los nombres de los países (se construye al publicar el snapshot)."""
+    def build(snap):
+        df, _ = _country_year_table(snap)
+        sources = {'master_final_dataset': snap.master_final_facts(), 'df_country_year': snap.frame('df_country_year')}
+        return build_search_index(df['country'].dropna().astype(str), snap.country_aliases, country_iso3_codes(sources))
+
+    return snap.derived('country_search', build)
+
+
+add_snapshot_listener(_country_search)
+
+
+@app.get("/ewaste/countries", response_model=CountryList)
+def countries(request: Request):
+    """Países del dataset con su ISO3 y los nombres que aceptan los demás endpoints."""
+    index = _country_search(current_snapshot())
+    return _cached_json(request, 'countries', {}, lambda: _countries_payload(index), CountryList)
+
+
+def _countries_payload(index: CountrySearchIndex) -> dict:
+    return {
+        'countries': [
+            {'country': country, 'iso3': iso3, 'names': list(names)}
+            for country, iso3, names in index.entries
+        ],
+    }
+
+
+@app.get("/ewaste/countries/search", response_model=CountrySearch)
+def countries_search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Texto tecleado: nombre (inglés o español), parte de él o ISO3"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Autocompletado de países, sin distinguir mayúsculas ni tildes.
+
+    Orden: coincidencia exacta, prefijo del nombre, prefijo de una palabra y,
+    si faltan resultados, nombres parecidos (errores de tecleo).
+    """
+    index = _country_search(current_snapshot())
+    params = {'q': q, 'limit': limit}
+    return _cached_json(request, 'countries_search', params, lambda: {'query': q, 'results': index.search(q, limit)}, CountrySearch)
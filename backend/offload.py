@@ -0,0 +1,487 @@
+"""Trabajo pesado fuera del proceso de la API: clases de trabajo con admisión y pool de procesos.
+
+Los endpoints son `def` síncronos y comparten el threadpool de Starlette; una
+exportación o una página enorme de `/data/table` retiene el GIL (pandas) y
+frena a los endpoints ligeros que corren a la vez. Aquí:
+
+- Cada clase de trabajo (`export`, `table`) tiene un límite de concurrencia y
+  una cola acotada. Si la cola está llena (o la espera supera su `timeout`),
+  se lanza `Overloaded` con un `retry_after` estimado y la API responde 503 +
+  `Retry-After`. Esperar en cola ocupa un hilo del threadpool, así que los
+  límites también reservan hilos para los endpoints ligeros.
+- Con `OFFLOAD_WORKERS > 0`, el trabajo admitido corre en un pool de procesos
+  (`spawn`). Los workers no reciben DataFrames serializados: abren el snapshot
+  columnar mapeado en memoria (`attach_shared_snapshot`), el de
+  `DATA_SHARED_DIR` si existe o uno privado que se vuelca al publicar cada
+  snapshot. Cada worker lo abre una vez por versión. Con 0 workers (por
+  defecto) el trabajo corre en el hilo de la petición, con la misma admisión.
+- Las exportaciones vuelven del worker en streaming por un pipe, bloque a
+  bloque: el primer byte sale en cuanto el worker produce el primer bloque, y
+  si el cliente lee despacio el pipe se llena y el worker espera (memoria
+  acotada). La plaza se mantiene hasta que termina el envío.
+
+Las funciones que se mandan al pool reciben el snapshot como primer argumento
+y tienen que ser funciones de módulo (se serializan por nombre).
+"""
+import atexit
+import importlib
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from data_loader import DataSnapshot, attach_shared_snapshot, write_shared_snapshot
+
+logger = logging.getLogger(__name__)
+
+# segundos entre comprobaciones de que el worker sigue vivo mientras se espera un bloque
+PIPE_POLL_SECONDS = 0.5
+# peso de la última duración en la media móvil que estima `Retry-After`
+DURATION_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    """La clase de trabajo no admite más peticiones ahora; reintentar tras `retry_after` segundos."""
+
+    def __init__(self, work_class: str, retry_after: int):
+        super().__init__(f"Too many concurrent '{work_class}' requests")
+        self.work_class = work_class
+        self.retry_after = retry_after
+
+
+class SnapshotUnavailable(Exception):
+    """El worker no pudo abrir el snapshot pedido (p.ej. ya lo reemplazó una recarga)."""
+
+
+class _Ticket:
+    """Plaza ocupada en una clase de trabajo; `release()` es idempotente."""
+
+    __slots__ = ('work_class', 'start', 'released')
+
+    def __init__(self, work_class: 'WorkClass'):
+        self.work_class = work_class
+        self.start = time.perf_counter()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.work_class._finished(time.perf_counter() - self.start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class WorkClass:
+    """Límite de concurrencia (`concurrency`) más una cola de espera acotada (`queue`)."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.queue = max(queue, 0)
+        self.timeout = timeout
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+        # media móvil de la duración de un trabajo (segundos)
+        self.avg_seconds = 1.0
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se libere sitio para una petición más."""
+        return max(1, math.ceil(self.avg_seconds * (self.waiting + 1) / self.concurrency))
+
+    def _reject(self) -> Overloaded:
+        with self._lock:
+            self.rejected += 1
+            return Overloaded(self.name, self.retry_after())
+
+    def admit(self) -> _Ticket:
+        """Espera una plaza (como mucho `timeout` s); `Overloaded` si la cola está llena o se agota la espera."""
+        with self._lock:
+            full = self.running + self.waiting >= self.concurrency + self.queue
+            if not full:
+                self.waiting += 1
+        if full:
+            raise self._reject()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.running += 1
+        if not acquired:
+            raise self._reject()
+        return _Ticket(self)
+
+    def _finished(self, seconds: float) -> None:
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+            self.avg_seconds += DURATION_SMOOTHING * (seconds - self.avg_seconds)
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'running': self.running,
+                'waiting': self.waiting,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'avg_seconds': self.avg_seconds,
+            }
+
+
+def work_class_from_env(name: str, concurrency: int, queue: int) -> WorkClass:
+    """`WorkClass` con `OFFLOAD_<NAME>_CONCURRENCY` / `OFFLOAD_<NAME>_QUEUE` (o los valores dados)."""
+    prefix = f'OFFLOAD_{name.upper()}'
+    return WorkClass(
+        name,
+        int(os.environ.get(f'{prefix}_CONCURRENCY', str(concurrency))),
+        int(os.environ.get(f'{prefix}_QUEUE', str(queue))),
+        float(os.environ.get('OFFLOAD_QUEUE_TIMEOUT', '30')),
+    )
+
+
+class _HeldStream:
+    """Iterador de bytes que libera su ticket al agotarse, cerrarse o recogerse."""
+
+    def __init__(self, chunks: Iterable[bytes], ticket: _Ticket):
+        self._chunks = iter(chunks)
+        self._ticket = ticket
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        self._ticket.release()
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # generador en marcha en otro hilo: termina por su cuenta
+                pass
+
+    def __del__(self):
+        self.close()
+
+
+class _PipeStream:
+    """Bloques que envía el worker por el pipe, hasta el mensaje vacío final.
+
+    Si el worker falla, su excepción se relanza en `__next__`. El extremo de
+    escritura de la API se cierra con el primer mensaje (el worker ya tiene el
+    suyo), así que si el worker muere el pipe da EOF. `close()` se puede llamar
+    desde otro hilo mientras `__next__` espera: el pipe lo cierra quien tenga
+    el lock. Con el lector cerrado, el worker recibe EPIPE y deja de producir.
+    """
+
+    def __init__(self, reader, writer, future):
+        self._reader = reader
+        self._writer = writer
+        self._future = future
+        self._pending: Optional[bytes] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def prime(self) -> bool:
+        """Espera el primer bloque; False si el resultado está vacío."""
+        try:
+            self._pending = self.__next__()
+        except StopIteration:
+            return False
+        return True
+
+    def __next__(self) -> bytes:
+        with self._lock:
+            try:
+                if self._pending is not None:
+                    data, self._pending = self._pending, None
+                    return data
+                return self._receive()
+            finally:
+                if self._closed:
+                    self._close_pipe()
+
+    def _receive(self) -> bytes:
+        while not self._closed:
+            try:
+                if not self._reader.poll(PIPE_POLL_SECONDS):
+                    if self._future.done():
+                        self._finish()
+                    continue
+                data = self._reader.recv_bytes()
+            except EOFError:
+                self._finish()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if not data:
+                self._finish()
+            return data
+        raise StopIteration
+
+    def _finish(self):
+        self._closed = True
+        self._close_pipe()
+        self._future.result()
+        raise StopIteration
+
+    def _close_pipe(self) -> None:
+        self._reader.close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self) -> None:
+        self._closed = True
+        if self._lock.acquire(blocking=False):
+            try:
+                self._close_pipe()
+            finally:
+                self._lock.release()
+
+
+# --- Lado del worker ---------------------------------------------------------
+
+# (raíz, versión) -> snapshot abierto por este worker (solo el último)
+_attached: Dict[Tuple[str, str], DataSnapshot] = {}
+
+
+def _init_worker(preload: Sequence[str], nice: int) -> None:
+    # Ctrl+C llega a todo el grupo de procesos: que lo gestione la API
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if nice and hasattr(os, 'nice'):
+        # con CPUs justas, el proceso de la API pasa por delante de los workers
+        os.nice(nice)
+    for module in preload:
+        importlib.import_module(module)
+
+
+def _worker_snapshot(ref: Tuple[str, str, tuple]) -> DataSnapshot:
+    root, version, stats = ref
+    snapshot = _attached.get((root, version))
+    if snapshot is None:
+        snapshot = attach_shared_snapshot(Path(root), version, stats)
+        if snapshot is None:
+            raise SnapshotUnavailable(version)
+        _attached.clear()
+        _attached[(root, version)] = snapshot
+    return snapshot
+
+
+def _in_worker(ref: Tuple[str, str, tuple], task: Callable, args: tuple):
+    return task(_worker_snapshot(ref), *args)
+
+
+def _attach(snapshot: DataSnapshot) -> None:
+    """Tarea de precalentamiento: solo abre el snapshot."""
+
+
+def _call(snapshot: DataSnapshot, fn: Callable, args: tuple):
+    return fn(snapshot, *args)
+
+
+def _send_chunks(snapshot: DataSnapshot, conn, fn: Callable, args: tuple) -> None:
+    try:
+        for chunk in fn(snapshot, *args):
+            if chunk:
+                conn.send_bytes(chunk)
+        conn.send_bytes(b'')
+    finally:
+        conn.close()
+
+
+# --- Lado de la API ----------------------------------------------------------
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _default_store() -> Path:
+    base = Path('/dev/shm') if Path('/dev/shm').is_dir() else Path(tempfile.gettempdir())
+    # almacenes de procesos que ya no existen (matados sin pasar por `atexit`)
+    for old in base.glob('ewaste-offload-*'):
+        pid = old.name.rsplit('-', 1)[-1]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            shutil.rmtree(old, ignore_errors=True)
+    return base / f'ewaste-offload-{os.getpid()}'
+
+
+class Offloader:
+    """Admisión por clase de trabajo y, con `workers > 0`, ejecución en un pool de procesos."""
+
+    def __init__(self, workers: int, classes: Iterable[WorkClass], store: Optional[Path] = None,
+                 preload: Sequence[str] = (), nice: int = 0):
+        self.workers = max(workers, 0)
+        self.nice = nice
+        self.classes: Dict[str, WorkClass] = {c.name: c for c in classes}
+        self.store = store
+        self.preload = tuple(preload)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        # versión ya volcada en el almacén privado
+        self._stored_version: Optional[str] = None
+        self._cleanup_registered = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def admit(self, work_class: str) -> _Ticket:
+        return self.classes[work_class].admit()
+
+    def run(self, work_class: str, snapshot: DataSnapshot, fn: Callable, *args):
+        """`fn(snapshot, *args)` con una plaza de `work_class`, en el pool si está activo."""
+        with self.admit(work_class):
+            return self._execute(work_class, snapshot, _call, (fn, args))
+
+    def stream(self, work_class: str, snapshot: DataSnapshot, fn: Callable, *args) -> Iterator[bytes]:
+        """Bytes de `fn(snapshot, *args)` (un iterable de bytes) con una plaza de `work_class`.
+
+        La plaza se mantiene mientras se consume el iterador. Sin pool, el
+        trabajo ocurre en el hilo que lo consume; con pool, el worker manda los
+        bloques por un pipe según los produce. El primer bloque se espera aquí,
+        así que un fallo del pool al arrancar sigue siendo un 503 (`Overloaded`).
+        """
+        ticket = self.admit(work_class)
+        try:
+            if not self.enabled:
+                return _HeldStream(fn(snapshot, *args), ticket)
+            return _HeldStream(self._stream_from_pool(work_class, snapshot, fn, args), ticket)
+        except BaseException:
+            ticket.release()
+            raise
+
+    def _stream_from_pool(self, work_class: str, snapshot: DataSnapshot, fn: Callable, args: tuple) -> Iterator[bytes]:
+        ref = self._snapshot_ref(snapshot)
+        reader, writer = multiprocessing.Pipe(duplex=False)
+        chunks = None
+        try:
+            future = self._executor().submit(_in_worker, ref, _send_chunks, (writer, fn, args))
+            chunks = _PipeStream(reader, writer, future)
+            if not chunks.prime():
+                return iter(())
+        except SnapshotUnavailable:
+            logger.warning("Offload worker could not attach snapshot %s; running inline", snapshot.version)
+            return iter(fn(snapshot, *args))
+        except BrokenProcessPool:
+            logger.exception("Offload process pool broke; restarting it")
+            self._reset_pool()
+            raise Overloaded(work_class, 1)
+        finally:
+            if chunks is None:
+                reader.close()
+                writer.close()
+        return chunks
+
+    def _execute(self, work_class: str, snapshot: DataSnapshot, task: Callable, args: tuple):
+        if not self.enabled:
+            return task(snapshot, *args)
+        ref = self._snapshot_ref(snapshot)
+        try:
+            return self._executor().submit(_in_worker, ref, task, args).result()
+        except SnapshotUnavailable:
+            # el almacén ya tiene otra versión (recarga en medio): esta va en el hilo
+            logger.warning("Offload worker could not attach snapshot %s; running inline", snapshot.version)
+            return task(snapshot, *args)
+        except BrokenProcessPool:
+            logger.exception("Offload process pool broke; restarting it")
+            self._reset_pool()
+            raise Overloaded(work_class, 1)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.preload, self.nice),
+                )
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _snapshot_ref(self, snapshot: DataSnapshot) -> Tuple[str, str, tuple]:
+        """(raíz, versión, stats) con los que un worker abre `snapshot` mapeado en memoria.
+
+        Si el snapshot ya está en `DATA_SHARED_DIR` se usa ese y se borra el
+        almacén privado; si no, se vuelca en el privado, que conserva solo la
+        última versión (`write_shared_snapshot` borra las anteriores).
+        """
+        if snapshot.shared_path:
+            self._drop_store()
+            return (str(Path(snapshot.shared_path).parent), snapshot.version, snapshot.source_stats)
+        with self._store_lock:
+            if self._stored_version != snapshot.version:
+                if self.store is None:
+                    self.store = _default_store()
+                if not self._cleanup_registered:
+                    atexit.register(self.shutdown)
+                    self._cleanup_registered = True
+                start = time.perf_counter()
+                write_shared_snapshot(snapshot, self.store)
+                self._stored_version = snapshot.version
+                logger.info("Wrote offload snapshot %s in %.3fs", snapshot.version, time.perf_counter() - start)
+        return (str(self.store), snapshot.version, snapshot.source_stats)
+
+    def _drop_store(self) -> None:
+        """Borra el almacén privado; los workers que lo tengan mapeado conservan sus páginas (POSIX)."""
+        with self._store_lock:
+            if self._stored_version is None:
+                return
+            self._stored_version = None
+            shutil.rmtree(self.store, ignore_errors=True)
+
+    def prepare(self, snapshot: DataSnapshot) -> None:
+        """Listener de snapshots: vuelca el snapshot y hace que cada worker lo abra ya."""
+        if not self.enabled:
+            return
+        ref = self._snapshot_ref(snapshot)
+        pool = self._executor()
+        for _ in range(self.workers):
+            pool.submit(_in_worker, ref, _attach, ())
+
+    def shutdown(self) -> None:
+        self._reset_pool()
+        self._drop_store()
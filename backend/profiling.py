@@ -0,0 +1,273 @@
+"""Perfilado bajo demanda de una petición concreta (desactivado por defecto).
+
+Con `PROFILE_TOKEN` definido, una petición con las cabeceras `X-Profile: 1` y
+`X-Profile-Token: <PROFILE_TOKEN>` se ejecuta bajo `cProfile` (tiempos por
+función) y `tracemalloc` (asignaciones por línea). El informe se guarda en un
+buffer circular (`PROFILE_BUFFER_SIZE`, 20 por defecto), se consulta en
+`/debug/profiles/{id}` (con la misma cabecera de token) y la respuesta lleva
+su id en `X-Profile-Id`.
+
+`cProfile` solo mide el hilo en el que se activa: los endpoints síncronos
+corren en el threadpool, así que `ProfilingRoute` envuelve cada endpoint para
+activar allí un segundo perfilador (el primero cubre el hilo del event loop:
+validación, serialización y middlewares). Ambos se juntan en el informe.
+
+El perfilador del event loop también ve la espera en `select` mientras el
+endpoint corre en el threadpool y, con otras peticiones concurrentes, su
+código asíncrono.
+
+Sin `PROFILE_TOKEN` no se instala nada: ni middleware ni envoltorio.
+Solo se perfila una petición a la vez (`tracemalloc` es global); si otra ya
+está en curso, la petición se atiende sin perfilar y `X-Profile-Id` vale `busy`.
+"""
+import asyncio
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi.routing import APIRoute
+
+PROFILE_HEADER = 'x-profile'
+TOKEN_HEADER = 'x-profile-token'
+ID_HEADER = 'X-Profile-Id'
+
+# funciones por lista del informe y líneas de asignación
+REPORT_TOP = int(os.environ.get('PROFILE_REPORT_TOP', '30'))
+# frames guardados por asignación (más frames = más coste mientras se perfila)
+TRACEMALLOC_FRAMES = 1
+
+
+def profile_token() -> Optional[str]:
+    return os.environ.get('PROFILE_TOKEN') or None
+
+
+def profiling_enabled() -> bool:
+    return profile_token() is not None
+
+
+def token_matches(supplied: Optional[str]) -> bool:
+    token = profile_token()
+    return token is not None and supplied is not None and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+class ProfileStore:
+    """Buffer circular de informes (los más antiguos salen primero)."""
+
+    def __init__(self, maxsize: int = 20):
+        self._reports: deque = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> str:
+        return str(next(self._ids))
+
+    def add(self, report: dict) -> None:
+        with self._lock:
+            self._reports.append(report)
+
+    def summaries(self) -> List[dict]:
+        keys = ('id', 'created_at', 'method', 'path', 'query', 'route', 'status', 'duration_ms')
+        with self._lock:
+            return [{k: r[k] for k in keys} for r in reversed(self._reports)]
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return next((r for r in self._reports if r['id'] == profile_id), None)
+
+
+PROFILES = ProfileStore(int(os.environ.get('PROFILE_BUFFER_SIZE', '20')))
+
+# perfilador del hilo del endpoint para la petición en curso (None: sin perfilar)
+_endpoint_profiler: ContextVar[Optional[list]] = ContextVar('ewaste_endpoint_profiler', default=None)
+# una sola petición perfilada a la vez
+_profile_lock = threading.Lock()
+
+
+def _profiled_endpoint(endpoint):
+    """Envuelve un endpoint síncrono para perfilarlo en el hilo del threadpool donde corre."""
+    if asyncio.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profilers = _endpoint_profiler.get()
+        if profilers is None:
+            return endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profilers.append(profiler)
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    """`APIRoute` cuyo endpoint se puede perfilar en su hilo (ver `_profiled_endpoint`)."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled_endpoint(endpoint), **kwargs)
+
+
+def _function_label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in (p.ej. <method 'sort' of 'list' objects>)
+    for marker in ('site-packages/', 'lib/python'):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    else:
+        filename = os.path.basename(filename)
+    return f'{filename}:{line}({name})'
+
+
+def _function_rows(stats: pstats.Stats, key: int, predicate=None) -> List[dict]:
+    """Top `REPORT_TOP` funciones por `key` (2: tiempo propio, 3: acumulado)."""
+    rows = [
+        (func, values) for func, values in stats.stats.items()
+        if predicate is None or predicate(func)
+    ]
+    rows.sort(key=lambda item: item[1][key], reverse=True)
+    return [
+        {
+            'function': _function_label(func),
+            'calls': total_calls,
+            'primitive_calls': primitive_calls,
+            'self_ms': round(self_time * 1000.0, 3),
+            'cumulative_ms': round(cumulative * 1000.0, 3),
+        }
+        for func, (primitive_calls, total_calls, self_time, cumulative, _) in rows[:REPORT_TOP]
+    ]
+
+
+def _is_pandas(func: tuple) -> bool:
+    return '/pandas/' in func[0].replace('\\', '/')
+
+
+def _allocation_report(snapshot: tracemalloc.Snapshot) -> dict:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    stats = snapshot.statistics('lineno')
+    return {
+        'blocks': sum(s.count for s in stats),
+        'bytes': sum(s.size for s in stats),
+        'top': [
+            {
+                'where': _function_label((s.traceback[0].filename, s.traceback[0].lineno, '')).rstrip('()'),
+                'blocks': s.count,
+                'bytes': s.size,
+            }
+            for s in sorted(stats, key=lambda s: s.count, reverse=True)[:REPORT_TOP]
+        ],
+        'note': 'Bloques vivos al terminar la petición (asignados durante ella y aún sin liberar).',
+    }
+
+
+def build_report(profilers: List[cProfile.Profile], allocations: Optional[tracemalloc.Snapshot]) -> dict:
+    """Informe ordenado: funciones por tiempo acumulado y propio, llamadas a pandas y asignaciones."""
+    stats = pstats.Stats(profilers[0], stream=io.StringIO())
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    pandas_rows = [v for f, v in stats.stats.items() if _is_pandas(f)]
+    report = {
+        'total_calls': stats.total_calls,
+        'top_cumulative': _function_rows(stats, 3),
+        'top_self': _function_rows(stats, 2),
+        'pandas': {
+            'calls': sum(v[1] for v in pandas_rows),
+            'self_ms': round(sum(v[2] for v in pandas_rows) * 1000.0, 3),
+            'top_cumulative': _function_rows(stats, 3, _is_pandas),
+        },
+    }
+    if allocations is not None:
+        report['allocations'] = _allocation_report(allocations)
+    return report
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: perfila las peticiones autenticadas con `X-Profile: 1`."""
+
+    def __init__(self, app, store: ProfileStore = PROFILES):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', ())}
+        if headers.get(PROFILE_HEADER) != '1' or not token_matches(headers.get(TOKEN_HEADER)):
+            await self.app(scope, receive, send)
+            return
+        if not _profile_lock.acquire(blocking=False):
+            await self.app(scope, receive, self._with_header(send, 'busy'))
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _profile_lock.release()
+
+    @staticmethod
+    def _with_header(send, value: str):
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': list(message.get('headers', [])) + [(ID_HEADER.lower().encode(), value.encode())]}
+            await send(message)
+        return send_wrapper
+
+    async def _profile(self, scope, receive, send):
+        profile_id = self.store.next_id()
+        status = [500]
+        inner = self._with_header(send, profile_id)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await inner(message)
+
+        loop_profiler = cProfile.Profile()
+        profilers = [loop_profiler]
+        token = _endpoint_profiler.set(profilers)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        allocations = None
+        start = time.perf_counter()
+        loop_profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            loop_profiler.disable()
+            elapsed = time.perf_counter() - start
+            _endpoint_profiler.reset(token)
+            if started_tracing:
+                allocations = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+            route = scope.get('route')
+            report = {
+                'id': profile_id,
+                'created_at': time.time(),
+                'method': scope.get('method'),
+                'path': scope.get('path'),
+                'query': scope.get('query_string', b'').decode('latin-1'),
+                'route': getattr(route, 'path', None),
+                'status': status[0],
+                'duration_ms': round(elapsed * 1000.0, 3),
+            }
+            report.update(build_report(profilers, allocations))
+            self.store.add(report)
@@ -0,0 +1,160 @@
+"""Caché LRU de respuestas ya serializadas (bytes) con ETag fuerte.
+
+La clave es (endpoint, parámetros normalizados, versión del dataset): cuando
+cambian los archivos de `data/` cambia la versión y las entradas antiguas
+dejan de usarse (y terminan saliendo por LRU). Cada entrada guarda también
+sus variantes comprimidas (gzip, brotli) a medida que se piden.
+
+Además del número de entradas, la LRU acota los bytes guardados (cuerpo más
+variantes): una página grande de `/data/table` en tres codificaciones pesa
+lo que muchas respuestas pequeñas. Un cuerpo mayor que `max_entry_bytes` se
+sirve sin guardarlo.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from compression import COMPRESS_MIN_BYTES, compress
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str = 'application/json'
+    # codificación -> (bytes comprimidos, ETag), o (None, None) si comprimir no reduce el tamaño
+    variants: Dict[str, Tuple[Optional[bytes], Optional[str]]] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes del cuerpo más los de sus variantes comprimidas."""
+        return len(self.body) + sum(len(data) for data, _ in list(self.variants.values()) if data is not None)
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) >= COMPRESS_MIN_BYTES
+
+    def encoded(self, encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+        """(cuerpo, ETag, Content-Encoding) para `encoding`; la variante se comprime la primera vez.
+
+        Sin `encoding`, por debajo de `COMPRESS_MIN_BYTES` o si comprimir no
+        reduce el tamaño, devuelve los bytes sin comprimir.
+        """
+        if encoding is None or not self.compressible:
+            return self.body, self.etag, None
+        variant = self.variants.get(encoding)
+        if variant is None:
+            data = compress(self.body, encoding)
+            variant = (data, variant_etag(self.etag, encoding)) if len(data) < len(self.body) else (None, None)
+            # dos hilos pueden comprimir a la vez: se queda la primera
+            variant = self.variants.setdefault(encoding, variant)
+        data, etag = variant
+        if data is None:
+            return self.body, self.etag, None
+        return data, etag, encoding
+
+
+def make_etag(body: bytes) -> str:
+    """ETag fuerte derivado del contenido exacto de la respuesta."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """ETag de la variante comprimida: `"abc"` -> `"abc-gzip"` (otra representación, otro ETag)."""
+    return etag[:-1] + f'-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evalúa la cabecera `If-None-Match` (lista separada por comas o `*`)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        # comparación débil (RFC 9110 §13.1.2): se ignora el prefijo W/
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def make_key(endpoint: str, params: Mapping[str, object], version: str) -> Tuple[Hashable, ...]:
+    """Clave de caché con los parámetros ordenados y sin los que valen None."""
+    items = tuple(sorted((k, v) for k, v in params.items() if v is not None))
+    return (endpoint, items, version)
+
+
+class ResponseCache:
+    """LRU segura entre hilos de `CachedResponse`, acotada en entradas y en bytes (0 = sin límite de bytes)."""
+
+    def __init__(self, maxsize: int = 256, max_bytes: int = 0, max_entry_bytes: int = 0):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: 'OrderedDict[Hashable, CachedResponse]' = OrderedDict()
+        # bytes contados por entrada (crecen al añadir variantes, ver `encoded`)
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: CachedResponse) -> CachedResponse:
+        if self.maxsize <= 0 or self.max_entry_bytes and len(entry.body) > self.max_entry_bytes:
+            return entry
+        with self._lock:
+            self.nbytes -= self._sizes.pop(key, 0)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._sizes[key] = entry.nbytes
+            self.nbytes += self._sizes[key]
+            self._evict()
+        return entry
+
+    def encoded(self, key: Hashable, entry: CachedResponse, encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+        """`entry.encoded(encoding)`, contando en el presupuesto la variante nueva si `entry` sigue en la caché."""
+        result = entry.encoded(encoding)
+        if result[2] is not None:
+            with self._lock:
+                if self._entries.get(key) is entry and self._sizes[key] != entry.nbytes:
+                    self.nbytes += entry.nbytes - self._sizes[key]
+                    self._sizes[key] = entry.nbytes
+                    self._evict()
+        return result
+
+    def _evict(self) -> None:
+        """Saca entradas por LRU hasta cumplir `maxsize` y `max_bytes` (con el lock tomado)."""
+        while self._entries and (len(self._entries) > self.maxsize or self.max_bytes and self.nbytes > self.max_bytes):
+            key, _ = self._entries.popitem(last=False)
+            self.nbytes -= self._sizes.pop(key)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> CachedResponse:
+        """Devuelve la entrada cacheada o la construye con `build()` (fuera del lock)."""
+        entry = self.get(key)
+        if entry is None:
+            body = build()
+            entry = self.put(key, CachedResponse(body=body, etag=make_etag(body)))
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
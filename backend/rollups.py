@@ -0,0 +1,167 @@
+"""Agregados precalculados por grupo de países (regiones y total) y año.
+
+Se calculan una vez por snapshot sobre la tabla macro (country, year) y se
+guardan como un array `grupos x métricas x años`; `/ewaste/aggregate` solo
+indexa en él, así que el coste de una respuesta depende de su tamaño y no del
+del dataset.
+
+Cada métrica se agrega de una de dos formas (`ROLLUP_METRICS`):
+- suma (peso `None`): totales en kt, población, valor recuperable;
+- media ponderada por otra columna: per cápita por población (equivale a
+  total / población de los países con dato), tasa de recolección por kt generados.
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import value_recoverable_usd_array
+
+# grupo que contiene todos los países del dataset (no se puede redefinir)
+ALL_GROUP = 'all'
+
+# grupo -> países (nombre o ISO3, como en el resto de endpoints)
+REGION_GROUPS = {
+    'andean': ('BOL', 'COL', 'ECU', 'PER'),  # Comunidad Andina
+    'central_america': ('BLZ', 'CRI', 'SLV', 'GTM', 'HND', 'NIC', 'PAN'),
+    'southern_cone': ('ARG', 'CHL', 'PRY', 'URY'),
+}
+
+# métrica -> columna de ponderación (None: suma)
+ROLLUP_METRICS = {
+    'population': None,
+    'e_waste_generated_kt': None,
+    'eee_put_on_market_kt': None,
+    'e_waste_formally_collected_kt': None,
+    'e_waste_exported_kt': None,
+    'e_waste_imported_kt': None,
+    'value_recoverable_usd': None,
+    'e_waste_generated_per_capita': 'population',
+    'eee_placed_on_market_kg_inh': 'population',
+    'ewaste_formally_collected_kg_inh': 'population',
+    'gdp_per_capita': 'population',
+    'average_household_size': 'population',
+    'e_waste_collection_rate': 'e_waste_generated_kt',
+}
+
+
+def region_groups() -> Dict[str, Tuple[str, ...]]:
+    """Grupos de `REGION_GROUPS`, más/reemplazados por los de `REGION_GROUPS_FILE` (JSON grupo -> países)."""
+    groups = dict(REGION_GROUPS)
+    path = os.environ.get('REGION_GROUPS_FILE')
+    if path:
+        with open(path, encoding='utf-8') as fh:
+            extra = json.load(fh)
+        groups.update({str(name): tuple(members) for name, members in extra.items()})
+    groups.pop(ALL_GROUP, None)
+    return groups
+
+
+@dataclass(frozen=True)
+class Rollups:
+    """Agregados por (grupo, métrica, año); NaN donde ningún país del grupo tiene dato."""
+
+    groups: Tuple[str, ...]
+    metrics: Tuple[str, ...]
+    years: np.ndarray            # años ordenados (int)
+    values: np.ndarray           # (grupos, métricas, años) float64
+    reporting: np.ndarray        # (grupos, métricas, años) países que aportan al valor
+    members: Mapping[str, Tuple[str, ...]]   # países del dataset en cada grupo
+    missing: Mapping[str, Tuple[str, ...]]   # miembros configurados sin datos
+
+    def __post_init__(self):
+        object.__setattr__(self, '_group_pos', {g: i for i, g in enumerate(self.groups)})
+        object.__setattr__(self, '_metric_pos', {m: i for i, m in enumerate(self.metrics)})
+        object.__setattr__(self, '_year_pos', {int(y): i for i, y in enumerate(self.years)})
+
+    def group_positions(self, groups: Iterable[str]) -> List[int]:
+        return [self._group_pos[g] for g in groups]
+
+    def metric_positions(self, metrics: Iterable[str]) -> List[int]:
+        return [self._metric_pos[m] for m in metrics]
+
+    def year_positions(self, year: Optional[int]) -> np.ndarray:
+        """Todas las posiciones de año, la de `year`, o ninguna si no hay datos de ese año."""
+        if year is None:
+            return np.arange(len(self.years))
+        pos = self._year_pos.get(int(year))
+        return np.array([], dtype=np.intp) if pos is None else np.array([pos])
+
+
+def build_rollups(df: pd.DataFrame, index, groups: Mapping[str, Iterable[str]]) -> Rollups:
+    """Agrega `df` (una fila por country/year) para cada grupo de `groups` y para `ALL_GROUP`.
+
+    `index` es el `CountryIndex` de `df`: resuelve los miembros por nombre o ISO3.
+    Sin tabla (country, year) los agregados quedan vacíos (ningún año).
+    """
+    if 'country' not in df.columns or 'year' not in df.columns:
+        df = pd.DataFrame({'country': pd.Series(dtype=object), 'year': pd.Series(dtype='float64')})
+    years = pd.to_numeric(df['year'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    has_year = ~np.isnan(years)
+    year_values, year_codes = np.unique(years[has_year], return_inverse=True)
+    n_years = len(year_values)
+
+    names = [ALL_GROUP] + list(groups)
+    masks = [has_year.copy()]
+    members = {ALL_GROUP: tuple(pd.unique(df['country'].dropna().astype(str)))}
+    missing = {ALL_GROUP: ()}
+    countries = df['country'].to_numpy(dtype=object)
+    for name in groups:
+        mask = np.zeros(len(df), dtype=bool)
+        absent = []
+        for country in groups[name]:
+            pos = index.lookup(country)
+            if len(pos):
+                mask[pos] = True
+            else:
+                absent.append(country)
+        masks.append(mask & has_year)
+        members[name] = tuple(pd.unique(countries[mask].astype(str)))
+        missing[name] = tuple(absent)
+
+    def column(name: str) -> np.ndarray:
+        if name == 'value_recoverable_usd':
+            return value_recoverable_usd_array(column('e_waste_generated_kt'))
+        return df[name].to_numpy(dtype='float64', na_value=np.nan)
+
+    metrics = tuple(
+        m for m, w in ROLLUP_METRICS.items()
+        if (m in df.columns or m == 'value_recoverable_usd' and 'e_waste_generated_kt' in df.columns)
+        and (w is None or w in df.columns)
+    )
+    values = np.full((len(names), len(metrics), n_years), np.nan)
+    reporting = np.zeros((len(names), len(metrics), n_years), dtype=np.int32)
+    for j, metric in enumerate(metrics):
+        v = column(metric)
+        weight_col = ROLLUP_METRICS[metric]
+        if weight_col is None:
+            valid = ~np.isnan(v)
+            weights = np.ones_like(v)
+        else:
+            weights = column(weight_col)
+            valid = ~np.isnan(v) & (weights > 0)
+        for g, mask in enumerate(masks):
+            sel = mask & valid
+            codes = year_codes[sel[has_year]]
+            count = np.bincount(codes, minlength=n_years)
+            if weight_col is None:
+                total = np.bincount(codes, weights=v[sel], minlength=n_years)
+            else:
+                den = np.bincount(codes, weights=weights[sel], minlength=n_years)
+                total = np.bincount(codes, weights=v[sel] * weights[sel], minlength=n_years) / np.where(den > 0, den, 1.0)
+            values[g, j] = np.where(count > 0, total, np.nan)
+            reporting[g, j] = count
+    values.setflags(write=False)
+    reporting.setflags(write=False)
+    return Rollups(
+        groups=tuple(names),
+        metrics=metrics,
+        years=year_values.astype(np.int64),
+        values=values,
+        reporting=reporting,
+        members=members,
+        missing=missing,
+    )
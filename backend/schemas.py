@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from pydantic import BaseModel
 
 class ColectionRate(BaseModel):
@@ -87,3 +87,144 @@ class ScenarioResult(BaseModel):
     delta_absolute_kt: Optional[float]
     base_value_recoverable_usd: Optional[float]
     new_value_recoverable_usd: Optional[float]
+
+
+class BatchSeries(BaseModel):
+    """Series de varios países y métricas en formato columnar (una lista por columna)."""
+    countries: List[str]
+    missing: List[str]
+    metrics: List[str]
+    rows: int
+    columns: Dict[str, List[Optional[Union[int, float, str]]]]
+
+
+class ScenarioSweep(BaseModel):
+    """Escenarios de recolección formal para filas (country, year) × deltas.
+
+    Las listas por fila van alineadas con `country`/`year`; las matrices son
+    `[fila][delta]`, alineadas con `deltas`.
+    """
+    deltas: List[float]
+    recovery_fraction: float
+    price_per_tonne_recovered_usd: float
+    missing: List[str]
+    rows: int
+    country: List[str]
+    year: List[Optional[int]]
+    generated_kt: List[float]
+    base_formally_collected_kt: List[float]
+    base_value_recoverable_usd: List[float]
+    new_formally_collected_kt: List[List[float]]
+    delta_absolute_kt: List[List[float]]
+    new_value_recoverable_usd: List[List[float]]
+
+
+class ValueSimulation(BaseModel):
+    """Bandas Monte Carlo del valor recuperable por fila (country, year), en formato columnar."""
+    basis: str
+    delta_percent: Optional[float]
+    recovery_fraction: str
+    price_per_tonne_recovered_usd: str
+    draws: int
+    seed: int
+    kt_cv: float
+    clipped: int
+    missing: List[str]
+    rows: int
+    country: List[str]
+    year: List[Optional[int]]
+    kt: List[Optional[float]]
+    value_recoverable_usd: List[Optional[float]]
+    mean: List[Optional[float]]
+    bands: Dict[str, List[Optional[float]]]
+
+
+class Aggregate(BaseModel):
+    """Agregados por grupo de países y año en formato columnar (filas grupo-mayor).
+
+    `weights` indica por métrica la columna de ponderación (None: suma) y
+    `reporting` cuántos países del grupo aportan a cada valor.
+    """
+    groups: List[str]
+    metrics: List[str]
+    weights: Dict[str, Optional[str]]
+    members: Dict[str, List[str]]
+    missing: Dict[str, List[str]]
+    rows: int
+    columns: Dict[str, List[Optional[Union[int, float, str]]]]
+    reporting: Dict[str, List[int]]
+
+
+class CategoryPairRows(BaseModel):
+    """Pares de categorías por (country, year) en formato columnar: `category_x`/`category_y`, `share_*`, `value_*`."""
+    categories: List[str]
+    missing: List[str]
+    rows: int
+    columns: Dict[str, List[Optional[Union[int, float, str]]]]
+
+
+class CategoryCorrelation(BaseModel):
+    """Correlaciones entre shares de categorías; `matrix[i][j]` va alineada con `categories`."""
+    year: Optional[int]
+    side: str
+    categories: List[str]
+    matrix: List[List[Optional[float]]]
+    counts: List[List[int]]
+
+
+class Forecast(BaseModel):
+    """Histórico y proyección de un país en formato columnar.
+
+    `forecast` trae por métrica la proyección y sus límites (`<métrica>_lower`,
+    `<métrica>_upper`); `fit` la pendiente (por año, en log si el modelo es
+    `loglinear`), el R² y los años usados.
+    """
+    country: str
+    model: str
+    interval: str
+    level: float
+    metrics: List[str]
+    history: Dict[str, List[Optional[Union[int, float]]]]
+    forecast: Dict[str, List[Optional[Union[int, float]]]]
+    fit: Dict[str, Dict[str, Optional[Union[int, float]]]]
+
+
+class ForecastBulk(BaseModel):
+    """Proyección de una métrica para todos los países: matrices `[país][año]` alineadas con `countries`/`years`."""
+    metric: str
+    model: str
+    interval: str
+    level: float
+    years: List[int]
+    countries: List[str]
+    value: List[List[Optional[float]]]
+    lower: List[List[Optional[float]]]
+    upper: List[List[Optional[float]]]
+    slope: List[Optional[float]]
+    r2: List[Optional[float]]
+    n: List[int]
+
+
+class CountryEntry(BaseModel):
+    """País del dataset con los nombres por los que se puede buscar."""
+    country: str
+    iso3: Optional[str] = None
+    names: List[str]
+
+
+class CountryList(BaseModel):
+    countries: List[CountryEntry]
+
+
+class CountryMatch(BaseModel):
+    """Sugerencia de autocompletado: `match` es el nombre que coincidió y `kind` el tipo de coincidencia."""
+    country: str
+    iso3: Optional[str] = None
+    match: str
+    kind: str
+    score: float
+
+
+class CountrySearch(BaseModel):
+    query: str
+    results: List[CountryMatch]
@@ -0,0 +1,27 @@
+"""Genera el formato columnar binario (.npy + manifest) de los datasets de `data/`.
+
+Uso (desde `backend/`):
+    python scripts/build_columnar.py [dataset ...]
+
+Sin argumentos procesa los cinco datasets. El resultado queda en
+`data/columnar/` (o en `DATA_COLUMNAR_DIR`) y los `load_*` de `data_loader`
+lo usan automáticamente mientras el JSON de origen no cambie.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_loader import DATASET_NAMES, build_columnar  # noqa: E402
+
+
+def main(argv):
+    unknown = [n for n in argv if n not in DATASET_NAMES]
+    if unknown:
+        raise SystemExit(f"Datasets desconocidos: {', '.join(unknown)} (válidos: {', '.join(DATASET_NAMES)})")
+    for name, manifest in build_columnar(argv or None).items():
+        print(f"{name}: {manifest}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
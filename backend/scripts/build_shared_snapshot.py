@@ -0,0 +1,27 @@
+"""Materializa el snapshot compartido en `DATA_SHARED_DIR` antes de arrancar los workers.
+
+Uso (desde `backend/`):
+    DATA_SHARED_DIR=/dev/shm/coafina-ewaste python scripts/build_shared_snapshot.py
+    DATA_SHARED_DIR=/dev/shm/coafina-ewaste uvicorn main:app --workers 4
+
+No es obligatorio: sin este paso el primer worker lo construye y los demás
+esperan al lock y lo abren. Usar los mismos `DATA_COMPACT` /
+`DATA_FLOAT_PRECISION` que los workers (forman parte de la clave).
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_loader import build_snapshot, shared_root  # noqa: E402
+
+
+def main():
+    if shared_root() is None:
+        raise SystemExit("Definir DATA_SHARED_DIR (p.ej. /dev/shm/coafina-ewaste)")
+    snapshot = build_snapshot()
+    print(f"{snapshot.version}: {snapshot.shared_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Genera una copia sintética y más grande de los datasets de `data/` (mismo esquema).
+
+Cada dataset se replica `--factor` veces con países sintéticos: la réplica i
+de "Peru" se llama "Peru #i", con `country_clean` "peru i" y un ISO3 inventado
+(sin chocar con los reales). `--year-factor` añade bloques de años anteriores
+(2013-2017, 2008-2012...) copiando los existentes. Las cantidades (`*_kt`,
+`kt`, `population`) se multiplican por un factor por país y réplica, igual en
+todos los archivos, así que los cocientes (per cápita, tasas, shares) siguen
+siendo coherentes entre tablas.
+
+Uso (desde `backend/`):
+    python scripts/scale_dataset.py --factor 10 --out /tmp/ewaste-x10
+    DATA_DIR=/tmp/ewaste-x10 python benchmarks/bench_endpoints.py
+
+Con `--factor 18 --year-factor 4` el tamaño se parece al de datos globales
+(~200 países x 20 años).
+"""
+import argparse
+import itertools
+import json
+import random
+import string
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from country_search import SPANISH_COUNTRY_NAMES  # noqa: E402
+from data_loader import DATASET_NAMES, get_data_dir, normalize_country_key  # noqa: E402
+
+
+def _is_quantity(column: str) -> bool:
+    """Columnas extensivas (se escalan con el tamaño del país)."""
+    return column in ('kt', 'population') or column.endswith('_kt') or column.startswith('e_waste_generated_kt_')
+
+
+def _scaled(value, factor: float):
+    if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if isinstance(value, int):
+        return int(round(value * factor))
+    return round(value * factor, 3)
+
+
+class _Replicas:
+    """Nombres, ISO3 y factores sintéticos por (réplica, país), compartidos entre datasets."""
+
+    def __init__(self, rows_by_dataset, seed: int):
+        self.seed = seed
+        real = {
+            str(r['iso3']).upper() for rows in rows_by_dataset.values() for r in rows if r.get('iso3')
+        } | set(SPANISH_COUNTRY_NAMES)
+        self._free_codes = (
+            ''.join(c) for c in itertools.product(string.ascii_uppercase, repeat=3) if ''.join(c) not in real
+        )
+        self._codes = {}
+        self._factors = {}
+
+    def country(self, name, i: int):
+        if i == 0 or not isinstance(name, str):
+            return name
+        return f'{name} #{i}'
+
+    def clean(self, name, i: int):
+        if i == 0 or not isinstance(name, str):
+            return name
+        return f'{name} {i}'
+
+    def iso3(self, code, i: int):
+        if i == 0 or not isinstance(code, str):
+            return code
+        key = (i, code.upper())
+        if key not in self._codes:
+            self._codes[key] = next(self._free_codes)
+        return self._codes[key]
+
+    def factor(self, country, i: int) -> float:
+        if i == 0:
+            return 1.0
+        key = (i, country)
+        if key not in self._factors:
+            rng = random.Random(f'{self.seed}:{i}:{normalize_country_key(country)}')
+            self._factors[key] = rng.uniform(0.5, 2.0)
+        return self._factors[key]
+
+
+def scale_rows(rows, replicas: _Replicas, factor: int, year_factor: int, span: int):
+    """Filas de un dataset replicadas por país (`factor`) y por bloques de años (`year_factor`)."""
+    out = []
+    for i in range(factor):
+        for block in range(year_factor):
+            for row in rows:
+                country = row.get('country')
+                f = replicas.factor(country, i)
+                new = {}
+                for column, value in row.items():
+                    if column == 'country':
+                        value = replicas.country(value, i)
+                    elif column == 'country_clean':
+                        value = replicas.clean(value, i)
+                    elif column == 'iso3':
+                        value = replicas.iso3(value, i)
+                    elif column == 'year' and isinstance(value, (int, float)) and block:
+                        value = value - block * span
+                    elif _is_quantity(column):
+                        value = _scaled(value, f)
+                    new[column] = value
+                out.append(new)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--factor', type=int, default=10, help='réplicas de cada país (1 = sin cambios)')
+    parser.add_argument('--year-factor', type=int, default=1, help='bloques de años (1 = solo los originales)')
+    parser.add_argument('--out', type=Path, required=True, help='carpeta de salida (se usa como DATA_DIR)')
+    parser.add_argument('--source', type=Path, default=None, help='carpeta de origen (por defecto, data/)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.factor < 1 or args.year_factor < 1:
+        raise SystemExit('--factor y --year-factor deben ser >= 1')
+
+    source = args.source or get_data_dir()
+    if args.out.resolve() == source.resolve():
+        raise SystemExit('--out no puede ser la carpeta de origen')
+    rows_by_dataset = {}
+    for name in DATASET_NAMES:
+        path = source / f'{name}.json'
+        if path.exists():
+            with open(path, encoding='utf-8') as fh:
+                rows_by_dataset[name] = json.load(fh)
+    years = [r['year'] for rows in rows_by_dataset.values() for r in rows if isinstance(r.get('year'), (int, float))]
+    span = int(max(years) - min(years) + 1) if years else 0
+    replicas = _Replicas(rows_by_dataset, args.seed)
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for name, rows in rows_by_dataset.items():
+        scaled = scale_rows(rows, replicas, args.factor, args.year_factor, span)
+        with open(args.out / f'{name}.json', 'w', encoding='utf-8') as fh:
+            json.dump(scaled, fh, ensure_ascii=False)
+        print(f'{name}: {len(rows)} -> {len(scaled)} filas')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Serialización columnar: DataFrame filtrado + especificación de campos -> registros JSON.
+
+Sustituye los bucles `iterrows()` + `_safe_float`/`_clean_value` por celda:
+cada columna se convierte de una vez con operaciones de arrays
+(NaN/pd.NA -> None, escalares numpy -> tipos nativos, coerción a int).
+"""
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+
+# (nombre de salida, columna de origen, tipo) con tipo en FIELD_KINDS;
+# `(nombre, tipo)` es atajo para cuando la columna se llama igual que el campo.
+Field = Union[Tuple[str, str], Tuple[str, str, str]]
+
+FIELD_KINDS = ('float', 'int', 'str', 'auto')
+
+
+def float_array(values: pd.Series) -> np.ndarray:
+    """float64 con NaN para faltantes; float32 pasa por su decimal más corto (10.3, no 10.300000190734863)."""
+    if values.dtype == np.float32:
+        return values.to_numpy().astype(str).astype('float64')
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def float_objects(arr: np.ndarray) -> np.ndarray:
+    """Array float64 -> objetos JSON-serializables (NaN -> None)."""
+    out = arr.astype(object)
+    out[np.isnan(arr)] = None
+    return out
+
+
+def _float_values(values: pd.Series) -> np.ndarray:
+    return float_objects(float_array(values))
+
+
+def _int_values(values: pd.Series) -> np.ndarray:
+    arr = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(arr)
+    out = np.where(missing, 0, arr).astype(np.int64).astype(object)
+    out[missing] = None
+    return out
+
+
+def _str_values(values: pd.Series) -> np.ndarray:
+    out = values.to_numpy(dtype=object)
+    out[pd.isna(out)] = None
+    return out
+
+
+def _auto_values(values: pd.Series) -> np.ndarray:
+    """Convierte según el dtype de la columna (para columnas sin tipo declarado)."""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return _str_values(values)
+    if pd.api.types.is_integer_dtype(dtype):
+        return _int_values(values)
+    if pd.api.types.is_float_dtype(dtype):
+        return _float_values(values)
+    return _str_values(values)
+
+
+_CONVERTERS = {
+    'float': _float_values,
+    'int': _int_values,
+    'str': _str_values,
+    'auto': _auto_values,
+}
+
+
+def _normalize_field(field: Field) -> Tuple[str, str, str]:
+    if len(field) == 2:
+        name, kind = field
+        return name, name, kind
+    return field
+
+
+def column_values(df: pd.DataFrame, column: str, kind: str = 'auto') -> np.ndarray:
+    """Valores JSON-serializables de una columna; columna ausente -> todo None."""
+    if column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    return _CONVERTERS[kind](df[column])
+
+
+def records_from_frame(df: pd.DataFrame, fields: Sequence[Field]) -> List[Dict]:
+    """Construye la lista de registros de `df` según `fields` en bloque."""
+    specs = [_normalize_field(f) for f in fields]
+    if df.empty:
+        return []
+    with span('transform'):
+        names = [name for name, _, _ in specs]
+        columns = [column_values(df, column, kind).tolist() for _, column, kind in specs]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def frame_records(df: pd.DataFrame) -> List[Dict]:
+    """Todas las columnas de `df` con conversión según dtype (p.ej. para `/data/table`)."""
+    return records_from_frame(df, [(str(c), c, 'auto') for c in df.columns])
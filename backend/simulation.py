@@ -0,0 +1,238 @@
+"""Simulación Monte Carlo del valor recuperable con parámetros inciertos.
+
+`value_recoverable_usd = kt * 1000 * recovery_fraction * price_per_tonne`
+(ver `utils.py`). Aquí `recovery_fraction` y `price_per_tonne` se muestrean de
+distribuciones configurables y, opcionalmente, cada kt lleva un ruido
+multiplicativo (`kt_cv`, coeficiente de variación).
+
+Las muestras se generan por bloques y se acumulan en un histograma de
+`z = recovery_fraction * price * (1 + ruido)`, así que la memoria no depende
+del número de draws. Como el valor es `kt * 1000 * z` con `kt >= 0`, los
+percentiles por fila salen de escalar los percentiles de `z`; sin ruido por
+fila basta con un histograma común para todas las filas. Con ruido, las filas
+se procesan también por bloques (como mucho `HISTOGRAM_MAX_CELLS` filas x
+bins a la vez), así que la memoria tampoco depende del número de filas.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utils import PRICE_DISTRIBUTION, RECOVERY_FRACTION_DISTRIBUTION
+
+# kind -> número de parámetros
+DISTRIBUTION_KINDS = {
+    'fixed': 1,       # valor
+    'uniform': 2,     # low, high
+    'triangular': 3,  # low, mode, high
+    'normal': 2,      # media, desviación (truncada en 0)
+}
+DEFAULT_PERCENTILES = (5.0, 50.0, 95.0)
+HISTOGRAM_BINS = 8192
+# filas x bins por bloque de filas con ruido: acota los conteos, el bincount y el cumsum
+HISTOGRAM_MAX_CELLS = 1 << 21
+# ancho de la normal considerado al fijar el rango del histograma
+_NORMAL_SPAN = 8.0
+
+
+@dataclass(frozen=True)
+class Distribution:
+    kind: str
+    params: Tuple[float, ...]
+
+    @classmethod
+    def parse(cls, text: str) -> 'Distribution':
+        """`'triangular:0.01,0.02,0.03'`, `'normal:2000,400'`, `'0.02'` (fijo)..."""
+        kind, _, args = text.partition(':')
+        if not args:
+            kind, args = 'fixed', kind
+        kind = kind.strip().lower()
+        if kind not in DISTRIBUTION_KINDS:
+            raise ValueError(f"unknown distribution '{kind}' (use {', '.join(DISTRIBUTION_KINDS)})")
+        try:
+            params = tuple(float(a) for a in args.split(','))
+        except ValueError:
+            raise ValueError(f"invalid parameters for '{kind}': {args}")
+        dist = cls(kind, params)
+        dist.validate()
+        return dist
+
+    def validate(self) -> None:
+        if len(self.params) != DISTRIBUTION_KINDS[self.kind]:
+            raise ValueError(f"'{self.kind}' takes {DISTRIBUTION_KINDS[self.kind]} parameters")
+        if not all(np.isfinite(self.params)):
+            raise ValueError("parameters must be finite")
+        if self.kind in ('fixed', 'uniform', 'triangular') and min(self.params) < 0:
+            raise ValueError("parameters must be >= 0")
+        if self.kind == 'uniform' and self.params[0] > self.params[1]:
+            raise ValueError("uniform needs low <= high")
+        if self.kind == 'triangular' and not self.params[0] <= self.params[1] <= self.params[2]:
+            raise ValueError("triangular needs low <= mode <= high")
+        if self.kind == 'normal' and self.params[1] < 0:
+            raise ValueError("normal needs sd >= 0")
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(repr(p) for p in self.params)}"
+
+    def bounds(self) -> Tuple[float, float]:
+        p = self.params
+        if self.kind == 'fixed':
+            return p[0], p[0]
+        if self.kind == 'uniform':
+            return p[0], p[1]
+        if self.kind == 'triangular':
+            return p[0], p[2]
+        return max(0.0, p[0] - _NORMAL_SPAN * p[1]), max(0.0, p[0] + _NORMAL_SPAN * p[1])
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        p = self.params
+        if self.kind == 'fixed':
+            return np.full(size, p[0])
+        if self.kind == 'uniform':
+            return rng.uniform(p[0], p[1], size)
+        if self.kind == 'triangular':
+            if p[0] == p[2]:
+                return np.full(size, p[0])
+            return rng.triangular(p[0], p[1], p[2], size)
+        return np.maximum(rng.normal(p[0], p[1], size), 0.0)
+
+
+@dataclass(frozen=True)
+class SimulationSpec:
+    """Parámetros de una simulación; hashable para usarla como clave de caché."""
+
+    recovery: Distribution
+    price: Distribution
+    draws: int = 10000
+    seed: int = 0
+    kt_cv: float = 0.0
+    percentiles: Tuple[float, ...] = DEFAULT_PERCENTILES
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """Percentiles (filas x percentiles) y media por fila del valor recuperable en USD."""
+
+    percentiles: np.ndarray
+    mean: np.ndarray
+    draws: int
+    clipped: int  # muestras fuera del rango del histograma (contadas en el bin extremo)
+
+
+def _z_bounds(spec: SimulationSpec) -> Tuple[float, float]:
+    r_lo, r_hi = spec.recovery.bounds()
+    p_lo, p_hi = spec.price.bounds()
+    noise_hi = 1.0 + _NORMAL_SPAN * spec.kt_cv
+    noise_lo = max(0.0, 1.0 - _NORMAL_SPAN * spec.kt_cv)
+    return r_lo * p_lo * noise_lo, r_hi * p_hi * noise_hi
+
+
+def _histogram_percentiles(counts: np.ndarray, lo: float, hi: float, percentiles: Tuple[float, ...]) -> np.ndarray:
+    """Percentiles por fila de `counts` (filas x bins), interpolando dentro del bin."""
+    bins = counts.shape[1]
+    width = (hi - lo) / bins
+    cum = np.cumsum(counts, axis=1)
+    total = cum[:, -1:].astype('float64')
+    out = np.empty((counts.shape[0], len(percentiles)))
+    rows = np.arange(counts.shape[0])
+    for j, q in enumerate(percentiles):
+        target = total[:, 0] * q / 100.0
+        k = np.minimum((cum < target[:, None]).sum(axis=1), bins - 1)
+        before = np.where(k > 0, cum[rows, np.maximum(k - 1, 0)], 0)
+        in_bin = counts[rows, k]
+        frac = np.where(in_bin > 0, (target - before) / np.maximum(in_bin, 1), 0.0)
+        out[:, j] = lo + (k + np.clip(frac, 0.0, 1.0)) * width
+    return out
+
+
+def _simulate_block(rows: int, spec: SimulationSpec, rngs, lo: float, hi: float, bins: int,
+                    chunk_cells: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Percentiles de `z` (filas x percentiles), suma de `z` por fila y muestras recortadas de un bloque de filas.
+
+    `rows` es 1 sin ruido por fila (histograma común). `rngs` son los
+    generadores de `recovery`, `price` y ruido (None sin ruido).
+    """
+    recovery_rng, price_rng, noise_rng = rngs
+    counts = np.zeros(rows * bins, dtype=np.int64)
+    sums = np.zeros(rows)
+    clipped = 0
+    chunk = max(1, chunk_cells // rows)
+    offsets = (np.arange(rows) * bins)[:, None]
+    done = 0
+    while done < spec.draws:
+        n = min(chunk, spec.draws - done)
+        z = spec.recovery.sample(recovery_rng, n) * spec.price.sample(price_rng, n)
+        if noise_rng is not None:
+            # (draws, filas) en orden C: la secuencia no depende del bloque de draws
+            noise = np.maximum(1.0 + noise_rng.normal(0.0, spec.kt_cv, (n, rows)), 0.0)
+            z = (z[:, None] * noise).T
+        else:
+            z = z[None, :]
+        sums += z.sum(axis=1)
+        idx = np.floor((z - lo) / max(hi - lo, np.finfo(float).tiny) * bins).astype(np.int64)
+        del z
+        clipped += int(np.count_nonzero((idx < 0) | (idx >= bins)))
+        np.clip(idx, 0, bins - 1, out=idx)
+        counts += np.bincount((idx + offsets).ravel(), minlength=rows * bins)
+        done += n
+    if hi > lo:
+        return _histogram_percentiles(counts.reshape(rows, bins), lo, hi, spec.percentiles), sums, clipped
+    # parámetros fijos: todas las muestras valen lo mismo
+    return np.full((rows, len(spec.percentiles)), lo), sums, clipped
+
+
+def simulate_values(kt: np.ndarray, spec: SimulationSpec, chunk_cells: int = 2_000_000,
+                    bins: int = HISTOGRAM_BINS, max_cells: int = HISTOGRAM_MAX_CELLS) -> SimulationResult:
+    """Simula el valor recuperable de cada fila de `kt` (NaN -> NaN) con `spec.draws` muestras.
+
+    Cada bloque genera como mucho `chunk_cells` muestras (filas x draws con
+    ruido por fila, draws sin él); con ruido, cada bloque de filas tiene como
+    mucho `max_cells // bins` filas. Las corrientes de `recovery` y `price`
+    salen de generadores hijos de `spec.seed` (las mismas en todos los bloques
+    de filas) y el ruido de un hijo por bloque de filas, de modo que el
+    resultado no depende de `chunk_cells`.
+    """
+    kt = np.asarray(kt, dtype='float64')
+    per_row = spec.kt_cv > 0
+    recovery_seq, price_seq, noise_seq = np.random.SeedSequence(spec.seed).spawn(3)
+    lo, hi = _z_bounds(spec)
+    if per_row:
+        block = max(1, max_cells // bins)
+        starts = range(0, len(kt), block)
+        noise_seqs = noise_seq.spawn(len(starts))
+    else:
+        block, starts, noise_seqs = 1, range(1), [None]
+    z_percentiles = np.empty((len(kt) if per_row else 1, len(spec.percentiles)))
+    z_sums = np.empty(len(z_percentiles))
+    clipped = 0
+    for start, seq in zip(starts, noise_seqs):
+        rows = min(block, len(z_percentiles) - start)
+        rngs = (
+            np.random.default_rng(recovery_seq),
+            np.random.default_rng(price_seq),
+            np.random.default_rng(seq) if per_row else None,
+        )
+        block_percentiles, sums, block_clipped = _simulate_block(rows, spec, rngs, lo, hi, bins, chunk_cells)
+        z_percentiles[start:start + rows] = block_percentiles
+        z_sums[start:start + rows] = sums
+        clipped += block_clipped
+    z_mean = z_sums / max(spec.draws, 1)
+    scale = kt * 1000.0
+    if not per_row:
+        z_percentiles = np.broadcast_to(z_percentiles, (len(kt), len(spec.percentiles)))
+        z_mean = np.broadcast_to(z_mean, len(kt))
+    return SimulationResult(
+        percentiles=scale[:, None] * z_percentiles,
+        mean=scale * z_mean,
+        draws=spec.draws,
+        clipped=clipped,
+    )
+
+
+def default_spec(recovery: Optional[str] = None, price: Optional[str] = None, **kwargs) -> SimulationSpec:
+    """`SimulationSpec` con las distribuciones por defecto de `utils.py` si no se indican."""
+    return SimulationSpec(
+        recovery=Distribution.parse(recovery or RECOVERY_FRACTION_DISTRIBUTION),
+        price=Distribution.parse(price or PRICE_DISTRIBUTION),
+        **kwargs,
+    )
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# los módulos del backend son planos (`import data_loader`), como con `uvicorn main:app`
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
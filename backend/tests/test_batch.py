@@ -0,0 +1,20 @@
+"""`/ewaste/batch`: `countries` y `metrics` aceptan valores separados por comas o el parámetro repetido."""
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def test_comma_separated_countries_match_repeated_parameter():
+    joined = client.get('/ewaste/batch', params={'countries': 'Peru,Chile', 'metrics': 'e_waste_generated_kt,population'})
+    repeated = client.get('/ewaste/batch', params=[
+        ('countries', 'Peru'), ('countries', 'Chile'),
+        ('metrics', 'e_waste_generated_kt'), ('metrics', 'population'),
+    ])
+    assert joined.status_code == 200
+    assert joined.json() == repeated.json()
+    body = joined.json()
+    assert body['metrics'] == ['e_waste_generated_kt', 'population']
+    assert body['missing'] == []
+    assert body['rows'] > 0
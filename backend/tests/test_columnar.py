@@ -0,0 +1,29 @@
+"""Formato columnar: escribir y volver a abrir un DataFrame devuelve los mismos valores y dtypes."""
+import pandas as pd
+
+from columnar import read_columnar, read_manifest, write_columnar
+
+
+def _round_trip(df, tmp_path):
+    write_columnar(df, tmp_path / 'frame')
+    return read_columnar(tmp_path / 'frame', read_manifest(tmp_path / 'frame'))
+
+
+def test_round_trip_keeps_values_and_dtypes(tmp_path):
+    df = pd.DataFrame({
+        'country': pd.Series(['Peru', None, 'Chile'], dtype='string'),
+        'pair_side': pd.Series(['x', 'y', None], dtype='str'),
+        'label': pd.Series(['a', None, 'b'], dtype=object),
+        'mixed': pd.Series([1, 'a', None], dtype=object),
+        'numbers': pd.Series([1, 2.5, None], dtype=object),
+        'flags': pd.Series([True, False, True], dtype=object),
+        'year': pd.Series([2019, None, 2022], dtype='Int64'),
+        'rate': pd.Series([0.5, None, 1.5], dtype='Float64'),
+        'ok': pd.Series([True, None, False], dtype='boolean'),
+        'kt': [1.0, 2.0, float('nan')],
+        'region': pd.Categorical(['A', 'B', 'A']),
+    })
+    out = _round_trip(df, tmp_path)
+    pd.testing.assert_frame_equal(out, df)
+    assert out['mixed'].tolist()[:2] == [1, 'a']
+    assert out['flags'].tolist() == [True, False, True]
@@ -0,0 +1,58 @@
+"""Alias de países: un nombre corto compartido no puede mezclar dos países."""
+import pandas as pd
+
+from country_search import build_search_index
+from data_loader import _country_aliases, build_country_index, country_iso3_codes
+
+
+def _frames():
+    master = pd.DataFrame({
+        'country': ['Congo', 'Congo', 'Congo (Democratic Republic of the)', 'Korea (Republic of)',
+                    "Korea (Democratic People's Republic of)", 'Bolivia (Plurinational State of)', 'Peru'],
+        'year': [2019, 2020, 2019, 2019, 2019, 2019, 2019],
+        'country_clean': ['congo', 'congo', 'congo dr', 'korea south', 'korea north', 'bolivia', 'peru'],
+        'iso3': ['COG', 'COG', 'COD', 'KOR', 'PRK', 'BOL', 'PER'],
+        'kt': [1, 2, 3, 4, 5, 6, 7],
+    })
+    return {'master_final_dataset': master}
+
+
+def test_shared_short_name_is_not_an_alias():
+    aliases = _country_aliases(_frames())
+    assert 'congo' not in aliases['congo (democratic republic of the)']
+    assert 'korea' not in aliases['korea (republic of)']
+    assert 'korea' not in aliases["korea (democratic people's republic of)"]
+    # los alias únicos se mantienen
+    assert 'bolivia' in aliases['bolivia (plurinational state of)']
+    assert 'cod' in aliases['congo (democratic republic of the)']
+
+
+def test_country_index_keeps_countries_apart():
+    frames = _frames()
+    df = frames['master_final_dataset'].drop(columns=['country_clean', 'iso3'])
+    index = build_country_index(df, _country_aliases(frames))
+    assert df['country'].iloc[index.lookup('Congo')].unique().tolist() == ['Congo']
+    assert df['country'].iloc[index.lookup('COD')].unique().tolist() == ['Congo (Democratic Republic of the)']
+    assert len(index.lookup('Korea')) == 0
+    assert df['country'].iloc[index.lookup('Bolivia')].unique().tolist() == ['Bolivia (Plurinational State of)']
+    assert df['country'].iloc[index.lookup('Perú')].unique().tolist() == ['Peru']
+
+
+def test_search_index_uses_dataset_iso3_and_drops_clashes():
+    frames = _frames()
+    countries = frames['master_final_dataset']['country']
+    index = build_search_index(countries, _country_aliases(frames), country_iso3_codes(frames))
+    by_country = {country: (iso3, names) for country, iso3, names in index.entries}
+    assert by_country['Congo (Democratic Republic of the)'][0] == 'COD'
+    assert 'Congo' not in by_country['Congo (Democratic Republic of the)'][1]
+    assert 'Korea' not in by_country['Korea (Republic of)'][1]
+    exact = [r for r in index.search('congo') if r['kind'] == 'exact']
+    assert [r['country'] for r in exact] == ['Congo']
+
+
+def test_three_letter_alias_is_not_taken_as_iso3():
+    frames = {'master_final_dataset': pd.DataFrame({
+        'country': ['Chad'], 'year': [2019], 'country_clean': ['tcd'], 'iso3': [None],
+    })}
+    index = build_search_index(['Chad'], _country_aliases(frames), country_iso3_codes(frames))
+    assert index.entries[0][1] is None
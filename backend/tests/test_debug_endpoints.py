@@ -0,0 +1,28 @@
+"""Los endpoints de diagnóstico exigen `X-Profile-Token`."""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from profiling import TOKEN_HEADER
+
+client = TestClient(main.app)
+
+
+@pytest.mark.parametrize('path', ['/debug/memory', '/debug/profiles'])
+def test_debug_endpoints_hidden_without_token_configured(monkeypatch, path):
+    monkeypatch.delenv('PROFILE_TOKEN', raising=False)
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/debug/memory', '/debug/profiles'])
+def test_debug_endpoints_require_matching_token(monkeypatch, path):
+    monkeypatch.setenv('PROFILE_TOKEN', 's3cret')
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={TOKEN_HEADER: 'wrong'}).status_code == 403
+    assert client.get(path, headers={TOKEN_HEADER: 's3cret'}).status_code == 200
+
+
+def test_debug_memory_reports_datasets(monkeypatch):
+    monkeypatch.setenv('PROFILE_TOKEN', 's3cret')
+    report = client.get('/debug/memory', headers={TOKEN_HEADER: 's3cret'}).json()
+    assert 'datasets' in report
@@ -0,0 +1,34 @@
+"""`/data/export`: el CSV coincide byte a byte con el `to_csv` del endpoint original."""
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from data_loader import get_data_dir
+
+client = TestClient(main.app)
+
+
+def _baseline_csv(country=None, year=None) -> str:
+    """Lo que devolvía el endpoint original: filtro sobre el master leído con `pd.read_json` y `to_csv`."""
+    df = pd.read_json(get_data_dir() / 'master_dataset_normalized.json')
+    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
+    if country:
+        df = df[df['country'].str.lower() == country.lower()]
+    if year is not None:
+        df = df[df['year'] == year]
+    return df.to_csv(index=False)
+
+
+@pytest.mark.parametrize('params', [
+    {'country': 'Peru'},
+    {'country': 'chile (republic of)'},
+    {'country': 'Peru', 'year': 2019},
+    {'year': 2020},
+])
+def test_export_csv_matches_baseline(monkeypatch, params):
+    # bloques pequeños: el orden y la cabecera tienen que sobrevivir a los cortes
+    monkeypatch.setattr(main, 'EXPORT_CHUNK_ROWS', 7)
+    response = client.get('/data/export', params=params)
+    assert response.status_code == 200
+    assert response.text == _baseline_csv(**params)
@@ -0,0 +1,64 @@
+"""Pool de procesos: exportación en streaming y almacén privado del snapshot."""
+import dataclasses
+import time
+
+import pytest
+
+from data_loader import current_snapshot
+from offload import Offloader, WorkClass
+
+
+def _slow_chunks(snapshot, pause):
+    yield b'first'
+    time.sleep(pause)
+    yield b'second'
+
+
+def _endless_chunks(snapshot):
+    while True:
+        yield b'x' * 65536
+
+
+def _version(snapshot):
+    return snapshot.version
+
+
+@pytest.fixture
+def offloader(tmp_path):
+    off = Offloader(workers=1, classes=[WorkClass('export', 2, 0, 5.0)], store=tmp_path / 'store')
+    yield off
+    off.shutdown()
+
+
+def test_pool_stream_sends_first_chunk_before_worker_finishes(offloader):
+    snap = current_snapshot()
+    assert offloader.run('export', snap, _version) == snap.version  # arranca el pool
+    start = time.perf_counter()
+    chunks = offloader.stream('export', snap, _slow_chunks, 1.5)
+    assert next(chunks) == b'first'
+    assert time.perf_counter() - start < 1.0
+    assert list(chunks) == [b'second']
+    assert offloader.classes['export'].stats()['running'] == 0
+
+
+def test_closing_pool_stream_frees_worker_and_slot(offloader):
+    snap = current_snapshot()
+    chunks = offloader.stream('export', snap, _endless_chunks)
+    next(chunks)
+    chunks.close()
+    assert offloader.classes['export'].stats()['running'] == 0
+    # con un solo worker, esto solo termina si el worker dejó de producir
+    assert offloader.run('export', snap, _version) == snap.version
+
+
+def test_private_store_keeps_only_the_latest_snapshot(offloader, tmp_path):
+    snap = current_snapshot()
+    store = offloader.store
+    offloader._snapshot_ref(snap)
+    offloader._snapshot_ref(dataclasses.replace(snap, version='next'))
+    names = [p.name for p in store.iterdir()]
+    assert len(names) == 1 and names[0].startswith('next-')
+    # con el snapshot en `DATA_SHARED_DIR` ya no hace falta la copia privada
+    shared = dataclasses.replace(snap, shared_path=str(tmp_path / 'shared' / 'key'))
+    assert offloader._snapshot_ref(shared)[0] == str(tmp_path / 'shared')
+    assert not store.exists()
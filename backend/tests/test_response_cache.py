@@ -0,0 +1,40 @@
+"""Caché de respuestas: presupuesto de bytes que incluye las variantes comprimidas."""
+import json
+
+from response_cache import CachedResponse, ResponseCache, make_etag
+
+
+def _entry(size: int) -> CachedResponse:
+    # JSON repetitivo: gzip lo reduce mucho, así que la variante se guarda
+    body = json.dumps(['x' * 10] * (size // 15)).encode()
+    return CachedResponse(body=body, etag=make_etag(body))
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=100, max_bytes=25_000)
+    for key in 'abc':
+        cache.put(key, _entry(10_000))
+    assert cache.get('a') is None
+    assert cache.get('b') is not None and cache.get('c') is not None
+    assert cache.nbytes == sum(cache.get(k).nbytes for k in 'bc') <= 25_000
+
+
+def test_variants_count_towards_budget():
+    cache = ResponseCache(maxsize=100)
+    entry = cache.put('a', _entry(10_000))
+    before = cache.nbytes
+    body, _, encoding = cache.encoded('a', entry, 'gzip')
+    assert encoding == 'gzip'
+    assert cache.nbytes == before + len(body)
+    cache.clear()
+    assert cache.nbytes == 0
+
+
+def test_large_body_is_served_but_not_stored():
+    cache = ResponseCache(maxsize=100, max_entry_bytes=5_000)
+    entry = cache.get_or_build('big', lambda: _entry(10_000).body)
+    assert len(entry.body) > 5_000
+    assert len(cache) == 0 and cache.nbytes == 0
+    # la variante se comprime igualmente, pero no se cuenta
+    assert cache.encoded('big', entry, 'gzip')[2] == 'gzip'
+    assert cache.nbytes == 0
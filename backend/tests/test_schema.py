@@ -0,0 +1,78 @@
+"""Esquema canónico: los handlers ven nombres canónicos, `/data/table` y `/data/export` los datos crudos."""
+import csv
+import io
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from data_loader import canonical_columns, canonical_view, get_data_dir, normalize_schema
+
+client = TestClient(main.app)
+
+
+def _baseline_frame(name='master_dataset_normalized'):
+    """El dataset tal como lo leía el loader original (`pd.read_json`, sin normalizar)."""
+    return pd.read_json(get_data_dir() / f'{name}.json')
+
+
+def test_normalize_schema_keeps_columns_and_dtypes():
+    df = pd.DataFrame({
+        'country': [' Peru', 'Chile '],
+        'population': [44244593, 19000000],
+        'e_waste_generated_kt_x': [186, 12],
+        'ewaste_generated_kg_inh': [6.0, 7.5],
+    })
+    out = normalize_schema(df.copy())
+    assert list(out.columns) == list(df.columns)
+    assert out['population'].dtype == 'int64'
+    assert out['country'].tolist() == ['Peru', 'Chile']
+    lookup = canonical_columns(tuple(out.columns))
+    assert lookup['e_waste_generated_kt'] == ('e_waste_generated_kt_x',)
+    assert lookup['e_waste_generated_per_capita'] == ('ewaste_generated_kg_inh',)
+
+
+def test_canonical_view_fills_gaps_from_aliases_without_touching_source():
+    df = pd.DataFrame({
+        'e_waste_generated_per_capita': [None, 0.0, 3.0],
+        'ewaste_generated_kg_inh': [5.0, 9.0, None],
+        'population': [1, 2, 3],
+    })
+    view = canonical_view(df)
+    # 0.0 es un valor válido: solo se rellena el hueco
+    assert view['e_waste_generated_per_capita'].tolist() == [5.0, 0.0, 3.0]
+    # en la vista las métricas son float64; el origen conserva sus tipos
+    assert view['population'].dtype == 'float64'
+    assert df['population'].dtype == 'int64'
+    assert df['e_waste_generated_per_capita'].isna().sum() == 1
+
+
+def test_snapshot_builds_float64_canonical_frames():
+    snap = main.current_snapshot()
+    view = snap.canonical('df_country_year')
+    assert 'df_country_year' in snap.canonical_frames
+    for name in canonical_columns(tuple(snap.frame('df_country_year').columns)):
+        assert view[name].dtype == 'float64', name
+    assert snap.frame('df_country_year')['population'].dtype == 'int64'
+
+
+def test_table_and_export_serve_raw_columns_and_integers():
+    raw = _baseline_frame()
+    columns = list(raw.columns)
+    int_columns = [c for c in columns if pd.api.types.is_integer_dtype(raw[c])]
+    assert 'population' in int_columns
+
+    rows = client.get('/data/table', params={'limit': len(raw)}).json()['rows']
+    assert len(rows) == len(raw)
+    assert set(rows[0]) == set(columns)
+    for column in int_columns:
+        assert all(isinstance(r[column], int) for r in rows if r[column] is not None), column
+
+    response = client.get('/data/export')
+    reader = csv.reader(io.StringIO(response.text))
+    header = next(reader)
+    assert header == columns
+    positions = [header.index(c) for c in int_columns if c != 'year']
+    for record in reader:
+        for i in positions:
+            assert '.' not in record[i], (header[i], record[i])
@@ -0,0 +1,30 @@
+"""Simulación Monte Carlo: memoria acotada por bloques de filas y de draws."""
+import tracemalloc
+
+import numpy as np
+
+from simulation import HISTOGRAM_BINS, default_spec, simulate_values
+
+
+def test_row_blocks_bound_memory():
+    kt = np.linspace(1.0, 100.0, 2000)
+    spec = default_spec(draws=2000, kt_cv=0.1)
+    tracemalloc.start()
+    try:
+        simulate_values(kt, spec, chunk_cells=200_000, max_cells=64 * HISTOGRAM_BINS)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # un histograma por fila de golpe serían 2000 x 8192 x 8 B = 131 MB por array
+    assert peak < 40e6
+
+
+def test_result_does_not_depend_on_draw_chunks():
+    kt = np.array([1.0, 5.0, np.nan, 20.0])
+    spec = default_spec(draws=3000, kt_cv=0.2, seed=7)
+    a = simulate_values(kt, spec, chunk_cells=100_000, max_cells=2 * HISTOGRAM_BINS)
+    b = simulate_values(kt, spec, chunk_cells=1_000, max_cells=2 * HISTOGRAM_BINS)
+    np.testing.assert_array_equal(a.percentiles, b.percentiles)
+    np.testing.assert_allclose(a.mean, b.mean)
+    assert np.isnan(a.percentiles[2]).all()
+    assert (a.percentiles[[0, 1, 3], 0] < a.percentiles[[0, 1, 3], 2]).all()
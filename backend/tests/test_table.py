@@ -0,0 +1,34 @@
+"""`/data/table`: sin `sort` las filas salen en orden de archivo, también al paginar con cursor."""
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from data_loader import get_data_dir
+
+client = TestClient(main.app)
+
+
+def _file_rows(country: str) -> list:
+    df = pd.read_json(get_data_dir() / 'master_dataset_normalized.json')
+    sel = df[df['country'].str.lower() == country.lower()]
+    return list(zip(sel['year'], sel['category']))
+
+
+def test_country_filter_keeps_file_order_across_cursor_pages():
+    rows, cursor = [], None
+    while True:
+        params = {'country': 'Peru', 'limit': 7, 'fields': 'year,category'}
+        if cursor:
+            params['cursor'] = cursor
+        body = client.get('/data/table', params=params).json()
+        rows += [(r['year'], r['category']) for r in body['rows']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert rows == _file_rows('Peru')
+
+
+def test_explicit_sort_still_orders_by_column():
+    body = client.get('/data/table', params={'country': 'Peru', 'limit': 1000, 'sort': 'year'}).json()
+    years = [r['year'] for r in body['rows']]
+    assert years == sorted(years) and body['total'] == len(_file_rows('Peru'))
@@ -1,9 +1,16 @@
 from typing import Optional
 
+import numpy as np
+
 # Supuestos y parámetros para cálculos rápidos
 RECOVERY_FRACTION = 0.02  # fracción de peso recuperable (2% por defecto)
 PRICE_PER_TONNE_RECOVERED_USD = 2000.0  # precio medio por tonelada recuperada en USD
 
+# Distribuciones por defecto de los mismos parámetros para la simulación
+# Monte Carlo (`simulation.py`); formato `tipo:param1,param2,...`
+RECOVERY_FRACTION_DISTRIBUTION = 'triangular:0.01,0.02,0.03'
+PRICE_DISTRIBUTION = 'normal:2000,400'
+
 
 def value_recoverable_usd_from_kt(e_waste_generated_kt: Optional[float]) -> Optional[float]:
     """Calcula el valor recuperable a partir de e-waste en kilotoneladas.
@@ -22,3 +29,21 @@ def value_recoverable_usd_from_kt(e_waste_generated_kt: Optional[float]) -> Opti
     recovered_tonnes = tonnes * RECOVERY_FRACTION
     value = recovered_tonnes * PRICE_PER_TONNE_RECOVERED_USD
     return float(value)
+
+
+def value_recoverable_usd_array(
+    e_waste_generated_kt,
+    recovery_fraction: Optional[float] = None,
+    price_per_tonne_usd: Optional[float] = None,
+) -> np.ndarray:
+    """Versión vectorizada de `value_recoverable_usd_from_kt` (NaN se mantiene NaN).
+
+    Acepta arrays de cualquier forma; `recovery_fraction` y `price_per_tonne_usd`
+    sustituyen a los parámetros del módulo (escenarios de sensibilidad).
+    """
+    if recovery_fraction is None:
+        recovery_fraction = RECOVERY_FRACTION
+    if price_per_tonne_usd is None:
+        price_per_tonne_usd = PRICE_PER_TONNE_RECOVERED_USD
+    kt = np.asarray(e_waste_generated_kt, dtype='float64')
+    return kt * 1000.0 * recovery_fraction * price_per_tonne_usd
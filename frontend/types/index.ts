@@ -111,6 +111,156 @@ export interface EWasteScenario {
   new_value_recoverable_usd: number; // Nuevo valor recuperable (USD)
 }
 
+/**
+ * /ewaste/scenario/sweep
+ * Escenarios para varias filas (país, año) × deltas; matrices [fila][delta]
+ */
+export interface EWasteScenarioSweep {
+  deltas: number[]; // Incrementos porcentuales evaluados
+  recovery_fraction: number; // Fracción recuperable usada
+  price_per_tonne_recovered_usd: number; // Precio por tonelada usado (USD)
+  missing: string[]; // Países pedidos sin datos
+  rows: number; // Número de filas (país, año)
+  country: string[];
+  year: Array<number | null>;
+  generated_kt: number[]; // Residuos generados (kilotones)
+  base_formally_collected_kt: number[]; // Recolección formal base (kilotones)
+  base_value_recoverable_usd: number[]; // Valor recuperable base (USD)
+  new_formally_collected_kt: number[][]; // Nueva recolección formal (kilotones)
+  delta_absolute_kt: number[][]; // Delta absoluto (kilotones)
+  new_value_recoverable_usd: number[][]; // Nuevo valor recuperable (USD)
+}
+
+/**
+ * /ewaste/simulate
+ * Bandas Monte Carlo del valor recuperable por fila (país, año), en formato columnar
+ */
+export interface EWasteValueSimulation {
+  basis: 'generated' | 'formal'; // kt de partida
+  delta_percent: number | null; // Escenario de recolección formal, si se pidió
+  recovery_fraction: string; // Distribución usada, p.ej. 'triangular:0.01,0.02,0.03'
+  price_per_tonne_recovered_usd: string; // Distribución usada, p.ej. 'normal:2000.0,400.0'
+  draws: number; // Muestras por fila
+  seed: number;
+  kt_cv: number; // Incertidumbre relativa de los kt
+  clipped: number; // Muestras fuera del rango del histograma
+  missing: string[]; // Países pedidos sin datos
+  rows: number; // Número de filas (país, año)
+  country: string[];
+  year: Array<number | null>;
+  kt: Array<number | null>; // Kilotones de partida
+  value_recoverable_usd: Array<number | null>; // Valor con los parámetros puntuales de utils.py
+  mean: Array<number | null>; // Media simulada (USD)
+  bands: Record<string, Array<number | null>>; // p5, p50, p95 (USD)
+}
+
+/**
+ * /ewaste/aggregate
+ * Agregados por grupo de países (región o 'all') y año, en formato columnar
+ */
+export interface EWasteAggregate {
+  groups: string[]; // Grupos pedidos
+  metrics: string[]; // Métricas pedidas
+  weights: Record<string, string | null>; // Columna de ponderación por métrica (null: suma)
+  members: Record<string, string[]>; // Países del dataset en cada grupo
+  missing: Record<string, string[]>; // Miembros configurados sin datos
+  rows: number; // Número de filas (grupo, año)
+  columns: Record<string, Array<number | string | null>>; // group, year y una columna por métrica
+  reporting: Record<string, number[]>; // Países que aportan a cada valor, por métrica
+}
+
+/**
+ * /ewaste/category_pairs
+ * Pares de categorías (x, y) por país y año, en formato columnar
+ */
+export interface EWasteCategoryPairs {
+  categories: string[]; // Categorías en el orden de la tabla
+  missing: string[]; // Países pedidos sin datos
+  rows: number; // Número de pares
+  columns: Record<string, Array<number | string | null>>; // country, year, category_x/y, share_x/y, value_x/y
+}
+
+/**
+ * /ewaste/category_pairs/correlation
+ * Correlación entre shares de categorías a través de los países
+ */
+export interface EWasteCategoryCorrelation {
+  year: number | null; // null: todas las filas país/año juntas
+  side: 'x' | 'y'; // Lado de la tabla de pares
+  categories: string[];
+  matrix: Array<Array<number | null>>; // matrix[i][j] alineada con categories
+  counts: number[][]; // Observaciones de cada coeficiente
+}
+
+/**
+ * /ewaste/forecast
+ * Histórico y proyección de tendencia de un país (formato columnar)
+ */
+export interface EWasteForecast {
+  country: string;
+  model: 'linear' | 'loglinear';
+  interval: 'prediction' | 'confidence';
+  level: number; // Nivel del intervalo (0-1)
+  metrics: string[];
+  history: Record<string, Array<number | null>>; // year y una lista por métrica
+  forecast: Record<string, Array<number | null>>; // year, <métrica>, <métrica>_lower, <métrica>_upper
+  fit: Record<string, { slope: number | null; r2: number | null; n: number }>;
+}
+
+/**
+ * /ewaste/forecast/all
+ * Proyección de una métrica para todos los países: matrices [país][año]
+ */
+export interface EWasteForecastBulk {
+  metric: string;
+  model: 'linear' | 'loglinear';
+  interval: 'prediction' | 'confidence';
+  level: number;
+  years: number[]; // Años proyectados
+  countries: string[];
+  value: Array<Array<number | null>>;
+  lower: Array<Array<number | null>>;
+  upper: Array<Array<number | null>>;
+  slope: Array<number | null>; // Por año (en log si el modelo es loglinear)
+  r2: Array<number | null>;
+  n: number[]; // Años usados en el ajuste
+}
+
+/**
+ * /ewaste/countries
+ * Países del dataset y nombres aceptados (ISO3, nombre corto, español)
+ */
+export interface EWasteCountryList {
+  countries: Array<{ country: string; iso3: string | null; names: string[] }>;
+}
+
+/**
+ * /ewaste/countries/search
+ * Autocompletado de países (sin distinguir mayúsculas ni tildes)
+ */
+export interface EWasteCountrySearch {
+  query: string;
+  results: Array<{
+    country: string; // Nombre del dataset
+    iso3: string | null;
+    match: string; // Nombre que coincidió
+    kind: 'exact' | 'prefix' | 'word' | 'fuzzy';
+    score: number;
+  }>;
+}
+
+/**
+ * /ewaste/batch
+ * Varias métricas de varios países en formato columnar (una lista por columna)
+ */
+export interface EWasteBatch {
+  countries: string[]; // Países encontrados (nombre del dataset)
+  missing: string[]; // Países pedidos sin datos
+  metrics: string[]; // Métricas devueltas
+  rows: number; // Número de filas (country, year)
+  columns: Record<string, Array<number | string | null>>; // country, year y una columna por métrica
+}
+
 // Modos de vista de la aplicación
 export type ViewMode = "home" | "selection" | "dashboard";
 